@@ -0,0 +1,168 @@
+"""Throughput and recall of job_dedup.py on synthetic reposts.
+
+For every --scales row count, takes job_base_clean of the synthetic crawl
+(gen_vietnamworks.py, shared with bench_scaling.py under --data-dir) and
+re-lists a share (--repost-rate) of its postings under new ids, once or
+twice each, the way the crawl does:
+
+- the title with a "(Tuyển gấp)" suffix
+- the skill list without its last skill
+- the same text with other case, spacing and punctuation
+- an exact copy
+
+then runs job_dedup.duplicate_map on the result and reports:
+
+- recall: injected reposts that land in the cluster of their original
+- precision: merged postings whose canonical id is their own original
+  (the synthetic crawl also has organic near-duplicates; those count as
+  misses here)
+- throughput in postings per second, and the seconds of the signature,
+  candidate and verification steps
+
+Each scale is a run_metrics record `dedup@<rows>` appended to --results,
+and the log-log slope of the seconds between the two largest scales is
+printed (1.0 = linear).
+
+Usage:
+    python bench/bench_dedup.py --scales 10000,100000,1000000
+    python bench/bench_dedup.py --scales 20000 --repost-rate 0.1 --threshold 0.7
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "bench"))
+
+import gen_vietnamworks as gen  # noqa: E402
+import job_dedup  # noqa: E402
+from bench_scaling import git_commit  # noqa: E402
+from run_metrics import RunMetrics  # noqa: E402
+
+DEFAULT_SCALES = "10000,100000"
+PERTURBATIONS = 4
+
+
+def inject_reposts(job_base_clean, rate: float, seed: int):
+    """(job_base_clean with reposts, truth): truth holds (job_id, original_id) of every repost."""
+    from pyspark.sql import functions as F
+
+    from spark_explore_output import JOB_BASE_CLEAN_SCHEMA
+
+    columns = JOB_BASE_CLEAN_SCHEMA.fieldNames()
+    base = job_base_clean.where(F.col("job_id").isNotNull()).select(*columns)
+    offset = base.agg(F.max("job_id")).first()[0] + 1
+    originals = base.sample(fraction=rate, seed=seed)
+    # One repost each, two for every third original.
+    copies = originals.select(
+        "*", F.explode(F.sequence(F.lit(1), F.when(F.col("job_id") % 3 == 0, 2).otherwise(1))).alias("k")
+    )
+    kind = (F.col("job_id") + F.col("k")) % PERTURBATIONS
+    reposts = copies.select(
+        (F.col("k") * F.lit(offset) + F.col("job_id")).alias("job_id"),
+        F.when(kind == 0, F.concat_ws(" ", "title", F.lit("(Tuyển gấp)"))).otherwise(F.col("title")).alias("title"),
+        "category_location_raw",
+        "company_raw",
+        F.when(kind == 2, F.upper("location_raw")).otherwise(F.col("location_raw")).alias("location_raw"),
+        "experience_raw",
+        F.when(kind == 2, F.concat(F.regexp_replace("requirements_raw", ", ", " ,  "), F.lit(".")))
+        .otherwise(F.col("requirements_raw"))
+        .alias("requirements_raw"),
+        F.when(kind == 1, F.regexp_replace("industry_raw", ",[^,]*$", "")).otherwise(F.col("industry_raw")).alias(
+            "industry_raw"
+        ),
+        "education_raw",
+        "employment_type_raw",
+        F.col("job_id").alias("original_id"),
+    )
+    truth = reposts.select("job_id", "original_id").toPandas()
+    return base.unionByName(reposts.drop("original_id")), truth
+
+
+def score(duplicates, truth) -> dict:
+    """Recall of the injected reposts and precision of the merges."""
+    canonical = dict(zip(duplicates["job_id"], duplicates["canonical_id"]))
+    original = dict(zip(truth["job_id"], truth["original_id"]))
+
+    def _canon(i):
+        return canonical.get(i, i)
+
+    def _group(i):
+        return original.get(i, i)
+
+    found = sum(_canon(r) == _canon(o) for r, o in original.items())
+    correct = sum(_group(j) == _group(c) for j, c in canonical.items())
+    return {
+        "reposts": len(original),
+        "recall": round(found / len(original), 4) if original else None,
+        "merged": len(canonical),
+        "precision": round(correct / len(canonical), 4) if canonical else None,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", default=DEFAULT_SCALES, help=f"Comma-separated row counts (default: {DEFAULT_SCALES})")
+    parser.add_argument("--data-dir", default=str(ROOT / "bench" / "data"), help="Generated data, one folder per scale")
+    parser.add_argument("--results", default=str(ROOT / "bench" / "results" / "dedup.jsonl"))
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--malformed", type=float, default=0.01)
+    parser.add_argument("--repost-rate", type=float, default=0.05, help="Share of postings re-listed (default: 0.05)")
+    parser.add_argument("--threshold", type=float, default=job_dedup.DEFAULT_THRESHOLD)
+    parser.add_argument("--bands", type=int, default=job_dedup.DEFAULT_BANDS)
+    parser.add_argument("--rows", type=int, default=job_dedup.DEFAULT_ROWS)
+    parser.add_argument("--max-bucket", type=int, default=job_dedup.DEFAULT_MAX_BUCKET)
+    parser.add_argument("--shuffle-partitions", type=int, default=None, help="Default: Spark's default")
+    args = parser.parse_args()
+
+    from spark_explore_output import _file_glob, load_job_base_clean
+
+    scales = sorted(int(s) for s in args.scales.split(","))
+    data_dir = Path(args.data_dir)
+    commit = git_commit()
+    spark = gen.spark_session("recruitment-bench-dedup", args.shuffle_partitions)
+    metrics = RunMetrics(Path(args.results), spark)
+
+    partitions = spark.conf.get("spark.sql.shuffle.partitions")
+    spark.conf.set("spark.sql.shuffle.partitions", "8")
+    for n in scales:
+        if not gen.is_current(data_dir / str(n), n, args.seed, args.malformed):
+            gen.generate(spark, data_dir / str(n), n, args.seed, args.malformed)
+    spark.conf.set("spark.sql.shuffle.partitions", partitions)
+
+    results = []
+    for n in scales:
+        job_base_clean = load_job_base_clean(spark, _file_glob(data_dir / str(n), "output", "job_base_clean", "part-*"))
+        jobs, truth = inject_reposts(job_base_clean, args.repost_rate, args.seed)
+        jobs = jobs.persist()
+        total = jobs.count()
+        with metrics.step(f"dedup@{n}", "dedup", rows=n, commit=commit, seed=args.seed) as record:
+            duplicates, stats = job_dedup.duplicate_map(
+                jobs, threshold=args.threshold, bands=args.bands, rows=args.rows, max_bucket=args.max_bucket
+            )
+            record.update(stats, rows_in=total, **score(duplicates, truth))
+        jobs.unpersist()
+        results.append(record)
+        print(
+            f"{total:>10,} postings ({record['reposts']:,} injected reposts): {record['seconds']:.1f}s, "
+            f"{total / record['seconds']:,.0f} postings/s; recall {record['recall']}, precision {record['precision']} "
+            f"({record['merged']:,} merged, {stats['candidate_pairs']:,} candidate pairs)",
+            flush=True,
+        )
+    spark.stop()
+
+    if len(results) > 1:
+        a, b = results[-2], results[-1]
+        slope = math.log(b["seconds"] / a["seconds"]) / math.log(b["rows_in"] / a["rows_in"])
+        print(f"\nlog-log slope {a['rows']:,} -> {b['rows']:,}: {slope:.2f} (1.0 = linear)")
+    print(f"run {metrics.run_id} at {commit} (report: {args.results})")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
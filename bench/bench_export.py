@@ -0,0 +1,112 @@
+"""Wall time of the viz export: sequential against the concurrent scheduler.
+
+For every --scales row count, loads the Pig output trees of the synthetic
+crawl (gen_vietnamworks.py, shared with bench_scaling.py under --data-dir),
+builds the viz tables as spark_explore_output.py does and exports them with
+seo.export_viz_tables, alternating
+
+- sequential   workers=1: one table after the other, as before
+- concurrent   --workers threads, one FAIR scheduler pool per table
+
+--repeats times after one untimed export. Each export is a run_metrics
+record `export@<rows>:w<workers>` appended to --results; the script prints
+the median seconds of both paths, the speedup, and whether the manifests
+(rows and sha256 of every output) are identical.
+
+Usage:
+    python bench/bench_export.py --scales 10000,100000
+    python bench/bench_export.py --scales 100000 --workers 8 --persist
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "bench"))
+
+import gen_vietnamworks as gen  # noqa: E402
+import spark_explore_output as seo  # noqa: E402
+from bench_scaling import git_commit  # noqa: E402
+from run_metrics import RunMetrics  # noqa: E402
+
+DEFAULT_SCALES = "10000,100000"
+
+
+def _contents(manifest: dict) -> dict:
+    return {name: (out["rows"], out["sha256"]) for name, out in manifest["outputs"].items()}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", default=DEFAULT_SCALES, help=f"Comma-separated row counts (default: {DEFAULT_SCALES})")
+    parser.add_argument("--data-dir", default=str(ROOT / "bench" / "data"), help="Generated data, one folder per scale")
+    parser.add_argument("--results", default=str(ROOT / "bench" / "results" / "export.jsonl"))
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--malformed", type=float, default=0.01)
+    parser.add_argument("--workers", type=int, default=seo.EXPORT_WORKERS, help="Concurrent path threads")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--format", default="csv", choices=["csv", "parquet"])
+    parser.add_argument("--persist", action="store_true", help="Persist the inputs, like spark_explore_output.py --persist")
+    parser.add_argument("--shuffle-partitions", type=int, default=None, help="Default: Spark's default")
+    args = parser.parse_args()
+
+    scales = sorted(int(s) for s in args.scales.split(","))
+    data_dir = Path(args.data_dir)
+    commit = git_commit()
+    spark = gen.spark_session("recruitment-bench-export", args.shuffle_partitions)
+    metrics = RunMetrics(Path(args.results), spark)
+    slots = spark.sparkContext.defaultParallelism
+
+    partitions = spark.conf.get("spark.sql.shuffle.partitions")
+    spark.conf.set("spark.sql.shuffle.partitions", "8")
+    for n in scales:
+        if not gen.is_current(data_dir / str(n), n, args.seed, args.malformed):
+            gen.generate(spark, data_dir / str(n), n, args.seed, args.malformed)
+    spark.conf.set("spark.sql.shuffle.partitions", partitions)
+
+    paths = {"sequential": 1, "concurrent": args.workers}
+    print(f"{'rows':>10} {'sequential s':>13} {'concurrent s':>13} {'speedup':>8}  identical")
+    with tempfile.TemporaryDirectory(prefix="bench_export_") as tmp:
+        for n in scales:
+            output_dir = data_dir / str(n) / "output"
+            ledger = seo._ScanLedger(seo.StorageLevel.MEMORY_AND_DISK if args.persist else None)
+            inputs = seo.load_inputs(spark, output_dir, "tsv", output_dir.joinpath("store"))
+            for name, df in inputs.items():
+                inputs[name] = ledger.persist(ledger.source(df))
+            if args.persist:
+                for df in inputs.values():
+                    df.count()
+            viz = seo.build_viz_tables(inputs, ledger)
+            seo.export_viz_tables(spark, viz, Path(tmp) / "warmup", args.format, 1)
+
+            seconds = {path: [] for path in paths}
+            manifests = {}
+            for _ in range(args.repeats):
+                for path, workers in paths.items():
+                    tags = {"rows": n, "commit": commit, "workers": workers, "format": args.format}
+                    with metrics.step(f"export@{n}:w{workers}", "export", **tags) as record:
+                        manifest = seo.export_viz_tables(spark, viz, Path(tmp) / path, args.format, workers)
+                        record["rows_out"] = sum(out["rows"] or 0 for out in manifest["outputs"].values())
+                        record["bytes_written"] = sum(out["bytes"] for out in manifest["outputs"].values())
+                    seconds[path].append(manifest["seconds"])
+                    manifests[path] = manifest
+            ledger.unpersist_all()
+
+            seq, conc = (statistics.median(seconds[path]) for path in paths)
+            same = _contents(manifests["sequential"]) == _contents(manifests["concurrent"])
+            print(f"{n:>10,} {seq:>13.2f} {conc:>13.2f} {seq / conc:>7.2f}x  {'yes' if same else 'NO'}", flush=True)
+    spark.stop()
+
+    print(f"\nrun {metrics.run_id} at {commit} (report: {args.results}; {args.workers} workers, "
+          f"median of {args.repeats}, {slots} task slots)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,157 @@
+"""Benchmark the province × industry share heatmap renderers.
+
+Builds a synthetic province_industry_share table (63 provinces, Zipf
+province and industry sizes, every province with a share for every
+industry) for each --industries count and times, over all provinces and
+all industries:
+
+- pivot + seaborn   the previous _heatmap_share: copy, per-column coercion,
+                    drop_duplicates / sort_values, pivot_table(aggfunc="sum"),
+                    sns.heatmap
+- matrix + seaborn  share_matrix (integer codes -> dense array) and sns.heatmap
+- matrix + raster   share_matrix and one imshow image, downsampled above
+                    --max-cells per axis
+
+For each it reports the seconds to build the matrix, the seconds to draw
+and save the PNG, and the peak RSS of the process. Every measurement runs
+in a fresh process (after one small warm-up figure), so the peak is that
+path's alone; most of a heatmap's memory is Agg and QuadMesh buffers that
+tracemalloc does not see.
+
+Usage:
+    python bench/bench_heatmap.py --industries 20,200,2000
+"""
+
+from __future__ import annotations
+
+import argparse
+import multiprocessing
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "viz"))
+
+import make_figures as mf  # noqa: E402
+from make_figures import plt, sns  # noqa: E402
+
+PROVINCES = 63
+
+
+def synthetic_shares(industries: int, rng: np.random.Generator) -> pd.DataFrame:
+    prov_size = rng.zipf(1.6, size=PROVINCES).clip(max=10_000) * 50
+    ind_weight = 1.0 / np.arange(1, industries + 1) ** 1.1
+    counts = rng.poisson(np.outer(prov_size, ind_weight / ind_weight.sum())) + 1
+    province_total = counts.sum(axis=1)
+    return pd.DataFrame(
+        {
+            "province": np.repeat([f"TINH {p:02d}" for p in range(PROVINCES)], industries),
+            "industry": np.tile([f"NGANH {i:05d}" for i in range(industries)], PROVINCES),
+            "job_count": counts.ravel(),
+            "province_job_count": np.repeat(province_total, industries),
+            "share": (counts / province_total[:, None]).ravel(),
+        }
+    ).sample(frac=1.0, random_state=1)
+
+
+def pivot_share(df: pd.DataFrame, top_provinces: int, top_industries: int) -> pd.DataFrame:
+    """The matrix as the previous _heatmap_share built it."""
+    df = df.copy()
+    for c in ["job_count", "province_job_count", "share"]:
+        if c in df.columns:
+            df[c] = pd.to_numeric(df[c], errors="coerce")
+    top_prov = (
+        df[["province", "province_job_count"]]
+        .dropna()
+        .drop_duplicates()
+        .sort_values("province_job_count", ascending=False)
+        .head(top_provinces)["province"]
+    )
+    top_ind = (
+        df.groupby("industry", as_index=False)["job_count"].sum()
+        .sort_values("job_count", ascending=False)
+        .head(top_industries)["industry"]
+    )
+    sub = df[df["province"].isin(top_prov) & df["industry"].isin(top_ind)].copy()
+    pivot = sub.pivot_table(index="province", columns="industry", values="share", aggfunc="sum", fill_value=0.0)
+    prov_order = (
+        df[["province", "province_job_count"]]
+        .drop_duplicates()
+        .set_index("province")
+        .loc[pivot.index]["province_job_count"]
+        .sort_values(ascending=False)
+        .index
+    )
+    return pivot.loc[prov_order]
+
+
+def _seaborn(pivot: pd.DataFrame) -> plt.Figure:
+    fig, ax = plt.subplots(figsize=(max(10, 0.4 * pivot.shape[1]), max(6, 0.35 * pivot.shape[0])))
+    sns.heatmap(pivot, ax=ax, cmap="Blues", cbar_kws={"label": "share"})
+    return fig
+
+
+PATHS = ["matrix + raster", "pivot + seaborn", "matrix + seaborn"]
+
+
+def _measure(n: int, path: str, out: Path, dpi: int, max_cells: int, seed: int) -> tuple[float, float, float | None]:
+    """(matrix seconds, draw+save seconds, peak RSS MB) of one path; run in a fresh process."""
+    sns.set_theme(style="whitegrid")
+    warm = plt.subplots()[0]
+    mf._save(warm, out.with_suffix(".warm.png"), dpi)
+    df = synthetic_shares(n, np.random.default_rng(seed))
+
+    t0 = time.perf_counter()
+    if path == "pivot + seaborn":
+        built = pivot_share(df, PROVINCES, n)
+    else:
+        built = mf.share_matrix(df, top_provinces=None, top_industries=None)
+    t1 = time.perf_counter()
+    if path == "pivot + seaborn":
+        fig = _seaborn(built)
+    elif path == "matrix + seaborn":
+        fig = mf.draw_heatmap(*built, "share")
+    else:
+        fig = mf.draw_heatmap(*built, "share", renderer="raster", max_cells=max_cells)
+    mf._save(fig, out, dpi)
+    t2 = time.perf_counter()
+    return t1 - t0, t2 - t1, mf._peak_rss_mb()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--industries", default="20,200,2000", help="Comma-separated industry counts")
+    parser.add_argument("--max-cells", type=int, default=1000, help="Raster: cells per axis before downsampling")
+    parser.add_argument("--dpi", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=5)
+    parser.add_argument("--seaborn-limit", type=int, default=2000, help="Skip the seaborn paths above this many industries")
+    args = parser.parse_args()
+    context = multiprocessing.get_context("spawn")
+
+    print(f"{'industries':>10} {'path':<18} {'matrix s':>9} {'draw+save s':>12} {'peak RSS MB':>12} {'PNG KB':>8}")
+    with tempfile.TemporaryDirectory(prefix="bench_heatmap_") as tmp:
+        for n in (int(s) for s in args.industries.split(",")):
+            for path in PATHS:
+                if path != "matrix + raster" and n > args.seaborn_limit:
+                    continue
+                out = Path(tmp) / f"{n}_{path.replace(' ', '')}.png"
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                    t_build, t_draw, peak = pool.submit(
+                        _measure, n, path, out, args.dpi, args.max_cells, args.seed
+                    ).result()
+                print(
+                    f"{n:>10} {path:<18} {t_build:>9.3f} {t_draw:>12.2f} {peak or 0:>12.0f} "
+                    f"{out.stat().st_size / 1024:>8.0f}",
+                    flush=True,
+                )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
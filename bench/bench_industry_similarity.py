@@ -0,0 +1,93 @@
+"""Benchmark the industry similarity engine.
+
+Builds a synthetic industry x feature count matrix (power-law feature
+popularity, like skills), then reports the engine setup time, the top-k
+neighbour index build time, and p50 / p99 latency of "similar to X"
+(with and without the index) and "industries for these skills" queries.
+
+Usage:
+    python bench/bench_industry_similarity.py --industries 2000 --features 200000 --nnz-per-row 3000
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import scipy.sparse as sp
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from industry_similarity import SimilarityEngine  # noqa: E402
+
+
+def synthetic_matrix(industries: int, features: int, nnz_per_row: int, seed: int = 5):
+    rng = np.random.default_rng(seed)
+    popularity = 1.0 / np.arange(1, features + 1) ** 0.8
+    popularity /= popularity.sum()
+    rows, cols = [], []
+    for i in range(industries):
+        c = np.unique(rng.choice(features, size=nnz_per_row, p=popularity))
+        rows.append(np.full(len(c), i))
+        cols.append(c)
+    rows, cols = np.concatenate(rows), np.concatenate(cols)
+    data = rng.integers(1, 500, size=len(rows))
+    counts = sp.csr_matrix((data, (rows, cols)), shape=(industries, features))
+    index = {
+        "shape": [industries, features],
+        "industries": [f"IND_{i}" for i in range(industries)],
+        "features": [["skill", f"SKILL {j}"] for j in range(features)],
+    }
+    return counts, index
+
+
+def _latency(label: str, fn, queries) -> None:
+    times = []
+    for q in queries:
+        t0 = time.perf_counter()
+        fn(q)
+        times.append(time.perf_counter() - t0)
+    ms = np.array(times) * 1000
+    print(f"{label:<32} p50 {np.percentile(ms, 50):8.3f} ms   p99 {np.percentile(ms, 99):8.3f} ms")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--industries", type=int, default=2000)
+    parser.add_argument("--features", type=int, default=200_000)
+    parser.add_argument("--nnz-per-row", type=int, default=3000)
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--weighting", default="tfidf", choices=["tfidf", "row"])
+    args = parser.parse_args()
+
+    counts, index = synthetic_matrix(args.industries, args.features, args.nnz_per_row)
+    print(f"matrix: {counts.shape[0]:,} x {counts.shape[1]:,}, {counts.nnz:,} non-zeros")
+
+    t0 = time.perf_counter()
+    engine = SimilarityEngine(counts, index, args.weighting)
+    print(f"{'engine setup (' + args.weighting + ')':<32} {time.perf_counter() - t0:8.3f} s")
+
+    rng = np.random.default_rng(1)
+    industries = [index["industries"][i] for i in rng.integers(0, args.industries, args.queries)]
+    skill_sets = [
+        [f"SKILL {j}" for j in rng.integers(0, 2000, rng.integers(3, 10))] for _ in range(args.queries)
+    ]
+
+    _latency("similar (on the fly)", lambda x: engine.similar_industries(x, args.k), industries)
+
+    t0 = time.perf_counter()
+    engine.build_index(args.k)
+    print(f"{'build top-' + str(args.k) + ' index':<32} {time.perf_counter() - t0:8.3f} s")
+
+    _latency("similar (index lookup)", lambda x: engine.similar_industries(x, args.k), industries)
+    _latency("industries for skills", lambda x: engine.industries_for_skills(x, args.k), skill_sets)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,131 @@
+"""Benchmark the job_base_clean inverted index.
+
+Builds a synthetic index (power-law skill popularity, a handful of
+provinces / experience buckets / education levels dominating), then reports
+the build time, the size of the containers, and p50 / p99 latency of
+filtered queries with two to four clauses and of a skill facet.
+
+Usage:
+    python bench/bench_job_index.py --jobs 1000000 --skills 20000
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from job_index import JobIndex, build_index  # noqa: E402
+
+
+_PROVINCES = ["TP HO CHI MINH", "HA NOI", "DA NANG", "BINH DUONG", "HAI PHONG", "CAN THO", "UNKNOWN"]
+_EXPERIENCE = ["1-3 NĂM", "KHÔNG YÊU CẦU", "DƯỚI 1 NĂM", "3-5 NĂM", "TRÊN 5 NĂM"]
+_EDUCATION = ["ĐẠI HỌC", "KHÔNG YÊU CẦU", "CAO ĐẲNG", "TRUNG CẤP", "THPT", "CAO HỌC"]
+_TYPES = ["TOÀN THỜI GIAN", "BÁN THỜI GIAN", "THỰC TẬP", "THỜI VỤ / HỢP ĐỒNG"]
+
+
+def _zipf(n: int, s: float = 1.0) -> np.ndarray:
+    p = 1.0 / np.arange(1, n + 1) ** s
+    return p / p.sum()
+
+
+def synthetic_rows(jobs: int, skills: int, industries: int, rng: np.random.Generator):
+    job_ids = np.sort(rng.choice(jobs * 4, size=jobs, replace=False)).astype(np.int64)
+    single = {
+        "province": _PROVINCES,
+        "industry": [f"INDUSTRY_{i}" for i in range(industries)],
+        "experience": _EXPERIENCE,
+        "education": _EDUCATION,
+        "employment_type": _TYPES,
+    }
+    for dimension, values in single.items():
+        picks = rng.choice(len(values), size=jobs, p=_zipf(len(values)))
+        order = np.argsort(picks, kind="stable")
+        bounds = np.searchsorted(picks[order], np.arange(len(values) + 1))
+        for v, value in enumerate(values):
+            yield dimension, value, job_ids[order[bounds[v] : bounds[v + 1]]]
+
+    per_job = rng.integers(2, 9, size=jobs)
+    owners = np.repeat(np.arange(jobs), per_job)
+    tokens = rng.choice(skills, size=len(owners), p=_zipf(skills, 0.9))
+    pairs = np.unique(tokens.astype(np.int64) * jobs + owners)
+    tokens, owners = pairs // jobs, pairs % jobs
+    bounds = np.searchsorted(tokens, np.arange(skills + 1))
+    for t in range(skills):
+        if bounds[t + 1] > bounds[t]:
+            yield "skill", f"SKILL {t}", job_ids[owners[bounds[t] : bounds[t + 1]]]
+
+
+def _latency(label: str, fn, queries) -> None:
+    times = []
+    for q in queries:
+        t0 = time.perf_counter()
+        fn(q)
+        times.append(time.perf_counter() - t0)
+    ms = np.array(times) * 1000
+    print(f"{label:<36} p50 {np.percentile(ms, 50):8.3f} ms   p99 {np.percentile(ms, 99):8.3f} ms")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=1_000_000)
+    parser.add_argument("--skills", type=int, default=20_000)
+    parser.add_argument("--industries", type=int, default=60)
+    parser.add_argument("--queries", type=int, default=500)
+    args = parser.parse_args()
+    rng = np.random.default_rng(11)
+
+    rows = list(synthetic_rows(args.jobs, args.skills, args.industries, rng))
+    job_ids = np.unique(np.concatenate([ids for _, _, ids in rows]))
+    t0 = time.perf_counter()
+    built = build_index(job_ids, rows)
+    print(f"build: {time.perf_counter() - t0:.2f}s for {len(rows):,} terms over {len(job_ids):,} jobs")
+    raw_mb = sum(len(ids) for _, _, ids in rows) * 8 / 1e6
+    size_mb = (built["arrays"].nbytes + built["bitmaps"].nbytes) / 1e6
+    print(f"postings: {size_mb:.1f} MB in containers vs {raw_mb:.1f} MB as int64 job_id lists")
+
+    index = JobIndex(built["job_ids"], built["arrays"], built["bitmaps"], built["terms"])
+    skill_names = [f"SKILL {t}" for t in rng.integers(0, 200, size=args.queries)]
+    rare_skills = [f"SKILL {t}" for t in rng.integers(1000, args.skills, size=args.queries)]
+    provinces = rng.choice(_PROVINCES[:5], size=args.queries)
+    experience = rng.choice(_EXPERIENCE, size=args.queries)
+    education = rng.choice(_EDUCATION, size=args.queries)
+
+    _latency(
+        "province + skill",
+        lambda i: index.query(20, province=provinces[i], skill=skill_names[i]),
+        range(args.queries),
+    )
+    _latency(
+        "province + skill + experience",
+        lambda i: index.query(20, province=provinces[i], skill=skill_names[i], experience=experience[i]),
+        range(args.queries),
+    )
+    _latency(
+        "province + exp + edu (all dense)",
+        lambda i: index.query(20, province=provinces[i], experience=experience[i], education=education[i]),
+        range(args.queries),
+    )
+    _latency(
+        "2 skills OR + rare skill + province",
+        lambda i: index.query(
+            20, skill=[skill_names[i], rare_skills[i]], province=provinces[i], experience=experience[i]
+        ),
+        range(args.queries),
+    )
+    _latency(
+        "facet experience | province + skill",
+        lambda i: index.facet("experience", 10, province=provinces[i], skill=skill_names[i]),
+        range(min(args.queries, 100)),
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
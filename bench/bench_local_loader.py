@@ -0,0 +1,129 @@
+"""Benchmark the local (non-Hadoop) job_base_clean loaders.
+
+Compares the row-by-row reader (`_read_local_tsv_rows` + per-row int()) with
+the columnar pandas reader on a synthetic job_base_clean of N rows. With
+--spark, also times the full hand-off into a Spark DataFrame (pickled rows
+vs. Arrow batches).
+
+Usage:
+    python bench/bench_local_loader.py --rows 1000000 --files 8 [--spark]
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import spark_explore_output as seo  # noqa: E402
+
+
+_LOCATIONS = ["Hà Nội", "Hồ Chí Minh", "Đà Nẵng", "Hải Phòng", "Bình Dương", "Không hiển thị", ""]
+_INDUSTRIES = ["Kinh doanh > Bán hàng", "Marketing", "Kế toán / Kiểm toán", "Xây dựng", "IT Phần mềm"]
+_EXPERIENCE = ["1 năm", "2 năm", "Không yêu cầu", "Dưới 1 năm", "5 năm"]
+
+
+def write_synthetic_job_base_clean(out_dir: Path, rows: int, files: int, seed: int = 7) -> None:
+    rnd = random.Random(seed)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    per_file = -(-rows // files)
+    job_id = 1
+    for i in range(files):
+        with open(out_dir / f"part-m-{i:05d}", "w", encoding="utf-8") as f:
+            for _ in range(min(per_file, rows - job_id + 1)):
+                f.write(
+                    "\t".join(
+                        [
+                            str(job_id),
+                            f"Nhân viên kinh doanh {job_id % 997}",
+                            rnd.choice(_INDUSTRIES),
+                            "Lĩnh vực",
+                            rnd.choice(_LOCATIONS),
+                            rnd.choice(_EXPERIENCE),
+                            "Giao tiếp tốt, Excel, tiếng Anh",
+                            "SQL, Excel, Giao tiếp",
+                            "Đại học trở lên",
+                            "Toàn thời gian",
+                        ]
+                    )
+                    + "\n"
+                )
+                job_id += 1
+
+
+def _timed(label: str, fn):
+    t0 = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - t0
+    print(f"{label:<34} {elapsed:8.2f}s")
+    return result, elapsed
+
+
+def _rows_python(path_glob: str):
+    rows = seo._read_local_tsv_rows(path_glob, expected_cols=10)
+    for r in rows:
+        r[0] = int(r[0]) if r[0] not in (None, "") else None
+    return len(rows)
+
+
+def _frames_python(path_glob: str):
+    return sum(len(f) for f in seo._read_local_tsv_frames(path_glob, seo.JOB_BASE_CLEAN_SCHEMA))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--files", type=int, default=8)
+    parser.add_argument("--spark", action="store_true", help="Also time the Spark DataFrame hand-off")
+    args = parser.parse_args()
+
+    if seo.pd is None:
+        print("pandas is required for the columnar loader")
+        return 1
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = Path(tmp, "job_base_clean")
+        _timed(f"generate {args.rows:,} rows", lambda: write_synthetic_job_base_clean(data_dir, args.rows, args.files))
+        path_glob = seo._file_glob(data_dir, "part-*")
+
+        n_rows, t_rows = _timed("rows reader (python only)", lambda: _rows_python(path_glob))
+        n_cols, t_cols = _timed("columnar reader (python only)", lambda: _frames_python(path_glob))
+        assert n_rows == n_cols, (n_rows, n_cols)
+        print(f"speedup (python only): {t_rows / t_cols:.1f}x")
+
+        if args.spark:
+            from pyspark.sql import SparkSession
+
+            spark = (
+                SparkSession.builder.master("local[*]")
+                .config("spark.sql.execution.arrow.pyspark.enabled", "true")
+                .getOrCreate()
+            )
+            spark.sparkContext.setLogLevel("WARN")
+            pd_mod = seo.pd
+            try:
+                seo.pd = None
+                _, t_rows = _timed(
+                    "rows reader -> createDataFrame",
+                    lambda: seo._load_local_tsv(spark, path_glob, seo.JOB_BASE_CLEAN_SCHEMA).count(),
+                )
+            finally:
+                seo.pd = pd_mod
+            _, t_cols = _timed(
+                "columnar reader -> Arrow",
+                lambda: seo._load_local_tsv(spark, path_glob, seo.JOB_BASE_CLEAN_SCHEMA).count(),
+            )
+            print(f"speedup (into Spark): {t_rows / t_cols:.1f}x")
+            spark.stop()
+
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
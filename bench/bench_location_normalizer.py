@@ -0,0 +1,154 @@
+"""Benchmark the location normalizer against the regex-chain approach.
+
+Python only: the pig_location.pig chain (REPLACE + ordered MATCHES, here
+with `re`) per row, the Aho-Corasick matcher per row, and
+`normalize_series` (batch, each distinct value classified once). With
+--spark, also the Spark regex-chain columns (spark_normalize) against the
+pandas UDF used by spark_explore_output.py. Throughput is in rows/s and
+every approach must agree on every row.
+
+Usage:
+    python bench/bench_location_normalizer.py --rows 1000000 --distinct 20000 [--spark]
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import re
+import sys
+import time
+import unicodedata
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import location_normalizer as ln  # noqa: E402
+
+
+_PLACES = [
+    "Quận 1, Hồ Chí Minh",
+    "Q.7, TP.HCM",
+    "Thủ Đức | Hồ Chí Minh",
+    "Cầu Giấy, Hà Nội",
+    "Hà Nội",
+    "Hải Châu, Đà Nẵng",
+    "Thuận An, Bình Dương",
+    "Biên Hòa, Đồng Nai",
+    "Ngô Quyền, Hải Phòng",
+    "Ninh Kiều, Cần Thơ",
+    "Nha Trang, Khánh Hòa",
+    "Bắc Ninh",
+    "Vũng Tàu",
+    "Long An",
+    "Nước Ngoài",
+    "Không hiển thị",
+    "Hà Nội… Hồ Chí Minh...",
+    "HÀ NỘI (Việt Nam)",
+    "Zürich, Schweiz",
+    "",
+]
+
+
+def synthetic_locations(rows: int, distinct: int, seed: int = 11) -> list[str]:
+    """Mostly precomposed text; one value in ten decomposed (NFD), as crawled."""
+    rnd = random.Random(seed)
+    values = [
+        f"Tầng {rnd.randint(1, 30)}, {rnd.randint(1, 500)} đường số {i}, {rnd.choice(_PLACES)}"
+        for i in range(max(distinct - len(_PLACES), 0))
+    ] + _PLACES
+    values = [unicodedata.normalize("NFD", v) if rnd.random() < 0.1 else v for v in values]
+    values += [unicodedata.normalize("NFD", v) for v in _PLACES]
+    return [rnd.choice(values) for _ in range(rows)]
+
+
+def _regex_chain():
+    rules_4 = ln.DIACRITIC_RULES + [(ln.COMBINING_MARKS, "")] + ln.SEPARATOR_RULES
+    diacritics = [(re.compile(p), r) for p, r in rules_4]
+    rules = [(city, re.compile(p)) for city, p in ln.PROVINCE_RULES]
+
+    def province(raw: str | None) -> str:
+        text = (raw or "").lower()
+        for pattern, repl in diacritics:
+            text = pattern.sub(repl, text)
+        if not text:
+            return ln.UNKNOWN
+        for city, pattern in rules:
+            if pattern.search(text):
+                return city
+        return ln.UNKNOWN
+
+    return province
+
+
+def _timed(label: str, rows: int, fn):
+    t0 = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - t0
+    print(f"{label:<36} {elapsed:8.2f}s {rows / elapsed:14,.0f} rows/s")
+    return result
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--distinct", type=int, default=20_000)
+    parser.add_argument("--spark", action="store_true", help="Also time the Spark regex chain vs. pandas UDF")
+    args = parser.parse_args()
+
+    raw = _timed("generate", args.rows, lambda: synthetic_locations(args.rows, args.distinct))
+
+    chain = _regex_chain()
+    expected = _timed("regex chain (python, per row)", args.rows, lambda: [chain(x) for x in raw])
+
+    matcher = _timed("build automaton", args.rows, ln.ProvinceMatcher)
+    got = _timed("automaton (python, per row)", args.rows, lambda: [matcher.province(x) for x in raw])
+    assert got == expected, "automaton disagrees with the regex chain"
+
+    if ln.pd is not None:
+        series = ln.pd.Series(raw, dtype=object)
+        frame = _timed("normalize_series (batch)", args.rows, lambda: ln.normalize_series(series))
+        assert frame["province_name"].tolist() == expected, "normalize_series disagrees"
+
+    if args.spark:
+        from pyspark.sql import SparkSession, functions as F
+
+        import spark_explore_output as seo
+        import spark_normalize as norm
+
+        spark = (
+            SparkSession.builder.master("local[*]")
+            .config("spark.sql.execution.arrow.pyspark.enabled", "true")
+            .getOrCreate()
+        )
+        spark.sparkContext.setLogLevel("WARN")
+        df = spark.createDataFrame(ln.pd.DataFrame({"location_raw": raw}), "location_raw string").cache()
+        df.count()
+
+        def _checksum(col):
+            # Forces every row through the expression; collisions do not matter here.
+            return df.select(F.sum(F.crc32(col)).alias("h")).first()["h"]
+
+        name = norm.province_name(F.col("location_raw"))
+        chain_sum = _timed(
+            "spark regex chain (JVM)",
+            args.rows,
+            lambda: _checksum(F.concat_ws("|", norm.province_id(name).cast("string"), name)),
+        )
+        loc = seo.normalize_location(F.col("location_raw"))
+        udf_sum = _timed(
+            "spark pandas UDF (automaton)",
+            args.rows,
+            lambda: _checksum(
+                F.concat_ws("|", loc.getField("province_id").cast("string"), loc.getField("province_name"))
+            ),
+        )
+        assert chain_sum == udf_sum, "pandas UDF disagrees with the Spark regex chain"
+        spark.stop()
+
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,231 @@
+"""Scaling benchmark of the viz pipeline on synthetic crawls.
+
+For every --scales row count, generates (or reuses) a synthetic crawl and
+its Pig output trees with gen_vietnamworks.py under --data-dir, then times
+in one SparkSession:
+
+- spark:load          seo.load_inputs of the part-* trees, persisted and counted
+- spark:viz           build_viz_tables, every table counted
+- spark:industry      spark_industry.industry_tables on job_base_clean
+- spark:requirements  spark_requirements.requirement_cube on job_base_clean
+- spark:export        the viz tables as CSV
+- local:load / local:viz / local:export   the same with local_engine (pandas)
+- figures             viz/make_figures.py on the exported CSVs
+
+Each step is a run_metrics record (seconds, rows, bytes, shuffle, peak
+RSS) named `<step>@<rows>` and tagged with the git commit, appended to
+--results. The script prints the seconds per step and scale, and the
+log-log slope between the two largest scales (1.0 = linear). With
+--compare it also diffs this run against the last run of another commit
+(run_metrics.compare).
+
+Usage:
+    python bench/bench_scaling.py --scales 10000,100000,1000000
+    python bench/bench_scaling.py --scales 10000,100000 --compare
+    python run_metrics.py --report bench/results/scaling.jsonl runs
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "bench"))
+
+import gen_vietnamworks as gen  # noqa: E402
+import run_metrics  # noqa: E402
+import spark_explore_output as seo  # noqa: E402
+from run_metrics import RunMetrics  # noqa: E402
+
+
+DEFAULT_SCALES = "10000,100000,1000000"
+STEPS = [
+    "spark:load",
+    "spark:viz",
+    "spark:industry",
+    "spark:requirements",
+    "spark:export",
+    "local:load",
+    "local:viz",
+    "local:export",
+    "figures",
+]
+
+
+def git_commit() -> str:
+    """Short HEAD hash, with a -dirty suffix for uncommitted changes to tracked files."""
+    try:
+        head = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT, capture_output=True, text=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return f"{head}-dirty" if dirty else head
+
+
+def _spark_steps(spark, metrics: RunMetrics, output_dir: Path, export_dir: Path, n: int, tags: dict) -> None:
+    from spark_industry import industry_rows, industry_tables
+    from spark_requirements import requirement_cube
+
+    ledger = seo._ScanLedger()
+    with metrics.step(f"spark:load@{n}", "load", **tags) as record:
+        inputs = seo.load_inputs(spark, output_dir, "tsv", output_dir.joinpath("store"))
+        for name, df in inputs.items():
+            inputs[name] = ledger.persist(ledger.source(df))
+        record["rows_out"] = sum(df.count() for df in inputs.values())
+
+    with metrics.step(f"spark:viz@{n}", "aggregate", **tags) as record:
+        viz = seo.build_viz_tables(inputs, ledger)
+        record["rows_out"] = sum(df.count() for df in viz.values())
+
+    job_base_clean = inputs["job_base_clean"]
+    with metrics.step(f"spark:industry@{n}", "aggregate", **tags) as record:
+        record["rows_out"] = sum(df.count() for df in industry_tables(industry_rows(job_base_clean)).values())
+
+    with metrics.step(f"spark:requirements@{n}", "aggregate", **tags) as record:
+        record["rows_out"] = requirement_cube(job_base_clean).count()
+
+    with metrics.step(f"spark:export@{n}", "export", **tags) as record:
+        record["rows_out"] = sum(seo._export_df(df, export_dir, name, "csv") for name, df in viz.items())
+        record["bytes_written"] = sum(p.stat().st_size for p in export_dir.glob("*.csv"))
+    ledger.unpersist_all()
+
+
+def _local_steps(metrics: RunMetrics, output_dir: Path, export_dir: Path, n: int, tags: dict) -> None:
+    import local_engine
+
+    with metrics.step(f"local:load@{n}", "load", **tags) as record:
+        inputs = local_engine.load_inputs(output_dir, "tsv")
+        record["rows_out"] = sum(len(frame) for frame in inputs.values())
+    with metrics.step(f"local:viz@{n}", "aggregate", **tags) as record:
+        viz = local_engine.build_viz_frames(inputs)
+        record["rows_out"] = sum(len(frame) for frame in viz.values())
+    with metrics.step(f"local:export@{n}", "export", **tags) as record:
+        for name, frame in viz.items():
+            local_engine.export_frame(frame, export_dir, name, "csv")
+        record["rows_out"] = sum(len(frame) for frame in viz.values())
+        record["bytes_written"] = sum(p.stat().st_size for p in export_dir.glob("*.csv"))
+
+
+def _figure_step(metrics: RunMetrics, viz_dir: Path, fig_dir: Path, n: int, tags: dict) -> None:
+    try:
+        from viz.make_figures import FIGURES, render_figure
+    except ImportError as e:
+        print(f"figures skipped ({e})")
+        return
+    fig_dir.mkdir(parents=True, exist_ok=True)
+    with metrics.step(f"figures@{n}", "figure", **tags) as record:
+        results = [render_figure(job, viz_dir, fig_dir) for job in FIGURES if (viz_dir / job["csv"]).exists()]
+        record["figures"] = sum(r[2] for r in results)
+        record["bytes_written"] = sum(p.stat().st_size for p in fig_dir.glob("*.png"))
+
+
+def curve(records: list[dict], run: str, scales: list[int]) -> str:
+    """Seconds per step and scale, and the log-log slope between the two largest scales."""
+    seconds = {r["step"]: r["seconds"] for r in records if r["run"] == run}
+    lines = [f"{'step':<20} " + " ".join(f"{n:>12,}" for n in scales) + f" {'slope':>7}"]
+    for step in STEPS:
+        row = [seconds.get(f"{step}@{n}") for n in scales]
+        if all(s is None for s in row):
+            continue
+        slope = "-"
+        if len(scales) > 1 and row[-1] and row[-2]:
+            slope = f"{math.log(row[-1] / row[-2]) / math.log(scales[-1] / scales[-2]):.2f}"
+        lines.append(f"{step:<20} " + " ".join(f"{s:>11.2f}s" if s is not None else f"{'-':>12}" for s in row) + f" {slope:>7}")
+    return "\n".join(lines)
+
+
+def _baseline_run(records: list[dict], run: str, commit: str) -> str | None:
+    """The last run before `run` recorded at a different commit."""
+    runs = [r for r in dict.fromkeys(rec["run"] for rec in records) if r != run]
+    commits = {rec["run"]: rec.get("commit") for rec in records}
+    for candidate in reversed(runs):
+        if commits.get(candidate) != commit:
+            return candidate
+    return None
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", default=DEFAULT_SCALES, help=f"Comma-separated row counts (default: {DEFAULT_SCALES})")
+    parser.add_argument("--data-dir", default=str(ROOT / "bench" / "data"), help="Generated data, one folder per scale")
+    parser.add_argument("--results", default=str(ROOT / "bench" / "results" / "scaling.jsonl"))
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--malformed", type=float, default=0.01)
+    parser.add_argument("--engines", default="spark,local", help="Comma-separated: spark, local (default: both)")
+    parser.add_argument("--no-figures", action="store_true")
+    parser.add_argument("--no-warmup", action="store_true", help="Skip the untimed pass over the smallest scale")
+    parser.add_argument("--shuffle-partitions", type=int, default=None, help="Default: Spark's default, like spark_explore_output.py")
+    parser.add_argument("--compare", action="store_true", help="Diff against the last run of another commit")
+    args = parser.parse_args()
+
+    scales = sorted(int(s) for s in args.scales.split(","))
+    engines = {e.strip() for e in args.engines.split(",")}
+    data_dir = Path(args.data_dir)
+    commit = git_commit()
+
+    spark = gen.spark_session("recruitment-bench-scaling", args.shuffle_partitions)
+    metrics = RunMetrics(Path(args.results), spark)
+
+    # Generation is recorded in the report, but is not part of the curve.
+    partitions = spark.conf.get("spark.sql.shuffle.partitions")
+    spark.conf.set("spark.sql.shuffle.partitions", "8")
+    for n in scales:
+        if not gen.is_current(data_dir / str(n), n, args.seed, args.malformed):
+            with metrics.step(f"generate@{n}", "generate", rows=n, commit=commit, seed=args.seed) as record:
+                stamp = gen.generate(spark, data_dir / str(n), n, args.seed, args.malformed)
+                record["rows_out"] = stamp["tables"]["job_base_clean"]
+    spark.conf.set("spark.sql.shuffle.partitions", partitions)
+
+    with tempfile.TemporaryDirectory(prefix="bench_scaling_") as tmp:
+        tmp = Path(tmp)
+        if not args.no_warmup:
+            # JIT, Python worker and Arrow start-up would otherwise land on the smallest scale.
+            warmup = RunMetrics(tmp / "warmup.jsonl", spark)
+            for name in ["warmup_spark", "warmup_local"]:
+                tmp.joinpath(name).mkdir()
+            if "spark" in engines:
+                _spark_steps(spark, warmup, data_dir / str(scales[0]) / "output", tmp / "warmup_spark", scales[0], {})
+            if "local" in engines:
+                _local_steps(warmup, data_dir / str(scales[0]) / "output", tmp / "warmup_local", scales[0], {})
+
+        for n in scales:
+            output_dir = data_dir / str(n) / "output"
+            tags = {"rows": n, "commit": commit, "seed": args.seed}
+            spark_viz, local_viz = tmp / f"spark_viz_{n}", tmp / f"local_viz_{n}"
+            spark_viz.mkdir()
+            local_viz.mkdir()
+            if "spark" in engines:
+                _spark_steps(spark, metrics, output_dir, spark_viz, n, tags)
+            if "local" in engines:
+                _local_steps(metrics, output_dir, local_viz, n, tags)
+            if not args.no_figures:
+                _figure_step(metrics, spark_viz if "spark" in engines else local_viz, tmp / f"figures_{n}", n, tags)
+            print(f"{n:,} rows done", flush=True)
+    spark.stop()
+
+    records = run_metrics.load_report(Path(args.results))
+    print(f"\nrun {metrics.run_id} at {commit} (report: {args.results})")
+    print(curve(records, metrics.run_id, scales))
+    if args.compare:
+        baseline = _baseline_run(records, metrics.run_id, commit)
+        if baseline is None:
+            print("\nno run of another commit to compare with")
+            return 0
+        text, flagged = run_metrics.compare(records, baseline, metrics.run_id)
+        print("\n" + text)
+        return 1 if flagged else 0
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,120 @@
+"""Benchmark the requirement cube on strings vs. on vocabulary ids.
+
+Builds a synthetic job_base_clean with long Vietnamese skill/requirement
+lists, then runs spark_requirements.requirement_cube twice: grouping on the
+(dimension, value) strings and grouping on int token ids (spark_vocab).
+Reports wall time and the shuffle bytes written, read from the Spark UI
+REST API.
+
+Usage:
+    python bench/bench_token_vocab.py --rows 500000 --vocab 50000
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+
+_WORDS = [
+    "kỹ năng", "giao tiếp", "tiếng Anh", "thành thạo", "quản lý", "dự án",
+    "phân tích", "dữ liệu", "bán hàng", "chăm sóc", "khách hàng", "kế toán",
+    "tổng hợp", "thiết kế", "đồ họa", "lập trình", "hệ thống", "vận hành",
+]
+
+
+def write_synthetic_job_base_clean(out_dir: Path, rows: int, vocab: int, seed: int = 3) -> None:
+    rnd = random.Random(seed)
+    tokens = [" ".join(rnd.sample(_WORDS, 4)) + f" {i}" for i in range(vocab)]
+    out_dir.mkdir(parents=True, exist_ok=True)
+    with open(out_dir / "part-m-00000", "w", encoding="utf-8") as f:
+        for job_id in range(1, rows + 1):
+            skills = ", ".join(rnd.choices(tokens, k=rnd.randint(2, 8)))
+            reqs = "; ".join(rnd.choices(tokens, k=rnd.randint(1, 5)))
+            f.write(
+                "\t".join(
+                    [
+                        str(job_id),
+                        f"Nhân viên {job_id % 997}",
+                        rnd.choice(["Kinh doanh > Bán hàng", "Kế toán / Kiểm toán", "IT Phần mềm"]),
+                        "Lĩnh vực",
+                        "Hồ Chí Minh",
+                        rnd.choice(["1 năm", "2 năm", "Không yêu cầu", "5 năm"]),
+                        reqs,
+                        skills,
+                        "Đại học trở lên",
+                        "Toàn thời gian",
+                    ]
+                )
+                + "\n"
+            )
+
+
+def _shuffle_write_bytes(spark, group: str) -> int:
+    sc = spark.sparkContext
+    tracker = sc.statusTracker()
+    stage_ids = {
+        s for job in tracker.getJobIdsForGroup(group) for s in tracker.getJobInfo(job).stageIds
+    }
+    url = f"{sc.uiWebUrl}/api/v1/applications/{sc.applicationId}/stages"
+    with urllib.request.urlopen(url) as resp:
+        stages = json.load(resp)
+    return sum(s["shuffleWriteBytes"] for s in stages if s["stageId"] in stage_ids)
+
+
+def _run(spark, label: str, df) -> None:
+    group = f"bench-{label}"
+    spark.sparkContext.setJobGroup(group, label)
+    t0 = time.perf_counter()
+    df.write.format("noop").mode("overwrite").save()
+    elapsed = time.perf_counter() - t0
+    spark.sparkContext.setJobGroup("", "")
+    mb = _shuffle_write_bytes(spark, group) / 1e6
+    print(f"{label:<26} {elapsed:8.2f}s  shuffle write {mb:10.1f} MB")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--vocab", type=int, default=50_000, help="Distinct skill/requirement tokens")
+    args = parser.parse_args()
+
+    from pyspark import StorageLevel
+    from pyspark.sql import SparkSession
+
+    import spark_explore_output as seo
+    import spark_vocab
+    from spark_requirements import requirement_cube, requirement_long
+
+    spark = SparkSession.builder.master("local[*]").getOrCreate()
+    spark.sparkContext.setLogLevel("WARN")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = Path(tmp, "job_base_clean")
+        write_synthetic_job_base_clean(data_dir, args.rows, args.vocab)
+        job_base = seo.load_job_base_clean(spark, seo._file_glob(data_dir, "part-*"))
+        job_base = job_base.persist(StorageLevel.MEMORY_AND_DISK)
+        job_base.count()
+
+        vocab = spark_vocab.extend_vocabulary(requirement_long(job_base), None)
+        vocab = vocab.persist(StorageLevel.MEMORY_AND_DISK)
+        print(f"{args.rows:,} jobs, {vocab.count():,} tokens")
+
+        _run(spark, "cube on strings", requirement_cube(job_base))
+        _run(spark, "cube on token ids", requirement_cube(job_base, vocab=vocab))
+
+    spark.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
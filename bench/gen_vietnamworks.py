@@ -0,0 +1,459 @@
+"""Synthetic VietnamWorks crawl and the matching Pig output trees.
+
+Writes, under <out-dir>:
+
+- vietnamworks_detailed_jobs.jsonl: one posting per line with the nine
+  crawl keys (see spark_job_base.JOB_FIELDS). Values follow the shape of
+  the real crawl: province strings with and without diacritics, NFC and
+  NFD forms, district prefixes and multi-location lists; industries,
+  skills and titles drawn from Zipf distributions, with a skill vocabulary
+  that grows with the row count (long tail); and a share of malformed
+  rows (empty or tab-split titles, truncated JSON, missing keys, arrays
+  where strings are expected, BOMs).
+- output/: job_base_clean, industry_total, industry_by_location,
+  industry_province_titles and requirement_analysis/* as PigStorage
+  part-* files, derived from the JSONL by the Spark ports of the Pig
+  scripts (spark_job_base, spark_industry, spark_requirements), so the
+  trees match the crawl exactly.
+
+The same --rows / --seed / --malformed always give the same files. A
+_generator.json stamp records them; bench_scaling.py reuses a folder
+whose stamp matches.
+
+Usage:
+    python bench/gen_vietnamworks.py --rows 100000 --out-dir bench/data/100000
+    python bench/gen_vietnamworks.py --rows 10000000 --out-dir /data/vnw10m --no-trees
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+import unicodedata
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+# Bump when the generated data changes for the same arguments.
+GENERATOR_VERSION = 1
+STAMP_FILE = "_generator.json"
+JSONL_NAME = "vietnamworks_detailed_jobs.jsonl"
+CHUNK_ROWS = 100_000
+
+# (raw location, weight); the weights roughly follow the crawl, where
+# Ho Chi Minh City and Ha Noi hold most postings.
+_LOCATIONS = [
+    ("Hồ Chí Minh", 20),
+    ("TP. Hồ Chí Minh", 6),
+    ("TP.HCM", 4),
+    ("Quận 1, TP.HCM", 3),
+    ("Quận 7, Hồ Chí Minh", 2),
+    ("Thủ Đức, Hồ Chí Minh", 1.5),
+    ("Ho Chi Minh", 1.5),
+    ("Hà Nội", 18),
+    ("Cầu Giấy, Hà Nội", 3),
+    ("Ha Noi", 1.5),
+    ("Hanoi", 1),
+    ("Hà Nội, Hồ Chí Minh", 2),
+    ("Đà Nẵng", 4),
+    ("Hải Châu, Đà Nẵng", 0.5),
+    ("Bình Dương", 4),
+    ("Thủ Dầu Một, Bình Dương", 0.5),
+    ("Đồng Nai", 3),
+    ("Biên Hòa, Đồng Nai", 0.5),
+    ("Bắc Ninh", 2),
+    ("Hải Phòng", 2),
+    ("Long An", 1),
+    ("Cần Thơ", 1),
+    ("Khánh Hòa", 0.6),
+    ("Nha Trang, Khánh Hoà", 0.4),
+    ("Bà Rịa - Vũng Tàu", 0.8),
+    ("Hưng Yên", 0.8),
+    ("Vĩnh Phúc", 0.6),
+    ("Quảng Ninh", 0.6),
+    ("Thanh Hóa", 0.5),
+    ("Nghệ An", 0.5),
+    ("Lâm Đồng", 0.3),
+    ("Thừa Thiên Huế", 0.3),
+    ("Quảng Nam", 0.3),
+    ("Tây Ninh", 0.3),
+    ("Kiên Giang", 0.2),
+    ("Japan", 0.3),
+    ("Nước Ngoài", 0.3),
+    ("Singapore", 0.1),
+    ("Không hiển thị", 2),
+    ("", 0.5),
+]
+
+# Zipf-ranked: the first entries are the most frequent.
+_INDUSTRIES = [
+    "Kinh doanh > Bán hàng",
+    "Công nghệ thông tin > Phần mềm",
+    "Kế toán / Kiểm toán",
+    "Marketing > Digital Marketing",
+    "Hành chính / Thư ký",
+    "Sản xuất > Vận hành sản xuất",
+    "Kỹ thuật > Cơ khí",
+    "Xây dựng",
+    "Chăm sóc khách hàng",
+    "Nhân sự",
+    "Ngân hàng, Tài chính",
+    "Logistics > Xuất nhập khẩu",
+    "Điện / Điện tử",
+    "Bất động sản",
+    "Giáo dục / Đào tạo",
+    "Y tế / Dược",
+    "Thiết kế > Đồ họa",
+    "Khách sạn / Nhà hàng",
+    "Luật / Pháp lý",
+    "Bảo hiểm",
+    "Dệt may / Da giày",
+    "Thực phẩm & Đồ uống",
+    "Nông nghiệp",
+    "Hóa học / Sinh học",
+    "Viễn thông",
+    "Du lịch",
+    "Truyền thông / Báo chí",
+    "Kiến trúc",
+    "Môi trường",
+    "Hàng không",
+    "Không hiển thị",
+]
+
+_SECTORS = [
+    "Bán lẻ",
+    "Phần mềm",
+    "Sản xuất",
+    "Dịch vụ tài chính",
+    "Xây dựng",
+    "Logistics",
+    "Giáo dục",
+    "Y tế",
+    "Không hiển thị",
+]
+
+_SKILLS = [
+    "Giao tiếp",
+    "Excel",
+    "Tiếng Anh",
+    "Bán hàng",
+    "Làm việc nhóm",
+    "SQL",
+    "Kế toán",
+    "Marketing",
+    "Đàm phán",
+    "Python",
+    "Java",
+    "Quản lý dự án",
+    "Chăm sóc khách hàng",
+    "Photoshop",
+    "AutoCAD",
+    "JavaScript",
+    "Phân tích dữ liệu",
+    "Tiếng Nhật",
+    "Tiếng Trung",
+    "Power BI",
+    "SAP",
+    "React",
+    "Docker",
+    "Kỹ năng thuyết trình",
+    "Quản lý thời gian",
+    "Lập kế hoạch",
+    "Tư duy logic",
+    "Xuất nhập khẩu",
+    "Thuế",
+    "Tuyển dụng",
+]
+
+_TITLE_ROLES = ["Nhân viên", "Chuyên viên", "Trưởng phòng", "Trợ lý", "Thực tập sinh", "Giám sát", "Senior", "Junior"]
+_TITLE_FIELDS = [
+    "Kinh doanh",
+    "Kế toán",
+    "Marketing",
+    "IT",
+    "Nhân sự",
+    "Kho vận",
+    "Bán hàng",
+    "Kỹ thuật",
+    "Thiết kế",
+    "Chăm sóc khách hàng",
+    "Data Engineer",
+    "Backend Developer",
+]
+
+_EXPERIENCE = [
+    ("Không yêu cầu", 4),
+    ("Dưới 1 năm", 2),
+    ("1 năm", 4),
+    ("2 năm", 4),
+    ("3 năm", 3),
+    ("5 năm", 2),
+    ("Trên 10 năm", 0.5),
+    ("Không hiển thị", 1),
+]
+_EDUCATION = [
+    ("Đại học trở lên", 6),
+    ("Cao đẳng trở lên", 3),
+    ("Trung cấp trở lên", 1.5),
+    ("Trung học", 0.5),
+    ("Sau đại học", 0.3),
+    ("Không yêu cầu", 1.5),
+    ("Không hiển thị", 1),
+]
+_EMPLOYMENT = [
+    ("Toàn thời gian", 10),
+    ("Bán thời gian", 1),
+    ("Thực tập", 0.7),
+    ("Hợp đồng", 0.5),
+    ("Freelance", 0.2),
+    ("Không hiển thị", 0.5),
+]
+_REQUIREMENTS = [
+    "Tiếng Anh giao tiếp",
+    "Chịu được áp lực công việc",
+    "Thành thạo Excel",
+    "Có laptop cá nhân",
+    "Tốt nghiệp đại học",
+    "Kỹ năng giao tiếp tốt",
+    "Trung thực, cẩn thận",
+    "Ưu tiên có kinh nghiệm",
+]
+
+
+def zipf_weights(n: int, s: float = 1.1) -> np.ndarray:
+    w = 1.0 / np.arange(1, n + 1, dtype=np.float64) ** s
+    return w / w.sum()
+
+
+def _weighted(pairs: list[tuple[str, float]]) -> tuple[list[str], np.ndarray]:
+    values = [v for v, _ in pairs]
+    w = np.array([w for _, w in pairs], dtype=np.float64)
+    return values, w / w.sum()
+
+
+def skill_vocabulary(rows: int) -> list[str]:
+    """The common skills plus a long tail that grows like Heaps' law (~ sqrt(rows))."""
+    tail = int(4 * rows**0.5)
+    return _SKILLS + [f"Kỹ năng chuyên môn {k}" for k in range(1, tail + 1)]
+
+
+def _variant(loc: str, u: float) -> str:
+    # Same province, different encodings: 10% NFD (decomposed diacritics),
+    # 5% upper case, 5% with a trailing separator.
+    if u < 0.10:
+        return unicodedata.normalize("NFD", loc)
+    if u < 0.15:
+        return loc.upper()
+    if u < 0.20:
+        return f"{loc} |"
+    return loc
+
+
+def _malformed(kind: int, job: dict, i: int) -> str:
+    """One broken line; `kind` cycles through the failure modes seen in the crawl."""
+    if kind == 0:  # no title: dropped by job_explore_base.pig
+        job["Tên công việc"] = "  "
+    elif kind == 1:  # embedded tab / newline: flattened to spaces
+        job["Tên công việc"] = f"{job['Tên công việc']}\t(gấp)\nLương cao"
+    elif kind == 2:  # truncated line: unparseable, dropped
+        return json.dumps(job, ensure_ascii=False)[: 20 + i % 40]
+    elif kind == 3:  # only a few keys
+        job = {"Tên công việc": job["Tên công việc"], "Địa điểm": job["Địa điểm"]}
+    elif kind == 4:  # array instead of a string
+        job["Kỹ năng"] = [s.strip() for s in job["Kỹ năng"].split(",")]
+    elif kind == 5:  # BOM in the middle of the file
+        return "\ufeff" + json.dumps(job, ensure_ascii=False)
+    else:  # extra nested keys
+        job["Phúc lợi"] = {"Bảo hiểm": True, "Du lịch": ["Đà Lạt", "Nha Trang"]}
+    return json.dumps(job, ensure_ascii=False)
+
+
+_MALFORMED_KINDS = 7
+
+
+def write_jsonl(path: Path, rows: int, seed: int = 7, malformed: float = 0.01) -> int:
+    """Write `rows` postings; returns the number of malformed lines."""
+    rng = np.random.default_rng(seed)
+    locations, loc_p = _weighted(_LOCATIONS)
+    experience, exp_p = _weighted(_EXPERIENCE)
+    education, edu_p = _weighted(_EDUCATION)
+    employment, emp_p = _weighted(_EMPLOYMENT)
+    skills = skill_vocabulary(rows)
+    ind_p, skill_p = zipf_weights(len(_INDUSTRIES), 1.0), zipf_weights(len(skills), 1.1)
+    title_p = zipf_weights(len(_TITLE_FIELDS), 0.8)
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.tmp")
+    n_bad = 0
+    with open(tmp, "w", encoding="utf-8", newline="\n") as f:
+        # The crawl file starts with a BOM.
+        f.write("\ufeff")
+        for start in range(0, rows, CHUNK_ROWS):
+            n = min(CHUNK_ROWS, rows - start)
+            loc = rng.choice(len(locations), n, p=loc_p)
+            loc_u = rng.random(n)
+            ind = rng.choice(len(_INDUSTRIES), n, p=ind_p)
+            sec = rng.integers(0, len(_SECTORS), n)
+            exp = rng.choice(len(experience), n, p=exp_p)
+            edu = rng.choice(len(education), n, p=edu_p)
+            emp = rng.choice(len(employment), n, p=emp_p)
+            role = rng.integers(0, len(_TITLE_ROLES), n)
+            field = rng.choice(len(_TITLE_FIELDS), n, p=title_p)
+            n_skills = rng.integers(1, 9, n)
+            skill_idx = rng.choice(len(skills), int(n_skills.sum()), p=skill_p)
+            skill_end = np.cumsum(n_skills)
+            req = rng.integers(0, len(_REQUIREMENTS), (n, 2))
+            bad = rng.random(n) < malformed
+
+            lines = []
+            for j in range(n):
+                i = start + j
+                job_skills = skill_idx[skill_end[j] - n_skills[j] : skill_end[j]]
+                job = {
+                    "Tên công việc": f"{_TITLE_ROLES[role[j]]} {_TITLE_FIELDS[field[j]]}",
+                    "Ngành nghề": _INDUSTRIES[ind[j]],
+                    "Lĩnh vực": _SECTORS[sec[j]],
+                    "Địa điểm": _variant(locations[loc[j]], loc_u[j]),
+                    "Số năm kinh nghiệm": experience[exp[j]],
+                    "Yêu cầu công việc": f"{_REQUIREMENTS[req[j, 0]]}, {_REQUIREMENTS[req[j, 1]]}",
+                    "Kỹ năng": ", ".join(skills[k] for k in job_skills),
+                    "Trình độ học vấn": education[edu[j]],
+                    "Loại hình làm việc": employment[emp[j]],
+                    "URL": f"https://www.vietnamworks.com/job-{i + 1}-jv",
+                }
+                if bad[j]:
+                    lines.append(_malformed(n_bad % _MALFORMED_KINDS, job, i))
+                    n_bad += 1
+                else:
+                    lines.append(json.dumps(job, ensure_ascii=False))
+            f.write("\n".join(lines))
+            f.write("\n")
+    os.replace(tmp, path)
+    return n_bad
+
+
+def build_trees(spark, jsonl: Path, output_dir: Path) -> dict[str, int]:
+    """Run the Spark ports of the Pig scripts on `jsonl`; returns the rows per table."""
+    from pyspark import StorageLevel
+
+    from spark_explore_output import _file_glob, load_job_base_clean
+    from spark_industry import _write_multistorage, industry_rows, industry_tables
+    from spark_job_base import build_job_base_clean, write_pig_tsv
+    from spark_requirements import REQUIREMENT_DIMENSIONS, requirement_cube, split_requirement_tables
+
+    def _out(*parts: str) -> str:
+        return str(output_dir.joinpath(*parts).resolve()).replace("\\", "/")
+
+    write_pig_tsv(build_job_base_clean(spark, str(jsonl.resolve()).replace("\\", "/")), _out("job_base_clean"))
+    # Read back through the PigStorage loader, like the downstream Pig scripts.
+    job_base_clean = load_job_base_clean(spark, _file_glob(output_dir, "job_base_clean", "part-*"))
+    job_base_clean = job_base_clean.persist(StorageLevel.MEMORY_AND_DISK)
+    counts = {"job_base_clean": job_base_clean.count()}
+
+    rows = industry_rows(job_base_clean).persist(StorageLevel.MEMORY_AND_DISK)
+    for name, df in industry_tables(rows).items():
+        if name == "industry_province_titles":
+            _write_multistorage(df, output_dir.joinpath(name), "location_slug")
+        else:
+            write_pig_tsv(df, _out(name))
+    rows.unpersist()
+
+    cube = requirement_cube(job_base_clean).persist(StorageLevel.MEMORY_AND_DISK)
+    for name, df in split_requirement_tables(cube).items():
+        write_pig_tsv(df.orderBy("industry_code", REQUIREMENT_DIMENSIONS[name]), _out("requirement_analysis", name))
+    counts["requirement_cube"] = cube.count()
+    cube.unpersist()
+    job_base_clean.unpersist()
+    return counts
+
+
+def _stamp(rows: int, seed: int, malformed: float) -> dict:
+    return {"version": GENERATOR_VERSION, "rows": rows, "seed": seed, "malformed": malformed}
+
+
+def is_current(out_dir: Path, rows: int, seed: int, malformed: float, trees: bool = True) -> bool:
+    """True if `out_dir` already holds this data set (and its trees, if asked)."""
+    try:
+        with open(out_dir / STAMP_FILE, encoding="utf-8") as f:
+            stamp = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return {k: stamp.get(k) for k in _stamp(rows, seed, malformed)} == _stamp(rows, seed, malformed) and (
+        stamp.get("trees", False) or not trees
+    )
+
+
+def generate(spark, out_dir: Path, rows: int, seed: int = 7, malformed: float = 0.01, trees: bool = True) -> dict:
+    """Write the JSONL (and, with a SparkSession, the trees); returns the stamp."""
+    out_dir.mkdir(parents=True, exist_ok=True)
+    stamp_path = out_dir / STAMP_FILE
+    stamp_path.unlink(missing_ok=True)
+
+    t0 = time.perf_counter()
+    stamp = _stamp(rows, seed, malformed)
+    stamp["malformed_rows"] = write_jsonl(out_dir / JSONL_NAME, rows, seed, malformed)
+    stamp["jsonl_seconds"] = round(time.perf_counter() - t0, 2)
+    stamp["trees"] = False
+    if trees:
+        t0 = time.perf_counter()
+        stamp["tables"] = build_trees(spark, out_dir / JSONL_NAME, out_dir / "output")
+        stamp["trees_seconds"] = round(time.perf_counter() - t0, 2)
+        stamp["trees"] = True
+    with open(stamp_path, "w", encoding="utf-8") as f:
+        json.dump(stamp, f, indent=2, ensure_ascii=False)
+    return stamp
+
+
+def spark_session(app_name: str = "recruitment-bench", shuffle_partitions: int | None = None):
+    """Local session configured like spark_explore_output.py (Spark's default shuffle partitions unless given)."""
+    from pyspark.sql import SparkSession
+
+    os.environ.setdefault("PYSPARK_PYTHON", sys.executable)
+    os.environ.setdefault("PYSPARK_DRIVER_PYTHON", sys.executable)
+    builder = (
+        SparkSession.builder.appName(app_name)
+        .master("local[*]")
+        .config("spark.pyspark.python", sys.executable)
+        .config("spark.pyspark.driver.python", sys.executable)
+        .config("spark.sql.execution.arrow.pyspark.enabled", "true")
+        .config("spark.scheduler.mode", "FAIR")
+        .config("spark.ui.showConsoleProgress", "false")
+    )
+    if shuffle_partitions:
+        builder = builder.config("spark.sql.shuffle.partitions", str(shuffle_partitions))
+    spark = builder.getOrCreate()
+    spark.sparkContext.setLogLevel("WARN")
+    return spark
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--out-dir", required=True)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--malformed", type=float, default=0.01, help="Share of malformed lines (default: 0.01)")
+    parser.add_argument("--no-trees", action="store_true", help="Only write the JSONL (no Spark needed)")
+    parser.add_argument(
+        "--shuffle-partitions",
+        type=int,
+        default=8,
+        help="spark.sql.shuffle.partitions while deriving the trees; also the part-* count of the sorted tables (default: 8)",
+    )
+    args = parser.parse_args()
+
+    spark = None if args.no_trees else spark_session("recruitment-bench-generate", args.shuffle_partitions)
+    stamp = generate(spark, Path(args.out_dir), args.rows, args.seed, args.malformed, trees=not args.no_trees)
+    print(json.dumps(stamp, indent=2, ensure_ascii=False))
+    if spark is not None:
+        spark.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
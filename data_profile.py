@@ -0,0 +1,266 @@
+"""Single-pass data-quality profile of job_base_clean.
+
+job_explore_base.pig computes data_quality_stats with GROUP ALL and three
+nested FILTERs (one reducer, three columns), and spark_explore_output.py
+scanned job_base_clean once more for the column-count distribution. This
+profile computes everything in one `agg` (partial aggregation on every
+partition, so no single-reducer funnel):
+
+- per column: null, empty, 'Không hiển thị' counts and rates, approximate
+  distinct count (HyperLogLog++), string length min / max / mean and a
+  length histogram
+- the tab-split column count (_ncols) distribution and anomalies
+- the data_quality_stats numbers of job_explore_base.pig
+
+Columns are reported under the Pig names (mahout_id, raw_title, ...). The
+JSON report carries a stamp of the input files; spark_explore_output.py
+reuses a report whose stamp still matches instead of scanning again.
+
+Usage:
+    python data_profile.py --output-dir output
+    python data_profile.py --output-dir output --input-format parquet --report /tmp/profile.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+from pyspark.sql import DataFrame, SparkSession, functions as F
+
+from local_io import atomic_output
+from spark_explore_output import JOB_BASE_CLEAN_SCHEMA, _file_glob, load_job_base_clean
+from spark_job_base import JOB_BASE_COLUMNS
+
+NOT_DISPLAYED = "Không hiển thị"
+EXPECTED_NCOLS = len(JOB_BASE_COLUMNS)
+
+# Upper bounds (exclusive) of the string length buckets; the last is open.
+LENGTH_BUCKETS = [1, 10, 50, 100, 500, 1000]
+# _ncols values counted one by one; larger ones share the last bucket.
+MAX_NCOLS = 2 * EXPECTED_NCOLS
+
+# job_explore_base.pig data_quality_stats column -> profiled column
+DATA_QUALITY_COLUMNS = {
+    "jobs_with_sector": "raw_sec",
+    "jobs_with_skills": "raw_skill",
+    "jobs_with_requirement": "raw_req",
+}
+
+
+def _bucket_labels() -> list[str]:
+    bounds = [0] + LENGTH_BUCKETS
+    labels = ["0" if hi == 1 else f"{lo}-{hi - 1}" for lo, hi in zip(bounds, LENGTH_BUCKETS)]
+    return labels + [f"{LENGTH_BUCKETS[-1]}+"]
+
+
+def _columns(df: DataFrame) -> dict[str, F.Column]:
+    """Pig name -> column, for job_base (Pig names) and job_base_clean (loader names)."""
+    if "mahout_id" in df.columns:
+        return {name: F.col(name) for name in JOB_BASE_COLUMNS}
+    return {pig: F.col(field.name) for pig, field in zip(JOB_BASE_COLUMNS, JOB_BASE_CLEAN_SCHEMA.fields)}
+
+
+def _count_if(cond: F.Column) -> F.Column:
+    return F.sum(F.when(cond, 1).otherwise(0))
+
+
+def profile_aggregates(df: DataFrame) -> list[F.Column]:
+    """All profile measures as aggregate expressions, named <column>__<measure>."""
+    aggs = [F.count(F.lit(1)).alias("rows")]
+    labels = _bucket_labels()
+    for name, col in _columns(df).items():
+        aggs += [
+            _count_if(col.isNull()).alias(f"{name}__null"),
+            F.approx_count_distinct(col).alias(f"{name}__approx_distinct"),
+        ]
+        if name == "mahout_id":
+            continue
+        trimmed = F.trim(col)
+        length = F.length(col)
+        aggs += [
+            _count_if(col.isNotNull() & (trimmed == "")).alias(f"{name}__empty"),
+            _count_if(trimmed == NOT_DISPLAYED).alias(f"{name}__not_displayed"),
+            # job_explore_base.pig: IS NOT NULL AND != 'Không hiển thị'
+            _count_if(col.isNotNull() & (col != NOT_DISPLAYED)).alias(f"{name}__valid"),
+            F.min(length).alias(f"{name}__length_min"),
+            F.max(length).alias(f"{name}__length_max"),
+            F.avg(length).alias(f"{name}__length_mean"),
+        ]
+        lower = 0
+        for upper, label in zip(LENGTH_BUCKETS + [None], labels):
+            cond = length >= lower if upper is None else length.between(lower, upper - 1)
+            aggs.append(_count_if(cond).alias(f"{name}__length_{label}"))
+            lower = upper
+
+    ncols = F.col("_ncols") if "_ncols" in df.columns else F.lit(EXPECTED_NCOLS)
+    aggs += [_count_if(ncols == n).alias(f"_ncols__{n}") for n in range(1, MAX_NCOLS + 1)]
+    aggs.append(_count_if(ncols > MAX_NCOLS).alias(f"_ncols__{MAX_NCOLS + 1}+"))
+    return aggs
+
+
+def _rate(n: int, rows: int) -> float | None:
+    return round(n / rows, 6) if rows else None
+
+
+def shape_report(row: dict, source: dict | None = None) -> dict:
+    """The aggregated row as the nested JSON report."""
+    rows = row["rows"]
+    columns = {}
+    for name in JOB_BASE_COLUMNS:
+        col = {"null": row[f"{name}__null"], "null_rate": _rate(row[f"{name}__null"], rows)}
+        if name != "mahout_id":
+            for measure in ["empty", "not_displayed"]:
+                col[measure] = row[f"{name}__{measure}"]
+                col[f"{measure}_rate"] = _rate(row[f"{name}__{measure}"], rows)
+            col["valid"] = row[f"{name}__valid"]
+            mean = row[f"{name}__length_mean"]
+            col["length"] = {
+                "min": row[f"{name}__length_min"],
+                "max": row[f"{name}__length_max"],
+                "mean": round(mean, 2) if mean is not None else None,
+                "histogram": {label: row[f"{name}__length_{label}"] for label in _bucket_labels()},
+            }
+        col["approx_distinct"] = row[f"{name}__approx_distinct"]
+        columns[name] = col
+
+    histogram = {key[len("_ncols__") :]: n for key, n in row.items() if key.startswith("_ncols__") and n}
+    ok = histogram.get(str(EXPECTED_NCOLS), 0)
+    return {
+        "generated_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "source": source or {},
+        "rows": rows,
+        "columns": columns,
+        "ncols": {
+            "expected": EXPECTED_NCOLS,
+            "ok": ok,
+            "anomalies": rows - ok,
+            "anomaly_rate": _rate(rows - ok, rows),
+            "histogram": histogram,
+        },
+        "data_quality_stats": {
+            "report_name": "Data_Quality_Report",
+            "total_jobs": rows,
+            **{out: row[f"{name}__valid"] for out, name in DATA_QUALITY_COLUMNS.items()},
+        },
+    }
+
+
+def profile(df: DataFrame, source: dict | None = None) -> dict:
+    """Profile `df` (job_base or job_base_clean) in one Spark job."""
+    return shape_report(df.agg(*profile_aggregates(df)).first().asDict(), source)
+
+
+def source_stamp(path_glob: str) -> dict:
+    """Hash of (path, size, mtime) of the input files; changes when they are rewritten."""
+    h = hashlib.sha256()
+    files = sorted(p for p in glob.glob(path_glob, recursive=True) if os.path.isfile(p))
+    for path in files:
+        st = os.stat(path)
+        h.update(f"{path}\0{st.st_size}\0{st.st_mtime_ns}\n".encode("utf-8"))
+    return {"path": path_glob, "files": len(files), "stamp": h.hexdigest()}
+
+
+def write_report(report: dict, path: Path) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with atomic_output(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+def load_report(path: Path, source: dict) -> dict | None:
+    """The report at `path` if it was computed from the same input files."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            report = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return report if report.get("source", {}).get("stamp") == source["stamp"] else None
+
+
+def cached_profile(df: DataFrame, path: Path, source: dict) -> tuple[dict, bool]:
+    """(report, reused): the stored report when still current, else a fresh profile (written to `path`)."""
+    report = load_report(path, source)
+    if report is not None:
+        return report, True
+    report = profile(df, source)
+    write_report(report, path)
+    return report, False
+
+
+def format_ncols(report: dict) -> str:
+    ncols = report["ncols"]
+    lines = [f"{'_ncols':>7} {'count':>10}"]
+    lines += [f"{key:>7} {n:>10}" for key, n in ncols["histogram"].items()]
+    lines.append(f"{ncols['anomalies']} of {report['rows']} rows without {ncols['expected']} columns")
+    return "\n".join(lines)
+
+
+def format_columns(report: dict) -> str:
+    lines = [f"{'column':<12} {'null':>8} {'empty':>8} {'hidden':>8} {'distinct~':>10} {'len mean':>9} {'len max':>8}"]
+    for name, col in report["columns"].items():
+        length = col.get("length", {})
+        lines.append(
+            f"{name:<12} {col['null_rate']:>8.2%} {col.get('empty_rate') or 0:>8.2%} "
+            f"{col.get('not_displayed_rate') or 0:>8.2%} {col['approx_distinct']:>10} "
+            f"{length.get('mean') if length.get('mean') is not None else '-':>9} {length.get('max') or '-':>8}"
+        )
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Single-pass data-quality profile of job_base_clean")
+    parser.add_argument(
+        "--output-dir",
+        default=str(Path(__file__).parent.joinpath("output")),
+        help="Path to the Pig output folder (default: ./output)",
+    )
+    parser.add_argument(
+        "--input-format",
+        default="tsv",
+        choices=["tsv", "parquet"],
+        help="Read job_base_clean from the Pig part-* files or the Parquet store",
+    )
+    parser.add_argument("--store-dir", default=None, help="Parquet store directory (default: <output-dir>/store)")
+    parser.add_argument("--report", default=None, help="JSON report (default: <output-dir>/data_profile.json)")
+    args = parser.parse_args()
+    output_dir = Path(args.output_dir)
+    store_dir = Path(args.store_dir) if args.store_dir else output_dir.joinpath("store")
+    report_path = Path(args.report) if args.report else output_dir.joinpath("data_profile.json")
+
+    os.environ.setdefault("PYSPARK_PYTHON", sys.executable)
+    os.environ.setdefault("PYSPARK_DRIVER_PYTHON", sys.executable)
+
+    spark = (
+        SparkSession.builder.appName("recruitment-data-profile")
+        .master("local[*]")
+        .config("spark.pyspark.python", sys.executable)
+        .config("spark.pyspark.driver.python", sys.executable)
+        .getOrCreate()
+    )
+    spark.sparkContext.setLogLevel("WARN")
+
+    if args.input_format == "parquet":
+        path_glob = _file_glob(store_dir, "job_base_clean", "**", "*.parquet")
+        job_base_clean = spark.read.parquet(_file_glob(store_dir, "job_base_clean"))
+    else:
+        path_glob = _file_glob(output_dir, "job_base_clean", "part-*")
+        job_base_clean = load_job_base_clean(spark, path_glob)
+
+    report = profile(job_base_clean, source_stamp(path_glob))
+    write_report(report, report_path)
+    spark.stop()
+
+    print(format_columns(report))
+    print()
+    print(format_ncols(report))
+    print(f"\nreport: {report_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+"""Sparse industry x feature matrix (replaces mahout_input.pig).
+
+mahout_input.pig UNIONs the five requirement tables with the location
+features, ranks the distinct industries and (feature_type, feature_value)
+pairs with DISTINCT + ORDER + RANK, and LEFT JOINs both ranks back to
+write `(industry_idx, feature_type_idx, feature_value_idx, feature_count)`
+triples. The aggregates are small, so here they are collected once, the
+ranks are computed with a sort on the driver, and the matrix is built
+directly as CSR with numpy. Requirement values are identified by the
+token_id of the vocabulary in <store>/vocab (see spark_vocab.py; values it
+does not cover yet get ids in memory): their columns are ordered by
+feature type, then token_id, where mahout_input.pig orders the strings, and
+the tokens are decoded only to write index.json and the triples. Industry
+and location ranks are Pig's.
+
+Saved under <output-dir>/feature_matrix/:
+- indptr.npy, indices.npy, data.npy: CSR arrays (np.load(..., mmap_mode="r"))
+- index.json: shape, industry ids (row order), features (column order) and
+  the token_id of every requirement feature (null for location features)
+
+The Pig outputs (mahout_features, mahout_industry_index,
+mahout_feature_value_index) are still written as TSV part files.
+"""
+
+from __future__ import annotations
+
+import argparse
+import functools
+import glob
+import json
+import os
+import shutil
+import sys
+from pathlib import Path
+
+import numpy as np
+
+from pyspark.sql import DataFrame, SparkSession, functions as F
+
+import spark_vocab
+from local_io import atomic_output
+
+from spark_explore_output import (
+    _file_glob,
+    load_four_col_tsv,
+    load_inputs,
+)
+from spark_requirements import REQUIREMENT_DIMENSIONS
+
+
+# requirement_analysis/<table> -> feature_type used by mahout_input.pig
+FEATURE_TYPES = {
+    "exp_total": "exp",
+    "edu_total": "edu",
+    "type_total": "type",
+    "skill_total": "skill",
+    "req_total": "req",
+}
+
+FEATURE_TYPE_IDX = {"exp": 1, "edu": 2, "type": 3, "skill": 4, "req": 5, "location": 6}
+
+UNKNOWN = "UNKNOWN"
+
+
+def _pig_order(value: str | None) -> tuple[bool, str]:
+    # Pig ORDER puts nulls first.
+    return (value is not None, value or "")
+
+
+def _token_ids(vocab: DataFrame, dimension: str) -> DataFrame:
+    # One id per token (the lowest), null tokens included.
+    return (
+        vocab.where(F.col("dimension") == dimension)
+        .groupBy("token")
+        .agg(F.min("token_id").alias("token_id"))
+    )
+
+
+def collect_features(
+    spark: SparkSession, output_dir: Path, input_format: str = "tsv", store_dir: Path | None = None
+) -> tuple[list[tuple], dict[int, str | None]]:
+    """(features, tokens): `merged_features` of mahout_input.pig as
+    (industry_id, industry_name, feature_type, feature_value, total_jobs)
+    rows, where feature_value is a token_id for the requirement features,
+    and the token of every token_id used."""
+    store_dir = store_dir or output_dir.joinpath("store")
+    inputs = load_inputs(spark, output_dir, input_format, store_dir)
+
+    if input_format == "parquet":
+        req_path = store_dir.joinpath("requirement_analysis", "req_total")
+        if req_path.exists():
+            inputs["req_total"] = spark.read.parquet(_file_glob(req_path))
+    else:
+        req_glob = _file_glob(output_dir, "requirement_analysis", "req_total", "part-*")
+        if glob.glob(req_glob):
+            inputs["req_total"] = load_four_col_tsv(
+                spark, req_glob, "industry_code", "industry", "requirement", "job_count"
+            )
+    missing = [name for name in FEATURE_TYPES if name not in inputs]
+    if missing:
+        print(f"warning: no {', '.join(missing)}; those features are skipped")
+
+    # By name: the Parquet store appends the industry_code partition column last.
+    tables = {
+        name: inputs[name].select(
+            "industry_code", "industry", F.col(REQUIREMENT_DIMENSIONS[name]).alias("value"), "job_count"
+        )
+        for name in FEATURE_TYPES
+        if name in inputs
+    }
+    long = [t.select(F.lit(REQUIREMENT_DIMENSIONS[name]).alias("dimension"), "value") for name, t in tables.items()]
+    vocab = None
+    if long:
+        stored = spark_vocab.load_vocabulary(spark, store_dir.joinpath("vocab"))
+        vocab = spark_vocab.extend_vocabulary(functools.reduce(DataFrame.unionByName, long), stored)
+        vocab = vocab.select("token_id", "dimension", "token").persist()
+
+    features = []
+    for name, table in tables.items():
+        ids = F.broadcast(_token_ids(vocab, REQUIREMENT_DIMENSIONS[name]))
+        encoded = table.join(ids, table["value"].eqNullSafe(ids["token"]), "left")
+        for code, industry, token_id, count in encoded.select("industry_code", "industry", "token_id", "job_count").collect():
+            features.append((code, industry, FEATURE_TYPES[name], token_id, count))
+    tokens = {}
+    if vocab is not None:
+        used = sorted({f[3] for f in features})
+        tokens = dict(vocab.where(F.col("token_id").isin(used)).select("token_id", "token").collect())
+        vocab.unpersist()
+
+    # LEFT OUTER JOIN location rows to DISTINCT (industry_id, industry_name) by name.
+    # A null name matches nothing, like a Pig join key.
+    ids_by_name: dict[str, list[str]] = {}
+    for code, industry in {(f[0], f[1]) for f in features}:
+        if industry is not None:
+            ids_by_name.setdefault(industry, []).append(code)
+    for province, industry, count in inputs["industry_by_location"].select("province", "industry", "job_count").collect():
+        for code in ids_by_name.get(industry, [UNKNOWN]):
+            features.append(
+                (
+                    code if code is not None else UNKNOWN,
+                    industry if industry is not None else UNKNOWN,
+                    "location",
+                    province if province is not None else UNKNOWN,
+                    count if count is not None else 0,
+                )
+            )
+    return features, tokens
+
+
+def build_matrix(features: list[tuple], tokens: dict[int, str | None] | None = None) -> dict:
+    """Ranks, Pig triples and CSR arrays from `merged_features` rows.
+
+    With `tokens`, the requirement feature values are token_ids: their
+    columns are ranked by id, and `tokens` only decodes the `columns`
+    written out. Without it the values are ranked as strings, like Pig.
+    """
+    tokens = tokens or {}
+
+    def _by_id(ftype: str) -> bool:
+        return bool(tokens) and ftype != "location"
+
+    industries = sorted({f[0] for f in features}, key=_pig_order)
+    keys = sorted(
+        {(f[2], f[3]) for f in features},
+        key=lambda p: (_pig_order(p[0]), (True, p[1]) if _by_id(p[0]) else _pig_order(p[1])),
+    )
+    industry_idx = {code: i + 1 for i, code in enumerate(industries)}
+    column_idx = {col: i + 1 for i, col in enumerate(keys)}
+    columns = [(ftype, tokens[value]) if _by_id(ftype) else (ftype, value) for ftype, value in keys]
+    token_ids = [value if _by_id(ftype) else None for ftype, value in keys]
+
+    n = len(features)
+    rows = np.fromiter((industry_idx[f[0]] for f in features), dtype=np.int32, count=n)
+    types = np.fromiter((FEATURE_TYPE_IDX.get(f[2], 0) for f in features), dtype=np.int8, count=n)
+    cols = np.fromiter((column_idx[(f[2], f[3])] for f in features), dtype=np.int32, count=n)
+    counts = np.fromiter((f[4] or 0 for f in features), dtype=np.int64, count=n)
+
+    # CSR (0-based); duplicate (row, col) entries are summed.
+    order = np.lexsort((cols, rows))
+    r, c, v = rows[order] - 1, cols[order] - 1, counts[order]
+    starts = np.flatnonzero(np.r_[True, (r[1:] != r[:-1]) | (c[1:] != c[:-1])]) if n else np.array([], dtype=np.int64)
+    data = np.add.reduceat(v, starts) if n else v
+    # Same int dtype for indices and indptr so scipy can wrap the mmap without a copy.
+    index_dtype = np.int32 if len(starts) < 2**31 else np.int64
+    indices = c[starts].astype(index_dtype)
+    indptr = np.zeros(len(industries) + 1, dtype=index_dtype)
+    np.cumsum(np.bincount(r[starts], minlength=len(industries)), out=indptr[1:])
+
+    return {
+        "industries": industries,
+        "columns": columns,
+        "token_ids": token_ids,
+        "triples": (rows, types, cols, counts),
+        "indptr": indptr,
+        "indices": indices,
+        "data": data,
+    }
+
+
+def save_matrix(matrix: dict, out_dir: Path) -> None:
+    out_dir.mkdir(parents=True, exist_ok=True)
+    for name in ["indptr", "indices", "data"]:
+        with atomic_output(out_dir.joinpath(f"{name}.npy"), "wb") as f:
+            np.save(f, matrix[name])
+    index = {
+        "shape": [len(matrix["industries"]), len(matrix["columns"])],
+        "industries": matrix["industries"],
+        "features": [list(col) for col in matrix["columns"]],
+        "token_ids": matrix.get("token_ids"),
+        "feature_type_idx": FEATURE_TYPE_IDX,
+    }
+    with atomic_output(out_dir.joinpath("index.json"), "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False)
+
+
+def _write_pig_part(out_dir: Path, rows) -> None:
+    """Replace the part-* files of a Pig output folder with one part file."""
+    if out_dir.exists():
+        shutil.rmtree(out_dir)
+    with atomic_output(out_dir.joinpath("part-r-00000"), "w", encoding="utf-8", newline="\n") as f:
+        for row in rows:
+            f.write("\t".join("" if x is None else str(x) for x in row) + "\n")
+
+
+def write_triples(matrix: dict, output_dir: Path) -> None:
+    """The three mahout_input.pig outputs, same columns and ranks."""
+    rows, types, cols, counts = matrix["triples"]
+    _write_pig_part(
+        output_dir.joinpath("mahout_features"),
+        zip(rows.tolist(), types.tolist(), cols.tolist(), counts.tolist()),
+    )
+    _write_pig_part(
+        output_dir.joinpath("mahout_industry_index"),
+        ((i + 1, code) for i, code in enumerate(matrix["industries"])),
+    )
+    _write_pig_part(
+        output_dir.joinpath("mahout_feature_value_index"),
+        ((i + 1, ftype, value) for i, (ftype, value) in enumerate(matrix["columns"])),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Build the industry x feature matrix (replaces mahout_input.pig)"
+    )
+    parser.add_argument(
+        "--output-dir",
+        default=str(Path(__file__).parent.joinpath("output")),
+        help="Path to the Pig output folder (default: ./output)",
+    )
+    parser.add_argument(
+        "--input-format",
+        default="tsv",
+        choices=["tsv", "parquet"],
+        help="Read the Pig part-* TSV outputs or the Parquet store (default: tsv)",
+    )
+    parser.add_argument(
+        "--store-dir",
+        default=None,
+        help="Parquet store directory (default: <output-dir>/store)",
+    )
+    parser.add_argument(
+        "--matrix-dir",
+        default=None,
+        help="Where the CSR arrays + index.json go (default: <output-dir>/feature_matrix)",
+    )
+    parser.add_argument(
+        "--no-triples",
+        action="store_true",
+        help="Skip the mahout_* TSV outputs",
+    )
+    args = parser.parse_args()
+    output_dir = Path(args.output_dir)
+    store_dir = Path(args.store_dir) if args.store_dir else None
+    matrix_dir = Path(args.matrix_dir) if args.matrix_dir else output_dir.joinpath("feature_matrix")
+
+    os.environ.setdefault("PYSPARK_PYTHON", sys.executable)
+    os.environ.setdefault("PYSPARK_DRIVER_PYTHON", sys.executable)
+
+    spark = (
+        SparkSession.builder.appName("recruitment-feature-matrix")
+        .master("local[*]")
+        .config("spark.pyspark.python", sys.executable)
+        .config("spark.pyspark.driver.python", sys.executable)
+        .config("spark.sql.execution.arrow.pyspark.enabled", "true")
+        .getOrCreate()
+    )
+    spark.sparkContext.setLogLevel("WARN")
+
+    features, tokens = collect_features(spark, output_dir, args.input_format, store_dir)
+    spark.stop()
+
+    matrix = build_matrix(features, tokens)
+    save_matrix(matrix, matrix_dir)
+    if not args.no_triples:
+        write_triples(matrix, output_dir)
+
+    n_rows, n_cols = len(matrix["industries"]), len(matrix["columns"])
+    print(f"feature matrix: {n_rows} industries x {n_cols} features, {len(matrix['data'])} non-zeros -> {matrix_dir}")
+
+
+if __name__ == "__main__":
+    main()
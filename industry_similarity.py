@@ -0,0 +1,240 @@
+"""Industry similarity / nearest-neighbour queries over the feature matrix.
+
+Loads the industry x feature counts written by feature_matrix.py, weights
+them (TF-IDF or plain row normalization) into unit-length rows, and
+answers two queries with sparse dot products:
+
+- industries most similar to a given industry (cosine similarity)
+- industries that best match a set of skills / requirements
+
+A top-k neighbour index for every industry can be precomputed (blockwise
+V @ V.T) and persisted next to the matrix, so "similar to X" becomes a
+lookup. The index records the size and mtime of the matrix files and is
+ignored once feature_matrix.py rewrote them.
+
+Usage:
+    python industry_similarity.py build-index --k 20
+    python industry_similarity.py similar KINH_DOANH --k 5
+    python industry_similarity.py skills "SQL, Excel, Giao tiếp" --k 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import re
+from pathlib import Path
+
+import numpy as np
+import scipy.sparse as sp
+
+from local_io import MATRIX_ARRAYS, atomic_output, load_matrix
+
+
+WEIGHTINGS = ["tfidf", "row"]
+
+# analysis.pig TOKENIZE delimiters (see spark_normalize.tokens)
+_TOKEN_SPLIT = re.compile(r"[\[\],;/|+]+")
+
+
+def _matrix_stamp(matrix_dir: Path) -> list[list]:
+    """(file, size, mtime) of the matrix files; a rebuilt matrix changes it."""
+    files = [f"{name}.npy" for name in MATRIX_ARRAYS] + ["index.json"]
+    stats = [matrix_dir.joinpath(name).stat() for name in files]
+    return [[name, st.st_size, st.st_mtime_ns] for name, st in zip(files, stats)]
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indexes of the k largest scores, best first (ties by index)."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.array([], dtype=np.int64)
+    part = np.argpartition(-scores, k - 1)[:k]
+    return part[np.lexsort((part, -scores[part]))]
+
+
+class SimilarityEngine:
+    def __init__(self, counts: sp.csr_matrix, index: dict, weighting: str = "tfidf") -> None:
+        if weighting not in WEIGHTINGS:
+            raise ValueError(f"weighting must be one of {WEIGHTINGS}")
+        self.index = index
+        self.weighting = weighting
+        self.industries: list[str] = index["industries"]
+        self._row = {code: i for i, code in enumerate(self.industries)}
+        self._column = {(ftype, value): j for j, (ftype, value) in enumerate(index["features"])}
+
+        counts = sp.csr_matrix(counts, dtype=np.float32)
+        if weighting == "tfidf":
+            # Sublinear tf, smoothed idf over industries.
+            n = counts.shape[0]
+            df = np.bincount(counts.indices, minlength=counts.shape[1])
+            self.idf = (np.log((1.0 + n) / (1.0 + df)) + 1.0).astype(np.float32)
+            weighted = counts.copy()
+            weighted.data = np.log1p(weighted.data)
+            weighted = weighted @ sp.diags(self.idf)
+        else:
+            self.idf = np.ones(counts.shape[1], dtype=np.float32)
+            weighted = counts
+        self.vectors = _l2_normalize(sp.csr_matrix(weighted, dtype=np.float32))
+        self.neighbour_idx: np.ndarray | None = None
+        self.neighbour_score: np.ndarray | None = None
+
+    @classmethod
+    def from_dir(cls, matrix_dir: Path, weighting: str = "tfidf") -> "SimilarityEngine":
+        counts, index = load_matrix(matrix_dir)
+        engine = cls(counts, index, weighting)
+        engine.load_index(matrix_dir)
+        return engine
+
+    # -- neighbour index ---------------------------------------------------
+
+    def build_index(self, k: int = 20, block_rows: int = 1024) -> None:
+        """Top-k neighbours of every industry (itself excluded), blockwise."""
+        n = self.vectors.shape[0]
+        k = min(k, max(n - 1, 0))
+        idx = np.zeros((n, k), dtype=np.int32)
+        score = np.zeros((n, k), dtype=np.float32)
+        vt = self.vectors.T.tocsc()
+        for start in range(0, n, block_rows):
+            block = (self.vectors[start : start + block_rows] @ vt).toarray()
+            for i, row in enumerate(block, start=start):
+                row[i] = -np.inf
+                top = _top_k(row, k)
+                idx[i], score[i] = top, row[top]
+        self.neighbour_idx, self.neighbour_score = idx, score
+
+    def save_index(self, matrix_dir: Path) -> None:
+        for name, arr in [("neighbour_idx", self.neighbour_idx), ("neighbour_score", self.neighbour_score)]:
+            with atomic_output(matrix_dir.joinpath(f"{name}.npy"), "wb") as f:
+                np.save(f, arr)
+        with atomic_output(matrix_dir.joinpath("neighbours.json"), "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "weighting": self.weighting,
+                    "k": int(self.neighbour_idx.shape[1]),
+                    "shape": list(self.vectors.shape),
+                    "matrix": _matrix_stamp(matrix_dir),
+                },
+                f,
+            )
+
+    def load_index(self, matrix_dir: Path) -> bool:
+        """Load a persisted index built with the same weighting from the same
+        matrix files (same size and mtime of the arrays and index.json).
+
+        Returns False (and queries compute on the fly) when there is none or
+        when it is stale.
+        """
+        meta_path = matrix_dir.joinpath("neighbours.json")
+        if not meta_path.exists():
+            return False
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        if (
+            meta["weighting"] != self.weighting
+            or meta.get("shape") != list(self.vectors.shape)
+            or meta.get("matrix") != _matrix_stamp(matrix_dir)
+        ):
+            return False
+        self.neighbour_idx = np.load(matrix_dir.joinpath("neighbour_idx.npy"))
+        self.neighbour_score = np.load(matrix_dir.joinpath("neighbour_score.npy"))
+        return True
+
+    # -- queries -------------------------------------------------------------
+
+    def row_of(self, industry: str) -> int:
+        key = industry.strip().upper()
+        if key not in self._row:
+            raise KeyError(f"unknown industry: {industry!r}")
+        return self._row[key]
+
+    def similar_industries(self, industry: str, k: int = 10) -> list[tuple[str, float]]:
+        i = self.row_of(industry)
+        if self.neighbour_idx is not None and k <= self.neighbour_idx.shape[1]:
+            idx, score = self.neighbour_idx[i, :k], self.neighbour_score[i, :k]
+        else:
+            scores = (self.vectors @ self.vectors[i].T).toarray().ravel()
+            scores[i] = -np.inf
+            idx = _top_k(scores, k)
+            score = scores[idx]
+        return [(self.industries[j], float(s)) for j, s in zip(idx, score)]
+
+    def query_vector(self, tokens: list[str], feature_types: tuple[str, ...] = ("skill", "req")) -> sp.csr_matrix:
+        """Unit-length query over the given tokens (unknown tokens are ignored)."""
+        cols = sorted(
+            {
+                self._column[(ftype, token)]
+                for token in tokens
+                for ftype in feature_types
+                if (ftype, token) in self._column
+            }
+        )
+        data = self.idf[cols] if cols else np.zeros(0, dtype=np.float32)
+        q = sp.csr_matrix((data, (np.zeros(len(cols), dtype=np.int32), cols)), shape=(1, self.vectors.shape[1]))
+        return _l2_normalize(q)
+
+    def industries_for_skills(
+        self, skills: list[str] | str, k: int = 10, feature_types: tuple[str, ...] = ("skill", "req")
+    ) -> list[tuple[str, float]]:
+        if isinstance(skills, str):
+            skills = _TOKEN_SPLIT.split(skills)
+        tokens = [t.strip().upper() for t in skills if t.strip()]
+        q = self.query_vector(tokens, feature_types)
+        if q.nnz == 0:
+            return []
+        scores = (self.vectors @ q.T).toarray().ravel()
+        idx = _top_k(scores, k)
+        return [(self.industries[j], float(scores[j])) for j in idx if scores[j] > 0]
+
+
+def _l2_normalize(m: sp.csr_matrix) -> sp.csr_matrix:
+    norms = np.sqrt(np.asarray(m.multiply(m).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return sp.csr_matrix(sp.diags((1.0 / norms).astype(np.float32)) @ m)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Industry similarity queries over the feature matrix")
+    parser.add_argument(
+        "--matrix-dir",
+        default=str(Path(__file__).parent.joinpath("output", "feature_matrix")),
+        help="Output of feature_matrix.py (default: ./output/feature_matrix)",
+    )
+    parser.add_argument("--weighting", default="tfidf", choices=WEIGHTINGS)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_build = sub.add_parser("build-index", help="Precompute and save the top-k neighbour index")
+    p_build.add_argument("--k", type=int, default=20)
+
+    p_similar = sub.add_parser("similar", help="Industries most similar to an industry_code")
+    p_similar.add_argument("industry")
+    p_similar.add_argument("--k", type=int, default=10)
+
+    p_skills = sub.add_parser("skills", help="Industries matching a skill / requirement list")
+    p_skills.add_argument("skills", help='Comma separated, e.g. "SQL, Excel"')
+    p_skills.add_argument("--k", type=int, default=10)
+
+    args = parser.parse_args()
+    matrix_dir = Path(args.matrix_dir)
+    engine = SimilarityEngine.from_dir(matrix_dir, args.weighting)
+
+    if args.command == "build-index":
+        engine.build_index(args.k)
+        engine.save_index(matrix_dir)
+        print(f"neighbour index: {engine.neighbour_idx.shape[0]} industries x top-{engine.neighbour_idx.shape[1]} -> {matrix_dir}")
+        return
+
+    try:
+        if args.command == "similar":
+            results = engine.similar_industries(args.industry, args.k)
+        else:
+            results = engine.industries_for_skills(args.skills, args.k)
+    except KeyError as e:
+        raise SystemExit(e.args[0])
+
+    for code, score in results:
+        print(f"{score:8.4f}  {code}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,386 @@
+"""Materialized job-count cube over job_base_clean.
+
+One cell per (province_id, industry, req_industry, experience, education,
+employment_type) combination that occurs, with its job count. Province
+and industry follow pig_location.pig / pig_industry.pig (the rules of
+industry_by_location); req_industry is the industry as analysis.pig
+groups the requirement tables ('Không hiển thị' is an industry of its
+own there, not UNKNOWN), and the three requirement dimensions follow
+analysis.pig too (see spark_normalize). Skills are multi-valued and stay
+in requirement_analysis/skill_total.
+
+Saved under <output-dir>/job_cube/:
+- cube.parquet: int-coded dimension columns (province_id as in
+  pig_location.pig, the others as indexes into dims.json) and job_count
+- dims.json: the values of every dimension, and the industry codes of
+  both industry dimensions
+
+`JobCube.rollup(by, **filters)` sums the cells in memory (numpy), so any
+slice answers in milliseconds without Spark:
+
+    python job_cube.py build
+    python job_cube.py rollup experience --province "Đà Nẵng" --industry "Công nghệ thông tin"
+    python job_cube.py rollup province industry --top 20
+
+`pig_inputs()` rebuilds industry_total, industry_by_location and
+exp/edu/type_total from the cube; spark_explore_output.py (--industry cube,
+--requirements cube), local_engine.py --cube and viz/make_figures.py
+--cube use it instead of the Pig outputs. Provinces come from
+location_normalizer, which also folds decomposed (NFD) text that
+pig_location.pig leaves UNKNOWN, so `python job_cube.py check` lists the
+cells where the cube and the Pig tables of an output folder differ.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # build/load need pyarrow
+    pa = None
+    pq = None
+
+# pyspark is only imported to build the cube; queries need numpy/pandas alone.
+from location_normalizer import UNKNOWN, default_matcher
+
+
+# dimension -> query option / meaning
+DIMENSIONS = {
+    "province": "normalized province (pig_location.pig)",
+    "industry": "industry name or industry_code (pig_industry.pig)",
+    "req_industry": "industry name or industry_code (analysis.pig)",
+    "experience": "experience bucket",
+    "education": "education level",
+    "employment_type": "employment type",
+}
+
+# industry dimension -> its dims.json code list
+INDUSTRY_CODES = {"industry": "industry_code", "req_industry": "req_industry_code"}
+
+# requirement_analysis table -> cube dimension
+REQUIREMENT_DIMENSIONS = {"exp_total": "experience", "edu_total": "education", "type_total": "employment_type"}
+
+CUBE_FILE = "cube.parquet"
+DIMS_FILE = "dims.json"
+
+
+def collect_cells(job_base_clean) -> pd.DataFrame:
+    """(province_id, province, industry, industry_code, req_industry, req_industry_code,
+    experience, education, employment_type, job_count)."""
+    from pyspark.sql import functions as F
+
+    import spark_normalize as norm
+    from spark_explore_output import normalize_location
+    from spark_requirements import _pig
+
+    loc = normalize_location(_pig("raw_loc"))
+    industry = norm.industry_name(_pig("raw_ind"))
+    req_industry = norm.industry_name(_pig("raw_ind"), hidden_is_unknown=False)
+    cells = (
+        job_base_clean.select(
+            F.coalesce(loc.getField("province_id"), F.lit(0)).alias("province_id"),
+            F.coalesce(loc.getField("province_name"), F.lit(UNKNOWN)).alias("province"),
+            industry.alias("industry"),
+            norm.industry_id(industry).alias("industry_code"),
+            req_industry.alias("req_industry"),
+            norm.industry_id(req_industry).alias("req_industry_code"),
+            norm.experience_bucket(_pig("raw_exp")).alias("experience"),
+            norm.education_level(_pig("raw_edu")).alias("education"),
+            norm.employment_type(_pig("raw_type")).alias("employment_type"),
+        )
+        .groupBy(
+            "province_id",
+            "province",
+            "industry",
+            "industry_code",
+            "req_industry",
+            "req_industry_code",
+            "experience",
+            "education",
+            "employment_type",
+        )
+        .agg(F.count(F.lit(1)).alias("job_count"))
+    )
+    return cells.toPandas()
+
+
+def _encode(values: pd.Series) -> tuple[np.ndarray, list]:
+    """Codes into the sorted distinct values (None sorts first)."""
+    uniques = sorted(set(values), key=lambda v: (v is not None, v or ""))
+    index = {v: i for i, v in enumerate(uniques)}
+    return np.fromiter((index[v] for v in values), dtype=np.int32, count=len(values)), uniques
+
+
+def build_cube(cells: pd.DataFrame) -> "JobCube":
+    """A cube from collect_cells output."""
+    cells = cells.astype(object).where(cells.notna(), None)
+    codes, values = {}, {}
+    for dim in [d for d in DIMENSIONS if d != "province"]:
+        codes[dim], values[dim] = _encode(cells[dim])
+    province_ids = cells["province_id"].astype(np.int16).to_numpy()
+    provinces = dict(zip(province_ids.tolist(), cells["province"]))
+    dims = {
+        "province": {str(i): provinces[i] for i in sorted(provinces)},
+        **values,
+    }
+    for dim, code in INDUSTRY_CODES.items():
+        industry_codes = dict(zip(cells[dim], cells[code]))
+        dims[code] = [industry_codes[v] for v in values[dim]]
+    return JobCube(province_ids, codes, cells["job_count"].astype(np.int64).to_numpy(), dims)
+
+
+def _as_list(values) -> list:
+    return [values] if isinstance(values, str) else list(values)
+
+
+class JobCube:
+    def __init__(self, province_ids: np.ndarray, codes: dict[str, np.ndarray], job_count: np.ndarray, dims: dict) -> None:
+        self.dims = dims
+        ids = np.array(sorted(int(i) for i in dims["province"]), dtype=np.int16)
+        self.values: dict[str, list] = {
+            "province": [dims["province"][str(i)] for i in ids],
+            **{dim: dims[dim] for dim in DIMENSIONS if dim != "province"},
+        }
+        self.province_ids = ids
+        self.codes: dict[str, np.ndarray] = {"province": np.searchsorted(ids, province_ids).astype(np.int32), **codes}
+        self.job_count = job_count
+        self.industry_codes: dict[str, list[str]] = {dim: dims[code] for dim, code in INDUSTRY_CODES.items()}
+
+    @property
+    def n_cells(self) -> int:
+        return len(self.job_count)
+
+    def save(self, cube_dir: Path) -> None:
+        from local_io import atomic_output
+
+        if pq is None:
+            raise RuntimeError("the job cube needs pyarrow")
+        cube_dir.mkdir(parents=True, exist_ok=True)
+        table = pa.table(
+            {
+                "province_id": pa.array(self.province_ids[self.codes["province"]], pa.int16()),
+                **{
+                    dim: pa.array(self.codes[dim], pa.int16() if len(self.values[dim]) < 1 << 15 else pa.int32())
+                    for dim in DIMENSIONS
+                    if dim != "province"
+                },
+                "job_count": pa.array(self.job_count, pa.int64()),
+            }
+        )
+        with atomic_output(cube_dir / CUBE_FILE, "wb") as f:
+            pq.write_table(table, f)
+        with atomic_output(cube_dir / DIMS_FILE, "w", encoding="utf-8") as f:
+            json.dump(self.dims, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, cube_dir: Path) -> "JobCube":
+        if pq is None:
+            raise RuntimeError("the job cube needs pyarrow")
+        table = pq.read_table(cube_dir / CUBE_FILE)
+        if "req_industry" not in table.column_names:
+            raise RuntimeError(f"{cube_dir} has no req_industry dimension; run `job_cube.py build` again")
+        with open(cube_dir / DIMS_FILE, encoding="utf-8") as f:
+            dims = json.load(f)
+        columns = {name: table.column(name).to_numpy() for name in table.column_names}
+        codes = {dim: columns[dim].astype(np.int32) for dim in DIMENSIONS if dim != "province"}
+        return cls(columns["province_id"], codes, columns["job_count"].astype(np.int64), dims)
+
+    def normalize(self, dimension: str, value: str) -> list[int]:
+        """Codes of a query value ("Đà Nẵng" -> DA NANG; an industry by name or code)."""
+        if dimension not in DIMENSIONS:
+            raise KeyError(f"unknown dimension: {dimension!r} (one of {', '.join(DIMENSIONS)})")
+        values = self.values[dimension]
+        if dimension == "province":
+            name = default_matcher().province(value)
+            return [i for i, v in enumerate(values) if v == name]
+        key = value.strip().upper()
+        if dimension in INDUSTRY_CODES:
+            return [i for i, (v, c) in enumerate(zip(values, self.industry_codes[dimension])) if key in (v, c)]
+        return [i for i, v in enumerate(values) if v == key]
+
+    def mask(self, filters: dict[str, str | list[str]]) -> np.ndarray | None:
+        """Cells matching every dimension (any of its values); None when there are no filters."""
+        mask = None
+        for dimension, values in filters.items():
+            if values is None:
+                continue
+            wanted = [code for v in _as_list(values) for code in self.normalize(dimension, v)]
+            hit = np.isin(self.codes[dimension], wanted)
+            mask = hit if mask is None else mask & hit
+        return mask
+
+    def rollup(self, by: list[str] | tuple[str, ...] = (), **filters) -> pd.DataFrame:
+        """Job counts grouped by `by` over the matching cells, most frequent first.
+
+        Grouping by province also returns province_id, by industry or
+        req_industry also its industry_code / req_industry_code.
+        """
+        mask = self.mask(filters)
+        counts = self.job_count if mask is None else self.job_count[mask]
+        if not by:
+            return pd.DataFrame({"job_count": pd.array([int(counts.sum())], dtype="Int64")})
+        codes = [self.codes[dim] if mask is None else self.codes[dim][mask] for dim in by]
+        sizes = [len(self.values[dim]) for dim in by]
+        keys, inverse = np.unique(np.ravel_multi_index(codes, sizes), return_inverse=True)
+        sums = np.bincount(inverse, weights=counts, minlength=len(keys)).astype(np.int64)
+
+        frame = {}
+        for dim, dim_codes in zip(by, np.unravel_index(keys, sizes)):
+            if dim == "province":
+                frame["province_id"] = self.province_ids[dim_codes]
+            if dim in INDUSTRY_CODES:
+                frame[INDUSTRY_CODES[dim]] = np.asarray(self.industry_codes[dim], dtype=object)[dim_codes]
+            frame[dim] = np.asarray(self.values[dim], dtype=object)[dim_codes]
+        frame["job_count"] = pd.array(sums, dtype="Int64")
+        out = pd.DataFrame(frame)
+        order = np.lexsort([out[dim].astype(str).to_numpy() for dim in reversed(by)] + [-sums])
+        return out.iloc[order].reset_index(drop=True)
+
+    def total(self, **filters) -> int:
+        mask = self.mask(filters)
+        return int(self.job_count.sum() if mask is None else self.job_count[mask].sum())
+
+    def pig_inputs(self, industry_codes: list[str] | None = None) -> dict[str, pd.DataFrame]:
+        """industry_total, industry_by_location and exp/edu/type_total as local_engine.load_inputs returns them.
+
+        The requirement tables group by req_industry, as analysis.pig does.
+        `industry_codes` filters them only, like --industry-code on the Pig
+        outputs.
+        """
+        from spark_explore_output import SUMMARY_INDUSTRY
+
+        industry_total = self.rollup(["industry"])[["industry", "job_count"]]
+        summary = pd.DataFrame({"industry": [SUMMARY_INDUSTRY], "job_count": pd.array([self.total()], dtype="Int64")})
+        inputs = {
+            "industry_total": pd.concat([industry_total, summary], ignore_index=True),
+            "industry_by_location": self.rollup(["province", "industry"])[["province", "industry", "job_count"]],
+        }
+        for name, dim in REQUIREMENT_DIMENSIONS.items():
+            table = self.rollup(["req_industry", dim], req_industry=industry_codes)
+            table = table.rename(columns={"req_industry_code": "industry_code", "req_industry": "industry"})
+            inputs[name] = table[["industry_code", "industry", dim, "job_count"]].reset_index(drop=True)
+        return inputs
+
+
+def compare_with_pig(cube: JobCube, output_dir: Path, input_format: str = "tsv", store_dir: Path | None = None):
+    """Per pig_inputs table, the cells whose job_count differs from the Pig output (missing = 0)."""
+    import local_engine
+
+    ours = cube.pig_inputs()
+    theirs = local_engine.load_inputs(output_dir, input_format, store_dir, tables=list(ours))
+    diffs = {}
+    for name, table in ours.items():
+        keys = [c for c in table.columns if c != "job_count"]
+        merged = table.merge(theirs[name][keys + ["job_count"]], on=keys, how="outer", suffixes=("_cube", "_pig"))
+        merged[["job_count_cube", "job_count_pig"]] = merged[["job_count_cube", "job_count_pig"]].fillna(0)
+        diffs[name] = merged[merged["job_count_cube"] != merged["job_count_pig"]].reset_index(drop=True)
+    return ours, diffs
+
+
+def _build(args) -> None:
+    from pyspark.sql import SparkSession
+
+    from spark_explore_output import _file_glob, load_job_base_clean
+
+    output_dir = Path(args.output_dir)
+    store_dir = Path(args.store_dir) if args.store_dir else output_dir.joinpath("store")
+
+    os.environ.setdefault("PYSPARK_PYTHON", sys.executable)
+    os.environ.setdefault("PYSPARK_DRIVER_PYTHON", sys.executable)
+
+    spark = (
+        SparkSession.builder.appName("recruitment-job-cube")
+        .master("local[*]")
+        .config("spark.pyspark.python", sys.executable)
+        .config("spark.pyspark.driver.python", sys.executable)
+        .config("spark.sql.execution.arrow.pyspark.enabled", "true")
+        .getOrCreate()
+    )
+    spark.sparkContext.setLogLevel("WARN")
+
+    if args.input_format == "parquet":
+        job_base_clean = spark.read.parquet(_file_glob(store_dir, "job_base_clean"))
+    else:
+        job_base_clean = load_job_base_clean(spark, _file_glob(output_dir, "job_base_clean", "part-*"))
+    cube = build_cube(collect_cells(job_base_clean))
+    spark.stop()
+
+    cube.save(args.cube_dir)
+    sizes = ", ".join(f"{len(v)} {dim}" for dim, v in cube.values.items())
+    print(f"job cube: {cube.n_cells} cells over {cube.total()} jobs ({sizes}) -> {args.cube_dir}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Province x industry x requirement job-count cube")
+    parser.add_argument(
+        "--output-dir",
+        default=str(Path(__file__).parent.joinpath("output")),
+        help="Path to the Pig output folder (default: ./output)",
+    )
+    parser.add_argument(
+        "--cube-dir",
+        default=None,
+        help="Where the cube files go (default: <output-dir>/job_cube)",
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_build = sub.add_parser("build", help="Build the cube from job_base_clean")
+    p_build.add_argument(
+        "--input-format",
+        default="tsv",
+        choices=["tsv", "parquet"],
+        help="Read job_base_clean from the Pig part-* files or the Parquet store",
+    )
+    p_build.add_argument("--store-dir", default=None, help="Parquet store directory (default: <output-dir>/store)")
+
+    p_check = sub.add_parser("check", help="Compare the cube's Pig tables with those of --output-dir")
+    p_check.add_argument("--input-format", default="tsv", choices=["tsv", "parquet"])
+    p_check.add_argument("--store-dir", default=None, help="Parquet store directory (default: <output-dir>/store)")
+    p_check.add_argument("--show", type=int, default=10, help="Differing cells to print per table")
+
+    p_rollup = sub.add_parser("rollup", help="Job counts grouped by some dimensions, over the filtered cells")
+    p_rollup.add_argument("by", nargs="*", help=f"Dimensions to group by, of {', '.join(DIMENSIONS)} (none: the total)")
+    p_rollup.add_argument("--top", type=int, default=None, help="Rows to print (default: all)")
+    for dimension, meaning in DIMENSIONS.items():
+        p_rollup.add_argument(
+            f"--{dimension.replace('_', '-')}",
+            dest=dimension,
+            action="append",
+            help=f"Filter on {meaning}; repeat to OR values",
+        )
+
+    args = parser.parse_args()
+    args.cube_dir = Path(args.cube_dir) if args.cube_dir else Path(args.output_dir).joinpath("job_cube")
+
+    if args.command == "build":
+        _build(args)
+        return
+    if args.command == "check":
+        store_dir = Path(args.store_dir) if args.store_dir else None
+        ours, diffs = compare_with_pig(JobCube.load(args.cube_dir), Path(args.output_dir), args.input_format, store_dir)
+        for name, diff in diffs.items():
+            print(f"{name}: {len(ours[name])} rows, {len(diff)} differ")
+            if len(diff) and args.show:
+                print(diff.head(args.show).to_string(index=False))
+        sys.exit(1 if any(len(d) for d in diffs.values()) else 0)
+
+    unknown = [dim for dim in args.by if dim not in DIMENSIONS]
+    if unknown:
+        parser.error(f"unknown dimension(s): {', '.join(unknown)} (one of {', '.join(DIMENSIONS)})")
+    cube = JobCube.load(args.cube_dir)
+    filters = {dim: getattr(args, dim) for dim in DIMENSIONS if getattr(args, dim)}
+    table = cube.rollup(args.by, **filters)
+    print(table.head(args.top).to_string(index=False) if args.top else table.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
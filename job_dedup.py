@@ -0,0 +1,411 @@
+"""Near-duplicate job postings (reposts) with MinHash and LSH banding.
+
+The crawl re-lists the same posting under new ids; job_explore_base.pig
+only drops empty titles, so every repost is counted again in
+industry_total, province_total and skill_total. Comparing all pairs is
+quadratic; here every posting gets a MinHash signature and only postings
+that share an LSH band become candidates:
+
+- text: the `fields` of a posting, lower-cased, NFC, punctuation folded to
+  single spaces; shingles are its byte `shingle`-grams (rows shorter than
+  that are never deduplicated)
+- signature: `bands * rows` minima of multiply-shift hashes of the shingle
+  hashes, computed batch-wise in numpy inside mapInPandas
+- candidates: postings whose `rows` signature values agree in at least one
+  band (one groupBy over (band, key)); buckets above `max_bucket` postings
+  only pair with their smallest id
+- verified pairs: estimated Jaccard (share of equal signature values)
+  >= `threshold`, computed in Spark SQL on the joined signatures
+- clusters: connected components of the verified pairs on the driver; the
+  smallest job_id (the first listing) is the canonical id
+
+Everything but the clustering is linear in the number of postings; the
+clustering only sees the verified pairs.
+
+In this crawl `company_raw` holds the sector, not the employer, so title +
+company + requirements alone do not identify a posting; the default
+fields add the location and the skill list.
+
+Usage:
+    python job_dedup.py --output-dir output                 # -> output/job_duplicates
+    python job_dedup.py --output-dir output --show 10 --apply
+    spark-submit spark_job_base.py --input vietnamworks_detailed_jobs.jsonl --dedup
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import shutil
+import sys
+import time
+import unicodedata
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_FIELDS = ["title", "company_raw", "location_raw", "requirements_raw", "industry_raw"]
+DEFAULT_THRESHOLD = 0.8
+# 20 bands x 6 rows: a pair with Jaccard 0.8 shares a band with
+# probability 0.998, one with Jaccard 0.5 with probability 0.27.
+DEFAULT_BANDS = 20
+DEFAULT_ROWS = 6
+DEFAULT_SHINGLE = 5
+DEFAULT_MAX_BUCKET = 20
+# Shingles hashed per numpy block; bounds worker memory to about
+# BLOCK_SHINGLES * bands * rows * 8 bytes.
+BLOCK_SHINGLES = 32_768
+
+_M32 = np.uint32(0xFFFFFFFF)
+
+
+def _fmix64(h: np.ndarray) -> np.ndarray:
+    h = h ^ (h >> np.uint64(33))
+    h = h * np.uint64(0xFF51AFD7ED558CCD)
+    h = h ^ (h >> np.uint64(33))
+    h = h * np.uint64(0xC4CEB9FE1A85EC53)
+    return h ^ (h >> np.uint64(33))
+
+
+def _permutations(num_perm: int) -> tuple[np.ndarray, np.ndarray]:
+    """(a, b) of the multiply-shift hashes h(x) = (a * x + b) >> 32, a odd.
+
+    Fixed seed: every worker and every run computes the same signatures.
+    """
+    rng = np.random.default_rng(0x5EED)
+    a = rng.integers(1, 2**63, size=num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+    b = rng.integers(0, 2**63, size=num_perm, dtype=np.uint64)
+    return a, b
+
+
+def normalize_text(frame: pd.DataFrame, fields: list[str]) -> pd.Series:
+    """The compared text of every row: fields joined, case, accents form and punctuation folded."""
+    text = frame[fields[0]].fillna("").astype(str)
+    for field in fields[1:]:
+        text = text + " " + frame[field].fillna("").astype(str)
+    text = text.map(lambda s: unicodedata.normalize("NFC", s)).str.lower()
+    return text.str.replace(r"[\W_]+", " ", regex=True).str.strip()
+
+
+def shingle_hashes(texts: pd.Series, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """(hashes, counts): 32-bit hashes of every byte k-gram, row after row, and the k-grams per row."""
+    encoded = [s.encode("utf-8") for s in texts]
+    lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))
+    counts = np.maximum(lengths - k + 1, 0)
+    if not counts.sum():
+        return np.empty(0, dtype=np.uint32), counts
+    buf = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+    starts = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+    # Position of every valid k-gram in buf: its row start plus its offset in the row.
+    first = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    pos = np.arange(counts.sum()) + np.repeat(starts - first, counts)
+    # k <= 8 bytes pack losslessly into one uint64 before mixing.
+    packed = np.zeros(len(pos), dtype=np.uint64)
+    for j in range(k):
+        packed |= buf[pos + j].astype(np.uint64) << np.uint64(8 * j)
+    return (_fmix64(packed) & np.uint64(0xFFFFFFFF)).astype(np.uint32), counts
+
+
+def minhash_signatures(hashes: np.ndarray, counts: np.ndarray, num_perm: int) -> np.ndarray:
+    """(rows, num_perm) uint32 MinHash signatures; rows without shingles stay all 0xFFFFFFFF."""
+    a, b = _permutations(num_perm)
+    sig = np.full((len(counts), num_perm), _M32, dtype=np.uint32)
+    has = np.flatnonzero(counts)
+    ends = np.cumsum(counts[has])
+    lo = 0
+    while lo < len(has):
+        # Whole rows per block, about BLOCK_SHINGLES shingles each.
+        hi = max(int(np.searchsorted(ends, (ends[lo - 1] if lo else 0) + BLOCK_SHINGLES, side="right")), lo + 1)
+        begin, end = (ends[lo - 1] if lo else 0), ends[hi - 1]
+        # (num_perm, shingles): each row reduces over contiguous memory. The
+        # shift is monotonic, so it is applied after the minimum.
+        block = a[:, None] * hashes[None, begin:end].astype(np.uint64)
+        block += b[:, None]
+        offsets = np.concatenate([[0], ends[lo : hi - 1] - begin])
+        mins = np.minimum.reduceat(block, offsets, axis=1)
+        sig[has[lo:hi]] = (mins >> np.uint64(32)).T
+        lo = hi
+    return sig
+
+
+def band_keys(sig: np.ndarray, bands: int, rows: int) -> np.ndarray:
+    """(n, bands) int64 keys; two rows share a key when their `rows` values in that band agree."""
+    parts = sig[:, : bands * rows].reshape(len(sig), bands, rows).astype(np.uint64)
+    key = np.zeros(parts.shape[:2], dtype=np.uint64)
+    for j in range(rows):
+        key = _fmix64((key ^ parts[:, :, j]) * np.uint64(0x100000001B3))
+    return key.view(np.int64)
+
+
+def _signature_partition(id_col: str, fields: list[str], bands: int, rows: int, shingle: int):
+    def signatures(batches):
+        from job_dedup import band_keys, minhash_signatures, normalize_text, shingle_hashes
+
+        for batch in batches:
+            hashes, counts = shingle_hashes(normalize_text(batch, fields), shingle)
+            sig = minhash_signatures(hashes, counts, bands * rows)
+            keys = band_keys(sig, bands, rows)
+            keep = counts > 0
+            yield pd.DataFrame(
+                {
+                    "job_id": batch[id_col].to_numpy()[keep],
+                    "signature": list(sig[keep].view(np.int32)),
+                    "bands": list(keys[keep]),
+                }
+            )
+
+    return signatures
+
+
+def _names(df, fields: list[str]) -> tuple[str, list[str]]:
+    """(id column, text columns) under job_base (Pig) or job_base_clean (loader) names."""
+    if "mahout_id" not in df.columns:
+        return "job_id", fields
+    from spark_explore_output import JOB_BASE_CLEAN_SCHEMA
+    from spark_job_base import JOB_BASE_COLUMNS
+
+    pig = {field.name: name for name, field in zip(JOB_BASE_COLUMNS, JOB_BASE_CLEAN_SCHEMA.fields)}
+    return "mahout_id", [pig[f] for f in fields]
+
+
+def signatures(
+    job_base_clean,
+    fields: list[str] = DEFAULT_FIELDS,
+    bands: int = DEFAULT_BANDS,
+    rows: int = DEFAULT_ROWS,
+    shingle: int = DEFAULT_SHINGLE,
+):
+    """(job_id, signature array<int>, bands array<long>) per posting with enough text."""
+    from pyspark.sql import functions as F
+
+    id_col, text_cols = _names(job_base_clean, fields)
+    jobs = job_base_clean.where(F.col(id_col).isNotNull()).select(
+        F.col(id_col).cast("long").alias(id_col), *text_cols
+    )
+    return jobs.mapInPandas(
+        _signature_partition(id_col, text_cols, bands, rows, shingle),
+        "job_id long, signature array<int>, bands array<long>",
+    )
+
+
+def candidate_pairs(sigs, max_bucket: int = DEFAULT_MAX_BUCKET):
+    """(a, b) with a < b for postings that agree on at least one band."""
+    from pyspark.sql import functions as F
+
+    buckets = (
+        sigs.select("job_id", F.posexplode("bands").alias("band", "key"))
+        .groupBy("band", "key")
+        .agg(F.array_sort(F.collect_list("job_id")).alias("ids"))
+        .where(F.size("ids") > 1)
+    )
+    lefts = F.when(F.size("ids") <= max_bucket, F.col("ids")).otherwise(F.slice("ids", 1, 1))
+    return (
+        buckets.select(F.explode(lefts).alias("a"), "ids")
+        .select("a", F.explode("ids").alias("b"))
+        .where(F.col("a") < F.col("b"))
+        .distinct()
+    )
+
+
+def verified_pairs(sigs, pairs, threshold: float = DEFAULT_THRESHOLD):
+    """Candidate pairs with estimated Jaccard >= threshold, with the estimate as `similarity`."""
+    from pyspark.sql import functions as F
+
+    sig = sigs.select("job_id", "signature")
+    joined = pairs.join(sig.toDF("a", "sa"), "a").join(sig.toDF("b", "sb"), "b")
+    equal = F.size(F.filter(F.zip_with("sa", "sb", lambda x, y: x == y), lambda e: e))
+    similarity = equal / F.size("sa")
+    return joined.select("a", "b", similarity.alias("similarity")).where(F.col("similarity") >= threshold)
+
+
+def clusters(a: np.ndarray, b: np.ndarray) -> pd.DataFrame:
+    """(job_id, canonical_id) for every id on an edge; canonical = smallest id of its component."""
+    ids, inverse = np.unique(np.concatenate([a, b]), return_inverse=True)
+    ea, eb = inverse[: len(a)], inverse[len(a) :]
+    label = np.arange(len(ids))
+    while True:
+        before = label.copy()
+        # Min-label propagation along the edges, then pointer jumping.
+        np.minimum.at(label, ea, label[eb])
+        np.minimum.at(label, eb, label[ea])
+        label = label[label]
+        if np.array_equal(label, before):
+            break
+    return pd.DataFrame({"job_id": ids, "canonical_id": ids[label]})
+
+
+def duplicate_map(
+    job_base_clean,
+    fields: list[str] = DEFAULT_FIELDS,
+    threshold: float = DEFAULT_THRESHOLD,
+    bands: int = DEFAULT_BANDS,
+    rows: int = DEFAULT_ROWS,
+    shingle: int = DEFAULT_SHINGLE,
+    max_bucket: int = DEFAULT_MAX_BUCKET,
+) -> tuple[pd.DataFrame, dict]:
+    """(duplicates, stats): job_id -> canonical_id for every repost, and counts per stage."""
+    from pyspark import StorageLevel
+
+    t0 = time.perf_counter()
+    sigs = signatures(job_base_clean, fields, bands, rows, shingle).persist(StorageLevel.MEMORY_AND_DISK)
+    stats = {"signed": sigs.count()}
+    stats["signature_seconds"] = round(time.perf_counter() - t0, 3)
+
+    t0 = time.perf_counter()
+    pairs = candidate_pairs(sigs, max_bucket).persist(StorageLevel.MEMORY_AND_DISK)
+    stats["candidate_pairs"] = pairs.count()
+    stats["candidate_seconds"] = round(time.perf_counter() - t0, 3)
+
+    t0 = time.perf_counter()
+    edges = verified_pairs(sigs, pairs, threshold).select("a", "b").toPandas()
+    sigs.unpersist()
+    pairs.unpersist()
+    mapping = clusters(edges["a"].to_numpy(np.int64), edges["b"].to_numpy(np.int64))
+    duplicates = mapping[mapping["job_id"] != mapping["canonical_id"]].reset_index(drop=True)
+    stats.update(
+        verified_pairs=len(edges),
+        clusters=int(mapping["canonical_id"].nunique()),
+        duplicates=len(duplicates),
+        verify_seconds=round(time.perf_counter() - t0, 3),
+    )
+    return duplicates, stats
+
+
+def drop_duplicates(job_base_clean, duplicates: pd.DataFrame):
+    """job_base_clean (or job_base) without the reposts in `duplicates`."""
+    from pyspark.sql import functions as F
+
+    id_col, _ = _names(job_base_clean, DEFAULT_FIELDS)
+    if duplicates.empty:
+        return job_base_clean
+    dup_ids = job_base_clean.sparkSession.createDataFrame(duplicates[["job_id"]], f"{id_col} long")
+    return job_base_clean.join(F.broadcast(dup_ids), id_col, "left_anti")
+
+
+def format_stats(stats: dict, rows: int | None = None) -> str:
+    share = f" ({stats['duplicates'] / rows:.2%} of {rows:,} postings)" if rows else ""
+    return (
+        f"{stats['signed']:,} signatures ({stats['signature_seconds']}s), "
+        f"{stats['candidate_pairs']:,} candidate pairs ({stats['candidate_seconds']}s), "
+        f"{stats['verified_pairs']:,} verified ({stats['verify_seconds']}s)\n"
+        f"{stats['duplicates']:,} reposts in {stats['clusters']:,} clusters{share}"
+    )
+
+
+def _replace_dir(df, target: Path, write) -> None:
+    """Write `df` next to `target`, then swap it in (`df` may read `target`)."""
+    tmp = target.with_name(f"{target.name}.dedup_tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    write(df, str(tmp.resolve()).replace("\\", "/"))
+    shutil.rmtree(target)
+    os.replace(tmp, target)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Near-duplicate job postings with MinHash + LSH")
+    parser.add_argument(
+        "--output-dir",
+        default=str(Path(__file__).parent.joinpath("output")),
+        help="Path to the Pig output folder (default: ./output)",
+    )
+    parser.add_argument(
+        "--input-format",
+        default="tsv",
+        choices=["tsv", "parquet"],
+        help="Read job_base_clean from the Pig part-* files or the Parquet store",
+    )
+    parser.add_argument("--store-dir", default=None, help="Parquet store directory (default: <output-dir>/store)")
+    parser.add_argument(
+        "--fields",
+        default=",".join(DEFAULT_FIELDS),
+        help=f"Compared job_base_clean columns (default: {','.join(DEFAULT_FIELDS)})",
+    )
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Minimum estimated Jaccard")
+    parser.add_argument("--bands", type=int, default=DEFAULT_BANDS)
+    parser.add_argument("--rows", type=int, default=DEFAULT_ROWS, help="Signature values per band")
+    parser.add_argument("--shingle", type=int, default=DEFAULT_SHINGLE, help="Shingle length in bytes (at most 8)")
+    parser.add_argument("--max-bucket", type=int, default=DEFAULT_MAX_BUCKET)
+    parser.add_argument("--show", type=int, default=0, help="Print the N largest clusters")
+    parser.add_argument(
+        "--apply",
+        action="store_true",
+        help="Also rewrite job_base_clean without the reposts (rerun the downstream steps afterwards)",
+    )
+    args = parser.parse_args()
+    if not 1 <= args.shingle <= 8:
+        parser.error("--shingle must be between 1 and 8")
+    output_dir = Path(args.output_dir)
+    store_dir = Path(args.store_dir) if args.store_dir else output_dir.joinpath("store")
+    fields = [f.strip() for f in args.fields.split(",") if f.strip()]
+
+    from pyspark.sql import SparkSession, functions as F
+
+    from spark_explore_output import JOB_BASE_CLEAN_SCHEMA, _file_glob, load_job_base_clean
+    from spark_job_base import write_pig_tsv
+
+    unknown = [f for f in fields if f not in JOB_BASE_CLEAN_SCHEMA.fieldNames()]
+    if unknown:
+        parser.error(f"unknown field(s): {', '.join(unknown)}")
+
+    os.environ.setdefault("PYSPARK_PYTHON", sys.executable)
+    os.environ.setdefault("PYSPARK_DRIVER_PYTHON", sys.executable)
+    spark = (
+        SparkSession.builder.appName("recruitment-job-dedup")
+        .master("local[*]")
+        .config("spark.pyspark.python", sys.executable)
+        .config("spark.pyspark.driver.python", sys.executable)
+        .config("spark.sql.execution.arrow.pyspark.enabled", "true")
+        .getOrCreate()
+    )
+    spark.sparkContext.setLogLevel("WARN")
+
+    if args.input_format == "parquet":
+        job_base_clean = spark.read.parquet(_file_glob(store_dir, "job_base_clean"))
+    else:
+        job_base_clean = load_job_base_clean(spark, _file_glob(output_dir, "job_base_clean", "part-*"))
+
+    duplicates, stats = duplicate_map(
+        job_base_clean, fields, args.threshold, args.bands, args.rows, args.shingle, args.max_bucket
+    )
+    print(format_stats(stats, job_base_clean.count()))
+    write_pig_tsv(
+        spark.createDataFrame(duplicates, "job_id long, canonical_id long").coalesce(1),
+        str(output_dir.joinpath("job_duplicates").resolve()).replace("\\", "/"),
+    )
+
+    if args.show and not duplicates.empty:
+        sizes = duplicates["canonical_id"].value_counts().head(args.show)
+        members = pd.concat(
+            [pd.DataFrame({"canonical_id": sizes.index, "job_id": sizes.index}), duplicates]
+        )
+        members = members[members["canonical_id"].isin(sizes.index)]
+        titles = (
+            job_base_clean.join(spark.createDataFrame(members[["job_id"]], "job_id long"), "job_id")
+            .select("job_id", "title", "location_raw")
+            .toPandas()
+        )
+        shown = members.merge(titles, on="job_id").sort_values(["canonical_id", "job_id"])
+        print(shown.to_string(index=False))
+
+    if args.apply:
+        clean = drop_duplicates(job_base_clean, duplicates)
+        if args.input_format == "parquet":
+            _replace_dir(clean, store_dir.joinpath("job_base_clean"), lambda df, path: df.write.parquet(path))
+        else:
+            # The original line where the loader kept it, so shifted rows stay as they were.
+            fields = [F.coalesce(F.col(f.name).cast("string"), F.lit("")) for f in JOB_BASE_CLEAN_SCHEMA.fields]
+            line = F.coalesce(F.col("_raw"), F.concat_ws("\t", *fields))
+            _replace_dir(
+                clean.select(line.alias("value")),
+                output_dir.joinpath("job_base_clean"),
+                lambda df, path: df.write.text(path),
+            )
+        print(f"job_base_clean rewritten without {len(duplicates):,} reposts")
+
+    spark.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
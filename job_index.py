@@ -0,0 +1,356 @@
+"""Inverted index over job_base_clean for filtered posting lookups.
+
+Every posting is keyed by its normalized province, industry code, skill
+tokens, experience bucket, education level and employment type (the same
+rules as pig_location.pig / analysis.pig, see spark_normalize). Postings
+are numbered 0..N-1 in job_id order and each (dimension, value) term keeps
+its posting list in one of two containers:
+
+- a sorted int32 array of doc ids, for terms in fewer than N/32 postings
+- a bitmap of N bits, for denser terms (smaller than the array then)
+
+Saved under <output-dir>/job_index/:
+- job_ids.npy: doc id -> job_id
+- arrays.npy, bitmaps.npy: the concatenated containers (memory-mapped)
+- terms.json: n_docs and, per dimension, value -> [kind, offset, count]
+
+A query ANDs dimensions and ORs the values given for one dimension. The
+rarest clause is materialized first and the others only probe its doc ids
+(binary search in arrays, bit tests in bitmaps), so queries stay in the
+millisecond range without Spark.
+
+Usage:
+    python job_index.py build
+    python job_index.py query --province "Hà Nội" --skill SQL --experience "1-3 NĂM"
+    python job_index.py facet skill --province "Hà Nội" --top 20
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# pyspark is only imported to build the index; queries need numpy alone.
+from location_normalizer import default_matcher
+
+
+# dimension -> query option / meaning
+DIMENSIONS = {
+    "province": "normalized province (pig_location.pig)",
+    "industry": "industry_code (analysis.pig industry_id)",
+    "skill": "skill token",
+    "experience": "experience bucket",
+    "education": "education level",
+    "employment_type": "employment type",
+}
+
+ARRAY, BITMAP = "a", "b"
+
+# A bitmap costs N/8 bytes, an array 4 bytes per posting.
+_BITMAP_MIN_FRACTION = 1 / 32
+
+
+def collect_postings(job_base_clean):
+    """(job_ids, rows) from a job_base_clean DataFrame.
+
+    job_ids is the sorted array of distinct non-null job ids; rows yields
+    (dimension, value, sorted job_id list) per term.
+    """
+    from pyspark.sql import functions as F
+
+    import spark_normalize as norm
+    from spark_explore_output import normalize_location
+    from spark_requirements import _pig
+
+    def _pairs(dimension, values):
+        return F.transform(values, lambda v: F.struct(F.lit(dimension).alias("dimension"), v.alias("value")))
+
+    industry = norm.industry_name(_pig("raw_ind"), hidden_is_unknown=False)
+    pairs = F.concat(
+        _pairs("province", F.array(normalize_location(_pig("raw_loc"))["province_name"])),
+        _pairs("industry", F.array(norm.industry_id(industry))),
+        _pairs("skill", norm.tokens(_pig("raw_skill"))),
+        _pairs("experience", F.array(norm.experience_bucket(_pig("raw_exp")))),
+        _pairs("education", F.array(norm.education_level(_pig("raw_edu")))),
+        _pairs("employment_type", F.array(norm.employment_type(_pig("raw_type")))),
+    )
+    jobs = job_base_clean.where(F.col("job_id").isNotNull())
+    job_ids = np.unique(
+        np.fromiter((r[0] for r in jobs.select("job_id").distinct().toLocalIterator()), dtype=np.int64)
+    )
+    terms = (
+        jobs.select("job_id", F.explode(pairs).alias("p"))
+        .groupBy("p.dimension", "p.value")
+        .agg(F.array_sort(F.collect_set("job_id")).alias("job_ids"))
+    )
+    return job_ids, ((r["dimension"], r["value"], r["job_ids"]) for r in terms.toLocalIterator())
+
+
+def build_index(job_ids: np.ndarray, rows) -> dict:
+    """Containers for (dimension, value, job_ids) rows; job_ids must be sorted and unique."""
+    n_docs = len(job_ids)
+    bitmap_min = max(1, int(n_docs * _BITMAP_MIN_FRACTION))
+    n_bytes = (n_docs + 7) // 8
+    arrays, bitmaps, n_arrays = [], [], 0
+    terms: dict[str, dict[str, list]] = {dim: {} for dim in DIMENSIONS}
+    for dimension, value, ids in rows:
+        docs = np.searchsorted(job_ids, np.asarray(ids, dtype=np.int64)).astype(np.int32)
+        if len(docs) >= bitmap_min:
+            bits = np.zeros(n_docs, dtype=bool)
+            bits[docs] = True
+            terms[dimension][value] = [BITMAP, len(bitmaps), len(docs)]
+            bitmaps.append(np.packbits(bits, bitorder="little"))
+        else:
+            terms[dimension][value] = [ARRAY, n_arrays, len(docs)]
+            arrays.append(docs)
+            n_arrays += len(docs)
+    return {
+        "job_ids": np.asarray(job_ids, dtype=np.int64),
+        "arrays": np.concatenate(arrays) if arrays else np.zeros(0, dtype=np.int32),
+        "bitmaps": np.concatenate(bitmaps) if bitmaps else np.zeros(0, dtype=np.uint8),
+        "terms": {"n_docs": n_docs, "bitmap_bytes": n_bytes, "dimensions": terms},
+    }
+
+
+def save_index(index: dict, out_dir: Path) -> None:
+    from local_io import atomic_output
+
+    for name in ["job_ids", "arrays", "bitmaps"]:
+        with atomic_output(out_dir.joinpath(f"{name}.npy"), "wb") as f:
+            np.save(f, index[name])
+    with atomic_output(out_dir.joinpath("terms.json"), "w", encoding="utf-8") as f:
+        json.dump(index["terms"], f, ensure_ascii=False)
+
+
+def _industry_code(value: str) -> str:
+    # industry_id(industry_name(...)) of analysis.pig, so names and codes both work.
+    name = value.strip()
+    for sep in "/,>":
+        # spark_normalize._first_segment: a value starting with the separator is kept.
+        name = re.match(f"[^{sep}]*", name).group(0) or name
+    name = re.sub(r"\s+", " ", name).strip().upper()
+    slug = re.sub(r"[^A-Z0-9_-]", "", re.sub(r"\s+", "_", name))
+    return slug or "UNKNOWN"
+
+
+class JobIndex:
+    def __init__(self, job_ids: np.ndarray, arrays: np.ndarray, bitmaps: np.ndarray, terms: dict) -> None:
+        self.job_ids = job_ids
+        self.arrays = arrays
+        self.bitmaps = bitmaps
+        self.n_docs: int = terms["n_docs"]
+        self._bitmap_bytes: int = terms["bitmap_bytes"]
+        self.terms: dict[str, dict[str, list]] = terms["dimensions"]
+
+    @classmethod
+    def load(cls, index_dir: Path, mmap: bool = True) -> "JobIndex":
+        mode = "r" if mmap else None
+        arrays = [np.load(index_dir.joinpath(f"{name}.npy"), mmap_mode=mode) for name in ["job_ids", "arrays", "bitmaps"]]
+        with open(index_dir.joinpath("terms.json"), encoding="utf-8") as f:
+            terms = json.load(f)
+        return cls(*arrays, terms)
+
+    def normalize(self, dimension: str, value: str) -> str:
+        """Map a query value to the indexed form ("Hà Nội" -> "HA NOI")."""
+        if dimension not in self.terms:
+            raise KeyError(f"unknown dimension: {dimension!r} (one of {', '.join(DIMENSIONS)})")
+        if dimension == "province":
+            return default_matcher().province(value)
+        if dimension == "industry":
+            return _industry_code(value)
+        return value.strip().upper()
+
+    def _term(self, dimension: str, value: str) -> list | None:
+        return self.terms[dimension].get(self.normalize(dimension, value))
+
+    def _docs(self, term: list) -> np.ndarray:
+        kind, offset, count = term
+        if kind == ARRAY:
+            return np.asarray(self.arrays[offset : offset + count])
+        bits = np.unpackbits(self._bitmap(offset), count=self.n_docs, bitorder="little")
+        return np.flatnonzero(bits).astype(np.int32)
+
+    def _bitmap(self, offset: int) -> np.ndarray:
+        start = offset * self._bitmap_bytes
+        return self.bitmaps[start : start + self._bitmap_bytes]
+
+    def _contains(self, term: list, docs: np.ndarray) -> np.ndarray:
+        """Boolean mask: which of the sorted `docs` are in the term's posting list."""
+        kind, offset, count = term
+        if kind == BITMAP:
+            return ((self._bitmap(offset)[docs >> 3] >> (docs & 7)) & 1).astype(bool)
+        postings = self.arrays[offset : offset + count]
+        pos = np.searchsorted(postings, docs)
+        pos[pos == count] = 0
+        return postings[pos] == docs if count else np.zeros(len(docs), dtype=bool)
+
+    def postings(self, dimension: str, value: str) -> np.ndarray:
+        """Sorted doc ids of one term (empty when the value is not indexed)."""
+        term = self._term(dimension, value)
+        return self._docs(term) if term else np.zeros(0, dtype=np.int32)
+
+    def match(self, filters: dict[str, str | list[str]]) -> np.ndarray:
+        """Sorted doc ids matching every dimension (any of its values)."""
+        clauses = []
+        for dimension, values in filters.items():
+            if isinstance(values, str):
+                values = [values]
+            terms = [t for t in (self._term(dimension, v) for v in values) if t]
+            if not terms:
+                return np.zeros(0, dtype=np.int32)
+            clauses.append(terms)
+        if not clauses:
+            return np.arange(self.n_docs, dtype=np.int32)
+
+        clauses.sort(key=lambda terms: sum(t[2] for t in terms))
+        dense = [terms for terms in clauses if all(t[0] == BITMAP for t in terms)]
+        if len(dense) == len(clauses) or len(dense) > 1 and clauses[0] is dense[0]:
+            # Only dense terms before the first array: AND / OR the bitmaps
+            # bytewise and decode once.
+            bits = None
+            for terms in dense:
+                words = np.bitwise_or.reduce([self._bitmap(t[1]) for t in terms])
+                bits = words if bits is None else bits & words
+            docs = np.flatnonzero(np.unpackbits(bits, count=self.n_docs, bitorder="little")).astype(np.int32)
+            rest = [terms for terms in clauses if terms not in dense]
+        else:
+            first, rest = clauses[0], clauses[1:]
+            docs = self._docs(first[0])
+            if len(first) > 1:
+                docs = np.unique(np.concatenate([docs] + [self._docs(t) for t in first[1:]]))
+        for terms in rest:
+            if not len(docs):
+                break
+            mask = self._contains(terms[0], docs)
+            for term in terms[1:]:
+                mask |= self._contains(term, docs)
+            docs = docs[mask]
+        return docs
+
+    def query(self, limit: int | None = None, **filters) -> tuple[np.ndarray, int]:
+        """(job_ids, count): matching job ids in job_id order (at most `limit`) and the total."""
+        docs = self.match(filters)
+        return np.asarray(self.job_ids[docs[:limit]]), len(docs)
+
+    def count(self, **filters) -> int:
+        return len(self.match(filters))
+
+    def facet(self, dimension: str, top: int | None = 10, **filters) -> list[tuple[str, int]]:
+        """Postings per value of `dimension` among the matches, most frequent first."""
+        docs = self.match(filters)
+        counts = []
+        for value, term in self.terms[dimension].items():
+            n = term[2] if len(docs) == self.n_docs else int(self._contains(term, docs).sum())
+            if n:
+                counts.append((value, n))
+        counts.sort(key=lambda vc: (-vc[1], vc[0]))
+        return counts[:top]
+
+
+def _build(args) -> None:
+    from pyspark import StorageLevel
+    from pyspark.sql import SparkSession
+
+    from spark_explore_output import _file_glob, load_job_base_clean
+
+    output_dir = Path(args.output_dir)
+    store_dir = Path(args.store_dir) if args.store_dir else output_dir.joinpath("store")
+
+    os.environ.setdefault("PYSPARK_PYTHON", sys.executable)
+    os.environ.setdefault("PYSPARK_DRIVER_PYTHON", sys.executable)
+
+    spark = (
+        SparkSession.builder.appName("recruitment-job-index")
+        .master("local[*]")
+        .config("spark.pyspark.python", sys.executable)
+        .config("spark.pyspark.driver.python", sys.executable)
+        .config("spark.sql.execution.arrow.pyspark.enabled", "true")
+        .getOrCreate()
+    )
+    spark.sparkContext.setLogLevel("WARN")
+
+    if args.input_format == "parquet":
+        job_base_clean = spark.read.parquet(_file_glob(store_dir, "job_base_clean"))
+    else:
+        job_base_clean = load_job_base_clean(spark, _file_glob(output_dir, "job_base_clean", "part-*"))
+    job_base_clean = job_base_clean.persist(StorageLevel.MEMORY_AND_DISK)
+
+    job_ids, rows = collect_postings(job_base_clean)
+    index = build_index(job_ids, rows)
+    job_base_clean.unpersist()
+    spark.stop()
+
+    save_index(index, args.index_dir)
+    n_terms = sum(len(values) for values in index["terms"]["dimensions"].values())
+    n_bitmaps = len(index["bitmaps"]) // max(index["terms"]["bitmap_bytes"], 1)
+    print(
+        f"job index: {index['terms']['n_docs']} postings, {n_terms} terms "
+        f"({n_bitmaps} bitmaps, {len(index['arrays'])} array entries) -> {args.index_dir}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inverted index over job_base_clean")
+    parser.add_argument(
+        "--output-dir",
+        default=str(Path(__file__).parent.joinpath("output")),
+        help="Path to the Pig output folder (default: ./output)",
+    )
+    parser.add_argument(
+        "--index-dir",
+        default=None,
+        help="Where the index files go (default: <output-dir>/job_index)",
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_build = sub.add_parser("build", help="Build the index from job_base_clean")
+    p_build.add_argument(
+        "--input-format",
+        default="tsv",
+        choices=["tsv", "parquet"],
+        help="Read job_base_clean from the Pig part-* files or the Parquet store",
+    )
+    p_build.add_argument("--store-dir", default=None, help="Parquet store directory (default: <output-dir>/store)")
+
+    p_query = sub.add_parser("query", help="job_ids matching the filters")
+    p_query.add_argument("--limit", type=int, default=20, help="Job ids to print (default: 20)")
+    p_facet = sub.add_parser("facet", help="Postings per value of a dimension among the matches")
+    p_facet.add_argument("dimension", choices=list(DIMENSIONS))
+    p_facet.add_argument("--top", type=int, default=10)
+    for p in (p_query, p_facet):
+        for dimension, meaning in DIMENSIONS.items():
+            p.add_argument(
+                f"--{dimension.replace('_', '-')}",
+                dest=dimension,
+                action="append",
+                help=f"Filter on {meaning}; repeat to OR values",
+            )
+
+    args = parser.parse_args()
+    args.index_dir = Path(args.index_dir) if args.index_dir else Path(args.output_dir).joinpath("job_index")
+
+    if args.command == "build":
+        _build(args)
+        return
+
+    index = JobIndex.load(args.index_dir)
+    filters = {dim: getattr(args, dim) for dim in DIMENSIONS if getattr(args, dim)}
+    if args.command == "facet":
+        for value, n in index.facet(args.dimension, args.top, **filters):
+            print(f"{n:8d}  {value}")
+        return
+
+    job_ids, count = index.query(args.limit, **filters)
+    print(f"{count} postings")
+    for job_id in job_ids:
+        print(job_id)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,396 @@
+"""In-process pandas engine for the viz tables (no JVM).
+
+Every table exported by spark_explore_output.py is small (a few hundred
+rows), so `--engine local` computes them with vectorized pandas instead
+of Spark: the same Pig part-* loader (`_read_local_tsv_frames`), the same
+filters (IRRELEVANT_CATEGORIES / SUMMARY_INDUSTRY), the same ordering
+rules as Spark (asc = nulls first, desc = nulls last) and the same single
+CSV / Parquet export files.
+
+`--parity` builds the tables with both engines and diffs them: tables
+with an orderBy must match row for row, the others as multisets.
+
+Usage:
+    python local_engine.py --output-dir output --export
+    python spark_explore_output.py --engine local --export      # same thing
+    python local_engine.py --output-dir output --parity
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import math
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from pyspark.sql import types as T
+
+import spark_explore_output as seo
+from job_cube import REQUIREMENT_DIMENSIONS, JobCube
+from local_io import atomic_output
+from run_metrics import RunMetrics
+from spark_explore_output import (
+    IRRELEVANT_CATEGORIES,
+    IRRELEVANT_CATEGORY_PARTS,
+    REQUIREMENT_TABLES,
+    SUMMARY_INDUSTRY,
+    VIZ_SOURCES,
+)
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # CSV export only.
+    pa = None
+    pq = None
+
+
+# viz tables with an explicit orderBy (row order is part of the output)
+ORDERED_TABLES = {"province_total"} | {
+    name for name, sources in VIZ_SOURCES.items() if sources[0] in REQUIREMENT_TABLES
+}
+
+
+def _schema(*fields: tuple[str, T.DataType]) -> T.StructType:
+    return T.StructType([T.StructField(name, dtype, True) for name, dtype in fields])
+
+
+_INPUT_SCHEMAS = {
+    "industry_total": _schema(("industry", T.StringType()), ("job_count", T.LongType())),
+    "industry_by_location": _schema(
+        ("province", T.StringType()), ("industry", T.StringType()), ("job_count", T.LongType())
+    ),
+    **{
+        name: _schema(
+            ("industry_code", T.StringType()),
+            ("industry", T.StringType()),
+            (label, T.StringType()),
+            ("job_count", T.LongType()),
+        )
+        for name, label in REQUIREMENT_TABLES.items()
+    },
+}
+
+
+def _read_tsv(path_glob: str, schema: T.StructType) -> pd.DataFrame:
+    """A Pig TSV dataset read the way Spark's CSV reader types it.
+
+    Empty fields are null, like spark.read.csv (nullValue "").
+    """
+    frames = list(seo._read_local_tsv_frames(path_glob, schema))
+    if not frames:
+        frame = pd.DataFrame({f.name: pd.Series(dtype=object) for f in schema.fields})
+    else:
+        frame = pd.concat(frames, ignore_index=True)
+    for field in schema.fields:
+        col = frame[field.name]
+        if isinstance(field.dataType, T.StringType):
+            frame[field.name] = col.astype(object).where(col.notna() & (col != ""), None)
+        else:
+            frame[field.name] = col.astype("Int64")
+    return frame
+
+
+def _read_parquet(path: Path) -> pd.DataFrame:
+    frame = pd.read_parquet(path)
+    for name in frame.columns:
+        if isinstance(frame[name].dtype, pd.CategoricalDtype):  # partition column
+            frame[name] = frame[name].astype(object)
+        elif pd.api.types.is_integer_dtype(frame[name].dtype):
+            frame[name] = frame[name].astype("Int64")
+        elif frame[name].dtype == object:
+            frame[name] = frame[name].where(frame[name].notna(), None)
+    return frame
+
+
+def load_inputs(
+    output_dir: Path,
+    input_format: str = "tsv",
+    store_dir: Path | None = None,
+    industry_codes: list[str] | None = None,
+    tables: list[str] | None = None,
+) -> dict[str, pd.DataFrame]:
+    """The viz inputs as pandas frames; same sources and filter as seo.load_inputs.
+
+    `tables` reads only those inputs (default: all).
+    """
+    store_dir = store_dir or output_dir.joinpath("store")
+    inputs = {}
+    for name, schema in _INPUT_SCHEMAS.items():
+        if tables is not None and name not in tables:
+            continue
+        if input_format == "parquet":
+            parts = ["requirement_analysis", name] if name in REQUIREMENT_TABLES else [name]
+            inputs[name] = _read_parquet(store_dir.joinpath(*parts))
+        else:
+            parts = ["requirement_analysis", name] if name in REQUIREMENT_TABLES else [name]
+            inputs[name] = _read_tsv(seo._file_glob(output_dir, *parts, "part-*"), schema)
+    if industry_codes:
+        for name in REQUIREMENT_TABLES:
+            if name not in inputs:
+                continue
+            inputs[name] = inputs[name][inputs[name]["industry_code"].isin(industry_codes)]
+    return inputs
+
+
+def is_irrelevant_category(col: pd.Series) -> pd.Series:
+    """pandas twin of spark_explore_output._is_irrelevant_category."""
+    # F.trim only strips spaces.
+    normalized = col.astype(object).where(col.notna(), None).map(
+        lambda v: v.strip(" ").upper() if isinstance(v, str) else None
+    )
+    out = normalized.isna() | normalized.isin(IRRELEVANT_CATEGORIES)
+    for part in IRRELEVANT_CATEGORY_PARTS:
+        out |= normalized.str.contains(part, regex=False, na=False)
+    return out.astype(bool)
+
+
+def order_by(frame: pd.DataFrame, keys: list[tuple[str, bool]]) -> pd.DataFrame:
+    """Stable sort with Spark's null placement: asc nulls first, desc nulls last."""
+    if frame.empty:
+        return frame.reset_index(drop=True)
+    sort_keys = []
+    for name, ascending in keys:
+        col = frame[name]
+        # Rank the non-null values only: Series.rank on Int64 ranks <NA> too.
+        null = col.isna().to_numpy()
+        rank = np.zeros(len(col))
+        rank[~null] = col[~null].rank(method="dense").to_numpy(dtype="float64")
+        sort_keys.append((null if not ascending else ~null, rank if ascending else -rank))
+    # np.lexsort sorts by the last key first.
+    order = np.lexsort([k for pair in reversed(sort_keys) for k in reversed(pair)])
+    return frame.iloc[order].reset_index(drop=True)
+
+
+def build_viz_frames(inputs: dict[str, pd.DataFrame]) -> dict[str, pd.DataFrame]:
+    """Same tables, columns and values as seo.build_viz_tables."""
+    viz: dict[str, pd.DataFrame] = {}
+
+    if "industry_total" in inputs:
+        industry_total = inputs["industry_total"]
+        industry = industry_total["industry"]
+        relevant = ~is_irrelevant_category(industry)
+        viz["industry_total"] = industry_total[relevant & (industry != SUMMARY_INDUSTRY)].reset_index(drop=True)
+        viz["industry_total_known"] = industry_total[
+            relevant & ~industry.isin(["UNKNOWN", SUMMARY_INDUSTRY])
+        ].reset_index(drop=True)
+
+    if "industry_by_location" in inputs:
+        by_location = inputs["industry_by_location"]
+        by_location = by_location[~is_irrelevant_category(by_location["industry"])].reset_index(drop=True)
+
+        province_total = (
+            by_location.groupby("province", sort=False, dropna=False)["job_count"]
+            .sum(min_count=1)
+            .rename("province_job_count")
+            .reset_index()
+        )
+        province_total = order_by(province_total, [("province_job_count", False), ("province", True)])
+
+        ranked = order_by(by_location, [("province", True), ("job_count", False), ("industry", True)])
+        ranked["rn"] = (ranked.groupby("province", sort=False, dropna=False).cumcount() + 1).astype("Int32")
+        top5 = ranked[ranked["rn"] <= 5].reset_index(drop=True)
+
+        # LEFT JOIN on province: a null province matches nothing.
+        totals = province_total[province_total["province"].notna()]
+        share = by_location.merge(totals, on="province", how="left")
+        share.loc[share["province"].isna(), "province_job_count"] = pd.NA
+        share["province_job_count"] = share["province_job_count"].astype("Int64")
+        positive = (share["province_job_count"] > 0).fillna(False).astype(bool)
+        ratio = share["job_count"].astype("Float64") / share["province_job_count"].astype("Float64")
+        share["share"] = ratio.where(positive, pd.NA)
+
+        viz["industry_by_location"] = by_location
+        viz["province_total"] = province_total
+        viz["top5_industries_by_province"] = top5
+        viz["province_industry_share"] = share[["province", "industry", "job_count", "province_job_count", "share"]]
+
+    for viz_name, sources in VIZ_SOURCES.items():
+        table = sources[0]
+        if table not in REQUIREMENT_TABLES or table not in inputs:
+            continue
+        label = REQUIREMENT_TABLES[table]
+        by_industry = inputs[table]
+        by_industry = by_industry[~is_irrelevant_category(by_industry[label])]
+        total = by_industry.groupby(label, sort=False, dropna=False)["job_count"].sum(min_count=1).reset_index()
+        total["job_count"] = total["job_count"].astype("Int64")
+        total = order_by(total, [("job_count", False), (label, True)])
+        if table == "skill_total":
+            total = total.head(500)
+        viz[viz_name] = total
+
+    return viz
+
+
+def _python_column(col: pd.Series) -> list:
+    """Column values as Python objects, nulls as None (what Spark's Arrow path yields)."""
+    values = col.astype(object).tolist()
+    return [None if v is None or v is pd.NA or (isinstance(v, float) and math.isnan(v)) else v for v in values]
+
+
+def export_frame(frame: pd.DataFrame, out_dir: Path, name: str, fmt: str) -> None:
+    """Single-file CSV / Parquet export, same layout as seo._export_df."""
+    fmt = fmt.lower().strip()
+    if fmt not in {"csv", "parquet"}:
+        raise ValueError(f"Unsupported export format: {fmt}")
+
+    if fmt == "csv":
+        out = out_dir / f"{name}.csv"
+        seo._remove_legacy_dir(out)
+        with atomic_output(out, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(list(frame.columns))
+            writer.writerows(zip(*(_python_column(frame[c]) for c in frame.columns)))
+        return
+
+    if pq is None:
+        raise RuntimeError("Parquet export with --engine local needs pyarrow")
+    out = out_dir / f"{name}.parquet"
+    seo._remove_legacy_dir(out)
+    with atomic_output(out, "wb") as f:
+        pq.write_table(pa.Table.from_pandas(frame, preserve_index=False), f)
+
+
+def _comparable(row: tuple) -> tuple:
+    """Sort key for rows that may hold None."""
+    return tuple((v is None, "" if v is None else v) for v in row)
+
+
+def parity(
+    output_dir: Path,
+    input_format: str = "tsv",
+    store_dir: Path | None = None,
+    industry_codes: list[str] | None = None,
+) -> bool:
+    """Build every viz table with both engines and report the differences."""
+    from pyspark.sql import SparkSession
+
+    t0 = time.perf_counter()
+    local = build_viz_frames(load_inputs(output_dir, input_format, store_dir, industry_codes))
+    t_local = time.perf_counter() - t0
+
+    os.environ.setdefault("PYSPARK_PYTHON", sys.executable)
+    os.environ.setdefault("PYSPARK_DRIVER_PYTHON", sys.executable)
+    t0 = time.perf_counter()
+    spark = (
+        SparkSession.builder.appName("recruitment-engine-parity")
+        .master("local[*]")
+        .config("spark.pyspark.python", sys.executable)
+        .config("spark.pyspark.driver.python", sys.executable)
+        .config("spark.sql.execution.arrow.pyspark.enabled", "true")
+        .getOrCreate()
+    )
+    spark.sparkContext.setLogLevel("WARN")
+    t_startup = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    viz = seo.build_viz_tables(seo.load_inputs(spark, output_dir, input_format, store_dir, industry_codes))
+    expected = {name: [tuple(r) for r in df.collect()] for name, df in viz.items()}
+    columns = {name: df.columns for name, df in viz.items()}
+    t_spark = time.perf_counter() - t0
+    spark.stop()
+
+    ok = set(expected) == set(local)
+    if not ok:
+        print(f"tables differ: spark {sorted(expected)} vs local {sorted(local)}")
+    for name in sorted(set(expected) & set(local)):
+        frame = local[name]
+        got = list(zip(*(_python_column(frame[c]) for c in frame.columns))) if len(frame) else []
+        want = expected[name]
+        if name not in ORDERED_TABLES:
+            got, want = sorted(got, key=_comparable), sorted(want, key=_comparable)
+        same = list(frame.columns) == columns[name] and got == want
+        ok &= same
+        print(f"{'ok  ' if same else 'DIFF'} {name} ({len(want)} rows{', ordered' if name in ORDERED_TABLES else ''})")
+        if not same:
+            if list(frame.columns) != columns[name]:
+                print(f"     columns: spark {columns[name]} vs local {list(frame.columns)}")
+            for a, b in [(a, b) for a, b in zip(want, got) if a != b][:5]:
+                print(f"     spark {a}\n     local {b}")
+            if len(want) != len(got):
+                print(f"     rows: spark {len(want)} vs local {len(got)}")
+    print(f"local engine {t_local:.3f}s; spark {t_spark:.1f}s + {t_startup:.1f}s session startup")
+    return ok
+
+
+def run(args: argparse.Namespace) -> int:
+    """The viz step with the local engine (args as parsed by spark_explore_output)."""
+    output_dir = Path(args.output_dir)
+    store_dir = Path(args.store_dir) if args.store_dir else output_dir.joinpath("store")
+
+    metrics_path = Path(args.metrics) if args.metrics else output_dir.joinpath("metrics", "run_report.jsonl")
+    metrics = RunMetrics(metrics_path)
+
+    t0 = time.perf_counter()
+    from_cube = []
+    if args.industry == "cube":
+        from_cube += ["industry_total", "industry_by_location"]
+    if args.requirements == "cube":
+        from_cube += list(REQUIREMENT_DIMENSIONS)
+    with metrics.step("load_inputs", "load", input_format=args.input_format, engine="local") as record:
+        tables = [name for name in _INPUT_SCHEMAS if name not in from_cube]
+        inputs = load_inputs(output_dir, args.input_format, store_dir, args.industry_code, tables)
+        record["input_rows"] = sum(len(frame) for frame in inputs.values())
+    if from_cube:
+        with metrics.step("job_cube", "load", engine="local") as record:
+            cube_inputs = JobCube.load(args.cube_dir).pig_inputs(args.industry_code)
+            inputs.update({name: cube_inputs[name] for name in from_cube})
+            record["cells"] = sum(len(cube_inputs[name]) for name in from_cube)
+    with metrics.step("build_viz_frames", "aggregate", engine="local") as record:
+        viz = build_viz_frames(inputs)
+        record["rows_out"] = sum(len(frame) for frame in viz.values())
+    for name, frame in viz.items():
+        if args.show:
+            print(f"\n== {name} ({len(frame)} rows) ==")
+            print(frame.head(args.show).to_string(index=False))
+    if args.export:
+        export_dir = Path(args.export_dir) if args.export_dir else output_dir.joinpath("viz")
+        export_dir.mkdir(parents=True, exist_ok=True)
+        for name, frame in viz.items():
+            with metrics.step(f"export:{name}", "export", format=args.export_format, engine="local") as record:
+                export_frame(frame, export_dir, name, args.export_format)
+                record["rows_out"] = len(frame)
+                record["bytes_written"] = export_dir.joinpath(f"{name}.{args.export_format}").stat().st_size
+    print(f"\n== local engine: {len(viz)} viz tables in {time.perf_counter() - t0:.3f}s ==")
+    print(f"== run report: {metrics_path} (run {metrics.run_id}) ==")
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Viz tables from the Pig outputs with pandas (no Spark)")
+    parser.add_argument(
+        "--output-dir",
+        default=str(Path(__file__).parent.joinpath("output")),
+        help="Path to the Pig output folder (default: ./output)",
+    )
+    parser.add_argument("--show", type=int, default=0, help="Rows to print per table")
+    parser.add_argument("--export", action="store_true", help="Export to <output-dir>/viz")
+    parser.add_argument("--export-format", default="csv", choices=["csv", "parquet"])
+    parser.add_argument("--export-dir", default=None, help="Default: <output-dir>/viz")
+    parser.add_argument("--input-format", default="tsv", choices=["tsv", "parquet"])
+    parser.add_argument("--store-dir", default=None, help="Parquet store directory (default: <output-dir>/store)")
+    parser.add_argument("--industry-code", action="append", default=None)
+    parser.add_argument("--metrics", default=None, help="Run report (default: <output-dir>/metrics/run_report.jsonl)")
+    parser.add_argument(
+        "--cube",
+        action="store_true",
+        help="Industry and experience / education / employment type inputs from the job cube (see job_cube.py)",
+    )
+    parser.add_argument("--cube-dir", default=None, help="Default: <output-dir>/job_cube")
+    parser.add_argument("--parity", action="store_true", help="Diff every table against the Spark engine")
+    args = parser.parse_args()
+    args.industry = args.requirements = "cube" if args.cube else "pig"
+    args.cube_dir = Path(args.cube_dir) if args.cube_dir else Path(args.output_dir).joinpath("job_cube")
+
+    if args.parity:
+        store_dir = Path(args.store_dir) if args.store_dir else None
+        return 0 if parity(Path(args.output_dir), args.input_format, store_dir, args.industry_code) else 1
+    return run(args)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,69 @@
+"""Driver-side file helpers that do not import pyspark.
+
+- atomic_output: write a file next to its target and rename it into place
+- write_swap: the same for a Spark output directory
+- load_matrix: the CSR feature matrix written by feature_matrix.py
+
+Kept free of pyspark so numpy-only readers (industry_similarity.py) start
+without a JVM-side dependency.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+
+try:
+    import scipy.sparse as sp
+except ImportError:  # load_matrix then returns the raw CSR arrays.
+    sp = None
+
+MATRIX_ARRAYS = ["data", "indices", "indptr"]
+
+
+@contextlib.contextmanager
+def atomic_output(out: Path, mode: str = "w", **open_kwargs):
+    """Open a temp file next to `out` and rename it into place on success.
+
+    Readers (dashboards, make_figures.py) never see a half-written file; on
+    failure the previous output is left untouched.
+    """
+    out.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out.with_name(f".{out.name}.tmp")
+    try:
+        with open(tmp, mode, **open_kwargs) as f:
+            yield f
+        os.replace(tmp, out)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+def write_swap(df, target: Path, partition_by: list[str] | None = None) -> None:
+    """Write Spark DataFrame `df` as Parquet next to `target`, then swap
+    directories (so `df` may read `target`)."""
+    tmp = target.with_name(target.name + ".new")
+    writer = df.write.mode("overwrite")
+    if partition_by:
+        writer = writer.partitionBy(*partition_by)
+    writer.parquet(str(tmp.resolve()).replace("\\", "/"))
+    if target.exists():
+        shutil.rmtree(target)
+    os.replace(tmp, target)
+
+
+def load_matrix(out_dir: Path, mmap: bool = True):
+    """(matrix, index): a scipy CSR matrix over memory-mapped arrays, or the
+    raw (data, indices, indptr) tuple when scipy is missing."""
+    mode = "r" if mmap else None
+    arrays = [np.load(out_dir.joinpath(f"{name}.npy"), mmap_mode=mode) for name in MATRIX_ARRAYS]
+    with open(out_dir.joinpath("index.json"), encoding="utf-8") as f:
+        index = json.load(f)
+    if sp is None:
+        return tuple(arrays), index
+    return sp.csr_matrix(tuple(arrays), shape=tuple(index["shape"])), index
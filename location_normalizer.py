@@ -0,0 +1,375 @@
+"""Vietnamese location normalizer shared by Spark and pandas (pig_location.pig).
+
+pig_location.pig lowercases `raw_loc`, strips diacritics with seven nested
+REPLACE alternations and then tries ~65 `MATCHES '.*(a|b|...).*'` rules in
+order. Here the text is folded once (one translate table) and every
+keyword of every rule is compiled into a single Aho-Corasick automaton, so
+a location is scanned once, left to right, whatever the number of rules.
+The rule that wins is still the first one in PROVINCE_RULES order, exactly
+like the Pig CASE chain.
+
+`normalize_series` works on a whole pandas Series and classifies each
+distinct value once; spark_explore_output.py applies it through a pandas
+UDF. spark_normalize.py keeps the regex-chain Spark columns built from the
+same tables; both fold the same way, and both also drop the combining marks
+of decomposed (NFD) text, which the Pig chain leaves in place.
+"""
+
+from __future__ import annotations
+
+import re
+
+try:
+    import pandas as pd
+except ImportError:  # The Spark Docker image ships without pandas.
+    pd = None
+
+
+UNKNOWN = "UNKNOWN"
+OVERSEAS = "OVERSEAS"
+
+# pig_location.pig step 4: LOWER + REPLACE chain (applied in this order).
+DIACRITIC_RULES = [
+    ("á|à|ả|ã|ạ|ă|ắ|ằ|ẳ|ẵ|ặ|â|ấ|ầ|ẩ|ẫ|ậ", "a"),
+    ("é|è|ẻ|ẽ|ẹ|ê|ế|ề|ể|ễ|ệ", "e"),
+    ("í|ì|ỉ|ĩ|ị", "i"),
+    ("ó|ò|ỏ|õ|ọ|ô|ố|ồ|ổ|ỗ|ộ|ơ|ớ|ờ|ở|ỡ|ợ", "o"),
+    ("ú|ù|ủ|ũ|ụ|ư|ứ|ừ|ử|ữ|ự", "u"),
+    ("[ýỳỷỹỵ]", "y"),
+    ("[đ]", "d"),
+]
+
+# Combining marks (U+0300-U+036F) left over when the text arrives decomposed
+# (NFD): the REPLACE list only knows precomposed letters, so both the Spark
+# chain and `fold` drop these right after it.
+COMBINING_MARKS = "[\u0300-\u036f]"
+
+# pig_location.pig step 4b.
+SEPARATOR_RULES = [
+    ("\u00a0", " "),
+    (r"\|", " "),
+    (r"\.\.\.|…", " "),
+]
+
+# pig_location.pig step 5: first match wins, evaluated top to bottom.
+PROVINCE_RULES = [
+    ("UNKNOWN", r"negotiable|hidden|khong hien thi|n\/a"),
+    ("OVERSEAS", r"overseas|nuoc ngoai|japan|korea|china|usa|uk|singapore|taiwan|nhat ban|han quoc|trung quoc|dai loan|australia|uc|philippines|international"),
+    ("DA NANG", r"da nang|danang|hai chau|thanh khe|son tra|ngu hanh son|lien chieu|hoa vang|quan cam le|cam le|kinh duong vuong|hoa minh|nui thanh"),
+    ("TP HO CHI MINH", r"ho chi minh|hochiminh|hcm|sai gon|saigon|ben nghe|ben thanh|quan\s*0?(1|2|3|4|5|6|7|8|9|10|11|12)|q\.?\s*0?(1|2|3|4|5|6|7|8|9|10|11|12)|dist\.?\s*0?(1|2|3|4|5|6|7|8|9|10|11|12)|district\s*0?(1|2|3|4|5|6|7|8|9|10|11|12)|thu duc|binh thanh|tan binh|tan phu|go vap|binh chanh|binh tan|phu nhuan|hoc mon|cu chi|nha be|can gio|van hanh mall|pham ngu lao|le dai hanh|le van sy|nguyen dinh chieu|landmark 81|vincom center landmark|takashimaya|saigon centre|phu my hung|hiep phuoc"),
+    ("HA NOI", r"ha noi|hanoi|hn|ba dinh|dong da|cau giay|hoan kiem|hai ba trung|ha dong|nam tu liem|bac tu liem|dong anh|soc son|me linh|tay ho|hoang mai|thanh xuan|long bien|thanh tri|gia lam|hoai duc|thuong tin|chuong my|quoc oai|dan phuong|duy tan|dich vong|dich vong hau|dao duy anh|lieu giai|royal city|times city|pham hung|my dinh|me tri|son tay|ba vi|thach that|hoa lac|phu xuyen|thanh oai|xuan dinh|xuan tao|yen hoa|linh nam|pham van dong|lotte mall west lake"),
+    ("HAI PHONG", r"hai phong|haiphong|ngo quyen|le chan|hong bang|kien an|do son|thuy nguyen|hai an"),
+    ("CAN THO", r"can tho|cantho|ninh kieu|cai rang|binh thuy|o mon|thot not"),
+    ("BAC NINH", r"bac ninh|bacninh|tu son|yen phong|que vo|thuan thanh|gia binh|luong tai"),
+    ("BAC GIANG", r"bac giang|bacgiang|viet yen|hiep hoa|lang giang|luc nam|luc ngan|tan yen|yen dung|noi hoang|son dong"),
+    ("VINH PHUC", r"vinh phuc|vinhphuc|vinh yen|phuc yen|binh xuyen|tam duong|lap thach"),
+    ("HUNG YEN", r"hung yen|hungyen|my hao|van lam|van giang|yen my|tien lu"),
+    ("HAI DUONG", r"hai duong|haiduong|chi linh|cam giang|kinh mon|nam sach"),
+    ("THAI BINH", r"thai binh|thaibinh|kien xuong|dong hung|tien hai|hung ha"),
+    ("NAM DINH", r"nam dinh|namdinh|my loc|y yen|hai hau|xuan truong"),
+    ("HA NAM", r"ha nam|hanam|phu ly|dong van|kim bang|ly nhan"),
+    ("THAI NGUYEN", r"thai nguyen|thainguyen|song cong|pho yen|dai tu|phu binh"),
+    ("PHU THO", r"phu tho|phutho|viet tri|phu ninh|lam thao|doan hung"),
+    ("LANG SON", r"lang son|langson|dong dang|cao loc|huu lung|trang dinh"),
+    ("LAO CAI", r"lao cai|laocai|sapa|bao thang|bat xat"),
+    ("YEN BAI", r"yen bai|yenbai|nghia lo|tran yen|luc yen"),
+    ("SON LA", r"son la|sonla|moc chau|mai son|thuan chau"),
+    ("HOA BINH", r"hoa binh|hoabinh|luong son|ky son|tan lac"),
+    ("DIEN BIEN", r"dien bien|dienbien|dien bien phu|muong lay"),
+    ("LAI CHAU", r"lai chau|laichau|tan uyen|phong tho"),
+    ("HA GIANG", r"ha giang|hagiang|dong van|meo vac"),
+    ("CAO BANG", r"cao bang|caobang|bao lac|bao lam"),
+    ("TUYEN QUANG", r"tuyen quang|tuyenquang|son duong|yen son"),
+    ("BAC KAN", r"bac kan|backan|bac can|cho don"),
+    ("QUANG NINH", r"quang ninh|quangninh|ha long|cam pha|uong bi|mong cai|dong trieu|hai ha"),
+    ("NINH BINH", r"ninh binh|ninhbinh|tam diep|hoa lu|yen khanh"),
+    ("THANH HOA", r"thanh hoa|thanhhoa|bim son|sam son|nghi son|tinh gia|quang xuong|hau loc|hoang hoa|cam thuy"),
+    ("NGHE AN", r"nghe an|nghean|vinh|cua lo|dien chau|nghi loc|quynh luu"),
+    ("HA TINH", r"ha tinh|hatinh|ky anh|hong linh|can loc"),
+    ("QUANG BINH", r"quang binh|quangbinh|dong hoi|bo trach|le thuy|quang trach"),
+    ("QUANG TRI", r"quang tri|quangtri|dong ha|hai lang|gio linh|vinh linh"),
+    ("THUA THIEN HUE", r"thua thien hue|thuathienhue|hue|phu vang|phu loc|huong thuy|huong tra"),
+    ("QUANG NAM", r"quang nam|quangnam|tam ky|hoi an|dien ban|thang binh"),
+    ("QUANG NGAI", r"quang ngai|quangngai|son tinh|binh son|duc pho"),
+    ("BINH DINH", r"binh dinh|binhdinh|quy nhon|an nhon|tay son"),
+    ("PHU YEN", r"phu yen|phuyen|tuy hoa|song cau"),
+    ("KHANH HOA", r"khanh hoa|khanhhoa|nha trang|cam ranh|ninh hoa"),
+    ("NINH THUAN", r"ninh thuan|ninhthuan|phan rang|ninh hai|ninh phuoc"),
+    ("BINH THUAN", r"binh thuan|binhthuan|phan thiet|la gi|bac binh|tuy phong"),
+    ("DAK LAK", r"dak lak|daklak|buon ma thuot|krong pac|ea kar|cu mgar"),
+    ("DAK NONG", r"dak nong|daknong|gia nghia|dak rlap|dak song"),
+    ("GIA LAI", r"gia lai|gialai|pleiku|chu se|chu prong|ia grai"),
+    ("KON TUM", r"kon tum|kontum|dak ha|dak to|sa thay"),
+    ("LAM DONG", r"lam dong|lamdong|da lat|bao loc|duc trong|di linh"),
+    ("BINH DUONG", r"binh duong|binhduong|di an|thuan an|tan uyen|ben cat|bau bang|vsip 1|vsip 2|thu dau mot"),
+    ("DONG NAI", r"dong nai|dongnai|bien hoa|long thanh|nhon trach|trang bom"),
+    ("BA RIA - VUNG TAU", r"ba ria|baria|vung tau|phu my|long dien|dat do|xuyen moc"),
+    ("TAY NINH", r"tay ninh|tayninh|moc bai|trang bang|hoa thanh"),
+    ("BINH PHUOC", r"binh phuoc|binhphuoc|dong xoai|chon thanh|bu dang"),
+    ("LONG AN", r"long an|longan|tan an|duc hoa|ben luc|can duoc"),
+    ("TIEN GIANG", r"tien giang|tiengiang|my tho|cai lay|go cong"),
+    ("BEN TRE", r"ben tre|bentre|mo cay|giong trom|ba tri"),
+    ("VINH LONG", r"vinh long|vinhlong|binh minh|long ho"),
+    ("TRA VINH", r"tra vinh|travinh|cau ke|tieu can"),
+    ("DONG THAP", r"dong thap|dongthap|cao lanh|sa dec|hong ngu"),
+    ("AN GIANG", r"an giang|angiang|long xuyen|chau doc|tan chau"),
+    ("KIEN GIANG", r"kien giang|kiengiang|rach gia|phu quoc|ha tien"),
+    ("HAU GIANG", r"hau giang|haugiang|vi thanh|nga bay"),
+    ("SOC TRANG", r"soc trang|soctrang|vinh chau|ke sach"),
+    ("BAC LIEU", r"bac lieu|baclieu|gia rai|hong dan"),
+    ("CA MAU", r"ca mau|camau|dam doi|ngoc hien"),
+]
+
+# pig_location.pig step 5b: UNKNOWN=0, OVERSEAS=-1, provinces 1-63.
+PROVINCE_IDS = {
+    "OVERSEAS": -1,
+    "UNKNOWN": 0,
+    "AN GIANG": 1,
+    "BA RIA - VUNG TAU": 2,
+    "BAC GIANG": 3,
+    "BAC KAN": 4,
+    "BAC LIEU": 5,
+    "BAC NINH": 6,
+    "BEN TRE": 7,
+    "BINH DINH": 8,
+    "BINH DUONG": 9,
+    "BINH PHUOC": 10,
+    "BINH THUAN": 11,
+    "CA MAU": 12,
+    "CAN THO": 13,
+    "CAO BANG": 14,
+    "DA NANG": 15,
+    "DAK LAK": 16,
+    "DAK NONG": 17,
+    "DIEN BIEN": 18,
+    "DONG NAI": 19,
+    "DONG THAP": 20,
+    "GIA LAI": 21,
+    "HA GIANG": 22,
+    "HA NAM": 23,
+    "HA NOI": 24,
+    "HA TINH": 25,
+    "HAI DUONG": 26,
+    "HAI PHONG": 27,
+    "HAU GIANG": 28,
+    "HOA BINH": 29,
+    "HUNG YEN": 30,
+    "KHANH HOA": 31,
+    "KIEN GIANG": 32,
+    "KON TUM": 33,
+    "LAI CHAU": 34,
+    "LAM DONG": 35,
+    "LANG SON": 36,
+    "LAO CAI": 37,
+    "LONG AN": 38,
+    "NAM DINH": 39,
+    "NGHE AN": 40,
+    "NINH BINH": 41,
+    "NINH THUAN": 42,
+    "PHU THO": 43,
+    "PHU YEN": 44,
+    "QUANG BINH": 45,
+    "QUANG NAM": 46,
+    "QUANG NGAI": 47,
+    "QUANG NINH": 48,
+    "QUANG TRI": 49,
+    "SOC TRANG": 50,
+    "SON LA": 51,
+    "TAY NINH": 52,
+    "THAI BINH": 53,
+    "THAI NGUYEN": 54,
+    "THANH HOA": 55,
+    "THUA THIEN HUE": 56,
+    "TIEN GIANG": 57,
+    "TP HO CHI MINH": 58,
+    "TRA VINH": 59,
+    "TUYEN QUANG": 60,
+    "VINH LONG": 61,
+    "VINH PHUC": 62,
+    "YEN BAI": 63,
+}
+
+
+_WHITESPACE = " \t\n\x0b\f\r"  # Java regex \s
+_DIGITS_1_9 = "123456789"
+_REGEX_META = set("\\.^$*+?{}[]|()")
+
+# DIACRITIC_RULES letter by letter, then COMBINING_MARKS dropped; `đ` and the
+# step 4b separators are single characters too.
+_FOLD_TABLE = {
+    ord(ch): repl
+    for pattern, repl in DIACRITIC_RULES
+    for ch in pattern.strip("[]").replace("|", "")
+}
+_FOLD_TABLE.update({cp: None for cp in range(0x0300, 0x0370)})
+_FOLD_TABLE.update({ord("\u00a0"): " ", ord("|"): " ", ord("…"): " "})
+
+# `<word>\.?\s*0?(1|2|...|12)`: the HCM district rules. Unanchored, the
+# number alternation is the same as "a digit 1-9 follows".
+_DISTRICT_PATTERN = re.compile(r"^(\w+)(\\\.\?)?\\s\*0\?\((?:\d+\|)*\d+\)$")
+
+
+def fold(raw: str | None) -> str:
+    """`loc_clean_norm` of pig_location.pig (None -> '').
+
+    Same result as spark_normalize.location_clean: the precomposed letters of
+    DIACRITIC_RULES, then COMBINING_MARKS, then SEPARATOR_RULES. Letters
+    outside the REPLACE list are kept, as in the Pig chain.
+    """
+    if not raw:
+        return ""
+    return raw.lower().translate(_FOLD_TABLE).replace("...", " ")
+
+
+def _split_alternatives(pattern: str) -> list[str]:
+    parts, depth, start = [], 0, 0
+    for i, ch in enumerate(pattern):
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif ch == "|" and depth == 0:
+            parts.append(pattern[start:i])
+            start = i + 1
+    parts.append(pattern[start:])
+    return parts
+
+
+def _keywords(pattern: str) -> list[tuple[str, bool | None]]:
+    """(keyword, guard) pairs of one rule.
+
+    guard is None for a plain substring, otherwise the keyword must be
+    followed by a district number (True: an optional '.' is allowed first).
+    """
+    out = []
+    for alt in _split_alternatives(pattern):
+        district = _DISTRICT_PATTERN.match(alt)
+        if district:
+            out.append((district.group(1), district.group(2) is not None))
+            continue
+        literal = alt.replace("\\/", "/")
+        if any(ch in _REGEX_META for ch in literal):
+            raise ValueError(f"unsupported location pattern: {alt!r}")
+        out.append((literal, None))
+    return out
+
+
+def _district_follows(text: str, i: int, allow_dot: bool) -> bool:
+    n = len(text)
+    if allow_dot and i < n and text[i] == ".":
+        i += 1
+    while i < n and text[i] in _WHITESPACE:
+        i += 1
+    if i < n and text[i] == "0" and i + 1 < n and text[i + 1] in _DIGITS_1_9:
+        return True
+    return i < n and text[i] in _DIGITS_1_9
+
+
+class ProvinceMatcher:
+    """Aho-Corasick automaton over all PROVINCE_RULES keywords.
+
+    Transitions are precomputed for every character that occurs in a
+    keyword (a DFA), so scanning costs one dict lookup per character; any
+    other character goes back to the root.
+    """
+
+    def __init__(self, rules: list[tuple[str, str]] = PROVINCE_RULES) -> None:
+        self.names = [city for city, _ in rules]
+        self._none = len(rules)
+
+        goto: list[dict[str, int]] = [{}]
+        best = [self._none]
+        guards: list[tuple[tuple[int, bool], ...]] = [()]
+        for rule, (_, pattern) in enumerate(rules):
+            for keyword, guard in _keywords(pattern):
+                state = 0
+                for ch in keyword:
+                    nxt = goto[state].get(ch)
+                    if nxt is None:
+                        nxt = len(goto)
+                        goto[state][ch] = nxt
+                        goto.append({})
+                        best.append(self._none)
+                        guards.append(())
+                    state = nxt
+                if guard is None:
+                    best[state] = min(best[state], rule)
+                else:
+                    guards[state] += ((rule, guard),)
+
+        # BFS: failure links, merged outputs and the full transition table.
+        alphabet = {ch for edges in goto for ch in edges}
+        fail = [0] * len(goto)
+        delta: list[dict[str, int]] = [dict() for _ in goto]
+        delta[0] = dict(goto[0])
+        queue = list(goto[0].values())
+        for state in queue:
+            best[state] = min(best[state], best[fail[state]])
+            guards[state] += guards[fail[state]]
+            for ch in alphabet:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    target = delta[fail[state]].get(ch)
+                    if target:
+                        delta[state][ch] = target
+                else:
+                    fail[nxt] = delta[fail[state]].get(ch, 0)
+                    delta[state][ch] = nxt
+                    queue.append(nxt)
+
+        self._delta = delta
+        self._best = best
+        self._guards = guards
+
+    def rule_index(self, clean: str) -> int:
+        """Index of the first rule matching a folded location, or len(rules)."""
+        delta, best_of, guards_of = self._delta, self._best, self._guards
+        best, state = self._none, 0
+        for i, ch in enumerate(clean):
+            state = delta[state].get(ch, 0)
+            if best_of[state] < best:
+                best = best_of[state]
+            for rule, allow_dot in guards_of[state]:
+                if rule < best and _district_follows(clean, i + 1, allow_dot):
+                    best = rule
+            if best == 0:
+                break
+        return best
+
+    def province(self, raw: str | None) -> str:
+        """Province name of a raw location (the `city` column of pig_location.pig)."""
+        clean = fold(raw)
+        if not clean:
+            return UNKNOWN
+        rule = self.rule_index(clean)
+        return self.names[rule] if rule < self._none else UNKNOWN
+
+
+_MATCHER: ProvinceMatcher | None = None
+
+
+def default_matcher() -> ProvinceMatcher:
+    global _MATCHER
+    if _MATCHER is None:
+        _MATCHER = ProvinceMatcher()
+    return _MATCHER
+
+
+def normalize_series(raw_loc: "pd.Series") -> "pd.DataFrame":
+    """province_id, province_name, is_overseas, is_unknown for a Series.
+
+    Same columns as pig_location.pig's log_location. Locations repeat a
+    lot, so each distinct value is classified once and mapped back.
+    """
+    matcher = default_matcher()
+    codes, uniques = pd.factorize(raw_loc, use_na_sentinel=False)
+    names = pd.Series([matcher.province(u if isinstance(u, str) else None) for u in uniques], dtype=object)
+    province_name = names.take(codes).reset_index(drop=True)
+    return pd.DataFrame(
+        {
+            "province_id": province_name.map(PROVINCE_IDS).fillna(0).astype("int32"),
+            "province_name": province_name,
+            "is_overseas": (province_name == OVERSEAS).astype("int32"),
+            "is_unknown": (province_name == UNKNOWN).astype("int32"),
+        }
+    )
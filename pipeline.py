@@ -0,0 +1,513 @@
+"""Dependency-aware runner for the Pig -> Spark -> viz pipeline.
+
+Every stage declares the datasets it reads and writes (paths under the
+output folder). Dependencies follow from those declarations, independent
+stages run concurrently, and a stage is skipped when its inputs, its
+command (script and the repo modules it imports included) and its outputs
+all have the same content fingerprints as at the end of its last
+successful run. Fingerprints hash the data files
+(`part-*` rows, CSV, PNG, ...; names starting with "." or "_" such as
+_SUCCESS and .crc files are ignored); file digests are reused while size
+and mtime are unchanged. Because only content counts, a re-run stage
+whose outputs come out identical does not re-trigger its downstream.
+
+Executors:
+- spark (default): the Spark ports of the Pig scripts in local mode.
+  Stages without a port (pig_location.pig) are external: the outputs
+  other stages read must already be in the output folder. A port may
+  read other inputs than its script (`spark_inputs`), and take optional
+  flags (`spark_options`, e.g. --dedup).
+- pig: the Pig scripts (`pig -x <mode> -f <script>`); the output folder
+  must be where the scripts STORE (/user/maria_dev/output).
+
+Run state, per-stage durations and logs go to <output-dir>/.pipeline/.
+
+Usage:
+    python pipeline.py                       # everything that is out of date
+    python pipeline.py figures --dry-run     # what would run for `figures`
+    python pipeline.py --force requirements
+"""
+
+from __future__ import annotations
+
+import argparse
+import ast
+import glob
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parent
+
+_REQUIREMENT_OUTPUTS = [f"requirement_analysis/{t}" for t in ["exp_total", "edu_total", "type_total", "skill_total", "req_total"]]
+
+# Paths are relative to the output folder; {input} is the raw crawl file.
+# "spark" commands run with this interpreter from the repo root.
+STAGES = [
+    {
+        "name": "job_base",
+        "pig": "job_explore_base.pig",
+        "spark": ["spark_job_base.py", "--input", "{input}", "--output-dir", "{output}"],
+        "inputs": ["{input}"],
+        "outputs": ["job_base_clean", "data_quality_stats"],
+        # data_profile.py report, reused by spark_explore_output.py.
+        "spark_outputs": ["data_profile.json"],
+        # pipeline.py --dedup: drop reposts before every downstream count.
+        "spark_options": {"dedup": {"args": ["--dedup"], "outputs": ["job_duplicates"]}},
+    },
+    {
+        "name": "location",
+        "pig": "pig_location.pig",
+        "spark": None,
+        "inputs": ["job_base_clean"],
+        "outputs": ["final_63_provinces_total", "ten_tinh", "log_location"],
+    },
+    {
+        "name": "industry",
+        "pig": "pig_industry.pig",
+        "spark": ["spark_industry.py", "--output-dir", "{output}"],
+        "inputs": ["job_base_clean", "log_location"],
+        # The port normalizes the location in-row instead of joining log_location.
+        "spark_inputs": ["job_base_clean"],
+        "outputs": ["industry_total", "industry_by_location", "industry_province_titles"],
+    },
+    {
+        "name": "requirements",
+        "pig": "analysis.pig",
+        "spark": ["spark_requirements.py", "--output-dir", "{output}"],
+        "inputs": ["job_base_clean"],
+        "outputs": _REQUIREMENT_OUTPUTS,
+    },
+    {
+        "name": "mahout",
+        "pig": "mahout_input.pig",
+        "spark": ["feature_matrix.py", "--output-dir", "{output}"],
+        "inputs": _REQUIREMENT_OUTPUTS + ["industry_by_location"],
+        "outputs": ["mahout_features", "mahout_industry_index", "mahout_feature_value_index"],
+        "spark_outputs": ["feature_matrix"],
+    },
+    {
+        "name": "job_index",
+        "pig": None,
+        "spark": ["job_index.py", "--output-dir", "{output}", "build"],
+        "inputs": ["job_base_clean"],
+        "outputs": ["job_index"],
+    },
+    {
+        "name": "job_cube",
+        "pig": None,
+        "spark": ["job_cube.py", "--output-dir", "{output}", "build"],
+        "inputs": ["job_base_clean"],
+        "outputs": ["job_cube"],
+    },
+    {
+        "name": "viz",
+        "pig": None,
+        "spark": [
+            "spark_explore_output.py", "--output-dir", "{output}", "--show", "0", "--export", "--export-format", "csv",
+        ],
+        "inputs": ["industry_total", "industry_by_location", "job_base_clean"] + _REQUIREMENT_OUTPUTS[:4],
+        "outputs": ["viz"],
+    },
+    {
+        "name": "figures",
+        "pig": None,
+        "spark": ["viz/make_figures.py", "--viz-dir", "{output}/viz", "--fig-dir", "{output}/figures"],
+        "inputs": ["viz"],
+        "outputs": ["figures"],
+    },
+]
+
+
+def local_imports(script: Path) -> list[Path]:
+    """The repo modules `script` imports, transitively (lazy imports included).
+
+    A module is looked up next to the importing file, then at the repo
+    root; anything else (stdlib, pyspark, ...) is ignored.
+    """
+    seen: set[Path] = set()
+    todo = [script]
+    while todo:
+        path = todo.pop()
+        try:
+            tree = ast.parse(path.read_text(encoding="utf-8"), filename=str(path))
+        except (OSError, SyntaxError, ValueError):
+            continue
+        names = set()
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                names.update(alias.name for alias in node.names)
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                names.add(node.module)
+        for name in names:
+            rel = Path(*name.split(".")).with_suffix(".py")
+            for base in (path.parent, ROOT):
+                module = base.joinpath(rel).resolve()
+                if module.is_file():
+                    if module not in seen and module != script.resolve():
+                        seen.add(module)
+                        todo.append(module)
+                    break
+    return sorted(seen)
+
+
+def _is_data_file(rel: Path) -> bool:
+    return not any(part.startswith((".", "_")) for part in rel.parts)
+
+
+def _sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _row_digest(path: Path) -> str:
+    """"<rows>:<sum of 64-bit row hashes>", independent of row order and file split."""
+    n, total = 0, 0
+    with open(path, "rb") as f:
+        for line in f:
+            total += int.from_bytes(hashlib.blake2b(line.rstrip(b"\r\n"), digest_size=8).digest(), "little")
+            n += 1
+    return f"{n}:{total % 2**64}"
+
+
+class Fingerprinter:
+    """Content fingerprints of files / dataset folders, with a digest cache."""
+
+    def __init__(self, cache: dict[str, list]) -> None:
+        self.cache = cache
+        self._lock = threading.Lock()
+
+    def _file_digest(self, path: Path, rows: bool = False) -> str:
+        st = path.stat()
+        key = f"{path}|rows" if rows else str(path)
+        with self._lock:
+            hit = self.cache.get(key)
+        if hit and hit[0] == st.st_size and hit[1] == st.st_mtime_ns:
+            return hit[2]
+        digest = _row_digest(path) if rows else _sha256(path)
+        with self._lock:
+            self.cache[key] = [st.st_size, st.st_mtime_ns, digest]
+        return digest
+
+    def path(self, path: Path) -> str | None:
+        """Fingerprint of a file, glob or folder; None when it does not exist.
+
+        The part-* files of a folder are fingerprinted together as a
+        multiset of rows, so Spark's random part names and partition
+        boundaries do not count as changes.
+        """
+        if glob.has_magic(str(path)):
+            files = sorted(glob.glob(str(path)))
+            if not files:
+                return None
+            h = hashlib.sha256()
+            for f in files:
+                h.update(f"{Path(f).name}\0{self._file_digest(Path(f))}\n".encode("utf-8"))
+            return h.hexdigest()
+        if path.is_file():
+            return self._file_digest(path)
+        if not path.is_dir():
+            return None
+        h = hashlib.sha256()
+        parts: dict[str, list[int]] = {}
+        for f in sorted(p for p in path.rglob("*") if p.is_file() and _is_data_file(p.relative_to(path))):
+            rel = f.relative_to(path)
+            if rel.name.startswith("part-"):
+                n, total = map(int, self._file_digest(f, rows=True).split(":"))
+                acc = parts.setdefault(rel.parent.as_posix(), [0, 0])
+                acc[0] += n
+                acc[1] = (acc[1] + total) % 2**64
+            else:
+                h.update(f"{rel.as_posix()}\0{self._file_digest(f)}\n".encode("utf-8"))
+        for folder, (n, total) in sorted(parts.items()):
+            h.update(f"{folder}/part-*\0{n}:{total}\n".encode("utf-8"))
+        return h.hexdigest()
+
+    def paths(self, paths: list[Path], extra: str = "") -> str | None:
+        h = hashlib.sha256(extra.encode("utf-8"))
+        for p in paths:
+            fp = self.path(p)
+            if fp is None:
+                return None
+            h.update(f"{p.name}\0{fp}\n".encode("utf-8"))
+        return h.hexdigest()
+
+
+class Pipeline:
+    def __init__(
+        self,
+        output_dir: Path,
+        input_path: Path,
+        executor: str = "spark",
+        pig_mode: str = "mapreduce",
+        stages: list[dict] = STAGES,
+        options: frozenset[str] = frozenset(),
+    ) -> None:
+        self.output_dir = output_dir
+        self.input_path = input_path
+        self.executor = executor
+        self.pig_mode = pig_mode
+        self.options = options
+        self.stages = {s["name"]: s for s in stages}
+        self.state_dir = output_dir.joinpath(".pipeline")
+        self.state_path = self.state_dir.joinpath("state.json")
+        self.state = self._load_state()
+        self.fingerprints = Fingerprinter(self.state.setdefault("files", {}))
+        self._state_lock = threading.Lock()
+
+    # -- declarations ----------------------------------------------------------
+
+    def _resolve(self, rel: str) -> Path:
+        if rel == "{input}":
+            return self.input_path
+        return self.output_dir.joinpath(rel)
+
+    def _declared_inputs(self, name: str) -> list[str]:
+        stage = self.stages[name]
+        if self.executor == "spark" and stage["spark"] and "spark_inputs" in stage:
+            return stage["spark_inputs"]
+        return stage["inputs"]
+
+    def inputs(self, name: str) -> list[Path]:
+        return [self._resolve(p) for p in self._declared_inputs(name)]
+
+    def outputs(self, name: str) -> list[Path]:
+        stage = self.stages[name]
+        extra = []
+        if self.command(name) and self.executor == "spark":
+            extra = stage.get("spark_outputs", []) + [o for opt in self._options(name) for o in opt.get("outputs", [])]
+        return [self._resolve(p) for p in stage["outputs"] + extra]
+
+    def needed_outputs(self, name: str) -> list[Path]:
+        """Outputs of `name` read by a stage that runs under this executor."""
+        read = {p for other in self.stages if self.command(other) for p in self._declared_inputs(other)}
+        return [self._resolve(o) for o in self.stages[name]["outputs"] if any(r == o or r.startswith(f"{o}/") for r in read)]
+
+    def _options(self, name: str) -> list[dict]:
+        """The enabled `spark_options` of a stage."""
+        declared = self.stages[name].get("spark_options", {})
+        return [declared[o] for o in sorted(self.options) if o in declared]
+
+    def command(self, name: str) -> list[str] | None:
+        """The command for the current executor; None for an external stage."""
+        stage = self.stages[name]
+        if self.executor == "pig" and stage["pig"]:
+            return ["pig", "-x", self.pig_mode, "-f", str(ROOT.joinpath(stage["pig"]))]
+        if stage["spark"] is None:
+            return None
+        fmt = {"output": str(self.output_dir), "input": str(self.input_path)}
+        args = [a.format(**fmt) for a in stage["spark"][1:]] + [a for opt in self._options(name) for a in opt["args"]]
+        return [sys.executable, str(ROOT.joinpath(stage["spark"][0]))] + args
+
+    def upstream(self, name: str) -> set[str]:
+        """Stages producing one of `name`'s inputs."""
+        wanted = self._declared_inputs(name)
+        return {
+            other
+            for other, stage in self.stages.items()
+            if other != name
+            and any(w == o or w.startswith(f"{o}/") for w in wanted for o in stage["outputs"] + stage.get("spark_outputs", []))
+        }
+
+    def closure(self, targets: list[str]) -> list[str]:
+        """The targets and everything upstream of them, in declaration order."""
+        seen, todo = set(), list(targets)
+        while todo:
+            name = todo.pop()
+            if name not in self.stages:
+                raise KeyError(f"unknown stage: {name!r} (one of {', '.join(self.stages)})")
+            if name not in seen:
+                seen.add(name)
+                todo.extend(self.upstream(name))
+        return [name for name in self.stages if name in seen]
+
+    # -- state -------------------------------------------------------------------
+
+    def _load_state(self) -> dict:
+        try:
+            with open(self.state_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_state(self) -> None:
+        with self._state_lock:
+            self.state_dir.mkdir(parents=True, exist_ok=True)
+            tmp = self.state_path.with_name(f".{self.state_path.name}.tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self.state, f, indent=1, sort_keys=True)
+            os.replace(tmp, self.state_path)
+
+    def _input_fingerprint(self, name: str) -> str | None:
+        # The command, the script and the repo modules it imports count as inputs.
+        command = self.command(name) or []
+        scripts = [Path(a) for a in command if a.endswith((".py", ".pig"))]
+        modules = [m for s in scripts if s.suffix == ".py" for m in local_imports(s)]
+        return self.fingerprints.paths(self.inputs(name) + scripts + modules, extra=json.dumps(command))
+
+    def is_up_to_date(self, name: str) -> bool:
+        record = self.state.get("stages", {}).get(name)
+        if not record:
+            return False
+        return (
+            record["inputs"] == self._input_fingerprint(name)
+            and record["outputs"] == self.fingerprints.paths(self.outputs(name))
+        )
+
+    # -- execution ---------------------------------------------------------------
+
+    def run_stage(self, name: str, force: bool = False, dry_run: bool = False) -> tuple[str, float]:
+        """(status, seconds); status is ran / skipped / external / would run."""
+        command = self.command(name)
+        if command is None:
+            missing = [str(p) for p in self.needed_outputs(name) if not p.exists()]
+            if missing:
+                script = self.stages[name]["pig"]
+                raise RuntimeError(f"{name}: no Spark port, run `pig -f {script}` first (missing {', '.join(missing)})")
+            return "external", 0.0
+        if not force and self.is_up_to_date(name):
+            return "skipped", 0.0
+        if dry_run:
+            return "would run", 0.0
+
+        inputs = self._input_fingerprint(name)
+        self.state_dir.joinpath("logs").mkdir(parents=True, exist_ok=True)
+        log_path = self.state_dir.joinpath("logs", f"{name}.log")
+        t0 = time.perf_counter()
+        with open(log_path, "w", encoding="utf-8") as log:
+            proc = subprocess.run(command, cwd=ROOT, stdout=log, stderr=subprocess.STDOUT)
+        seconds = time.perf_counter() - t0
+        if proc.returncode != 0:
+            raise RuntimeError(f"{name}: exit code {proc.returncode}, see {log_path}")
+
+        record = {
+            "inputs": inputs,
+            "outputs": self.fingerprints.paths(self.outputs(name)),
+            "seconds": round(seconds, 3),
+            "finished": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "executor": self.executor,
+        }
+        if record["outputs"] is None:
+            missing = [str(p) for p in self.outputs(name) if not p.exists()]
+            raise RuntimeError(f"{name}: finished without writing {', '.join(missing)}")
+        with self._state_lock:
+            self.state.setdefault("stages", {})[name] = record
+        self._save_state()
+        return "ran", seconds
+
+    def run(
+        self,
+        targets: list[str] | None = None,
+        max_workers: int = 2,
+        force: set[str] | None = None,
+        dry_run: bool = False,
+    ) -> dict[str, tuple[str, float]]:
+        """Run the targets (default: every stage) and what they depend on.
+
+        A stage starts as soon as all its upstream stages are done; the
+        result maps each stage to (status, seconds), with status "failed"
+        or "blocked" (an upstream stage failed) on errors.
+        """
+        names = self.closure(targets or list(self.stages))
+        force = force or set()
+        deps = {name: self.upstream(name) & set(names) for name in names}
+        results: dict[str, tuple[str, float]] = {}
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            while len(results) < len(names):
+                for name in names:
+                    if name in results or name in running.values():
+                        continue
+                    if any(results.get(d, ("",))[0] in ("failed", "blocked") for d in deps[name]):
+                        results[name] = ("blocked", 0.0)
+                        print(f"[{name}] blocked")
+                    elif all(d in results for d in deps[name]):
+                        # Downstream of a stage that will run, a dry run cannot tell.
+                        if dry_run and any(results[d][0] == "would run" for d in deps[name]):
+                            results[name] = ("would run" if self.command(name) else "external", 0.0)
+                            continue
+                        print(f"[{name}] start")
+                        running[pool.submit(self.run_stage, name, name in force, dry_run)] = name
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        results[name] = future.result()
+                    except Exception as e:  # noqa: BLE001 - reported per stage
+                        results[name] = ("failed", 0.0)
+                        print(f"[{name}] failed: {e}")
+                    else:
+                        status, seconds = results[name]
+                        print(f"[{name}] {status}" + (f" in {seconds:.1f}s" if status == "ran" else ""))
+
+        if not dry_run:
+            self._log_run(results)
+        return {name: results[name] for name in names}
+
+    def _log_run(self, results: dict[str, tuple[str, float]]) -> None:
+        self.state_dir.mkdir(parents=True, exist_ok=True)
+        entry = {
+            "finished": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "executor": self.executor,
+            "stages": {name: {"status": s, "seconds": round(sec, 3)} for name, (s, sec) in results.items()},
+        }
+        with open(self.state_dir.joinpath("runs.jsonl"), "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Run the pipeline stages that are out of date")
+    parser.add_argument("targets", nargs="*", help=f"Stages to bring up to date (default: all of {', '.join(s['name'] for s in STAGES)})")
+    parser.add_argument(
+        "--output-dir",
+        default=str(ROOT.joinpath("output")),
+        help="Pipeline output folder (default: ./output)",
+    )
+    parser.add_argument(
+        "--input",
+        default=str(ROOT.joinpath("vietnamworks_detailed_jobs.jsonl")),
+        help="Raw crawl JSONL (default: ./vietnamworks_detailed_jobs.jsonl)",
+    )
+    parser.add_argument("--executor", default="spark", choices=["spark", "pig"])
+    parser.add_argument("--pig-mode", default="mapreduce", choices=["mapreduce", "tez", "local"])
+    parser.add_argument("--max-workers", type=int, default=2, help="Stages run at the same time (default: 2)")
+    parser.add_argument("--force", action="append", default=[], help="Re-run this stage even if up to date (repeatable)")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would run")
+    parser.add_argument(
+        "--dedup",
+        action="store_true",
+        help="Spark executor: drop reposts in the job_base stage (see job_dedup.py)",
+    )
+    args = parser.parse_args()
+
+    options = frozenset(["dedup"] if args.dedup else [])
+    pipeline = Pipeline(Path(args.output_dir), Path(args.input), args.executor, args.pig_mode, options=options)
+    t0 = time.perf_counter()
+    try:
+        results = pipeline.run(args.targets, args.max_workers, set(args.force), args.dry_run)
+    except KeyError as e:
+        raise SystemExit(e.args[0])
+
+    print(f"\n{'stage':<14} {'status':<10} {'seconds':>8}")
+    for name, (status, seconds) in results.items():
+        print(f"{name:<14} {status:<10} {seconds:8.1f}")
+    print(f"total {time.perf_counter() - t0:.1f}s")
+    return 1 if any(status in ("failed", "blocked") for status, _ in results.values()) else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
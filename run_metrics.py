@@ -0,0 +1,274 @@
+"""Per-step run metrics as a JSON-lines report.
+
+`RunMetrics.step(name, kind)` times one logical step (loading a part-*
+set, an aggregate, an export, a figure) and appends one JSON line to the
+report with:
+
+- seconds, python_peak_rss_mb (ru_maxrss of this process) and, with a
+  SparkSession, jvm_peak_rss_mb of the local driver JVM
+- the Spark work of the step: every job runs under the step's job group,
+  and the stage metrics of those jobs are summed from the Spark UI REST
+  API (input_bytes / input_rows, output_bytes / output_rows,
+  shuffle_read_bytes, shuffle_write_bytes, stages, tasks)
+- whatever the caller adds to the yielded record (rows_out,
+  bytes_written, files, ...)
+
+`write(record)` appends a record timed elsewhere, e.g. one export:<table>
+record per output of the export step; those carry `parent` and are left
+out of the summary total.
+
+With `plans_dir` set (spark_explore_output.py --profile), `plan(name, df)`
+writes the formatted physical plan of `df` next to the report.
+
+    python run_metrics.py summary --report output/metrics/run_report.jsonl
+    python run_metrics.py compare --report output/metrics/run_report.jsonl --baseline <run> --run <run>
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import json
+import os
+import sys
+import time
+import urllib.request
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows: no peak RSS.
+    resource = None
+
+
+_STAGE_FIELDS = {
+    "inputBytes": "input_bytes",
+    "inputRecords": "input_rows",
+    "outputBytes": "output_bytes",
+    "outputRecords": "output_rows",
+    "shuffleReadBytes": "shuffle_read_bytes",
+    "shuffleWriteBytes": "shuffle_write_bytes",
+}
+
+
+def python_peak_rss_mb() -> float | None:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # KiB on Linux, bytes on macOS.
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _jvm_peak_rss_mb(spark) -> float | None:
+    try:
+        pid = spark.sparkContext._jvm.ProcessHandle.current().pid()
+        with open(f"/proc/{pid}/status", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except (OSError, AttributeError, ValueError):
+        pass
+    return None
+
+
+def _get_json(url: str):
+    with urllib.request.urlopen(url, timeout=5) as resp:
+        return json.load(resp)
+
+
+def _file_stats(path_glob: str) -> dict:
+    import glob
+
+    files = [p for p in glob.glob(path_glob, recursive=True) if os.path.isfile(p)]
+    return {"files": len(files), "bytes_read": sum(os.path.getsize(p) for p in files)}
+
+
+class RunMetrics:
+    def __init__(self, report_path: Path, spark=None, plans_dir: Path | None = None, run_id: str | None = None) -> None:
+        self.report_path = report_path
+        self.spark = spark
+        self.run_id = run_id or f"{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}-{uuid.uuid4().hex[:6]}"
+        self.plans_dir = plans_dir.joinpath(self.run_id) if plans_dir else None
+        self._n = 0
+        self._api = None
+        if spark is not None and spark.sparkContext.uiWebUrl:
+            sc = spark.sparkContext
+            self._api = f"{sc.uiWebUrl}/api/v1/applications/{sc.applicationId}"
+        report_path.parent.mkdir(parents=True, exist_ok=True)
+
+    @contextlib.contextmanager
+    def step(self, name: str, kind: str, **fields):
+        """Time a step; the yielded dict is written to the report afterwards."""
+        self._n += 1
+        group = f"{self.run_id}-{self._n}"
+        record = {"run": self.run_id, "step": name, "kind": kind, **fields}
+        sc = self.spark.sparkContext if self.spark is not None else None
+        if sc is not None:
+            sc.setJobGroup(group, name)
+        t0 = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["seconds"] = round(time.perf_counter() - t0, 4)
+            if sc is not None:
+                sc.setLocalProperty("spark.jobGroup.id", None)
+                record.update(self._spark_metrics(group))
+                record["jvm_peak_rss_mb"] = _jvm_peak_rss_mb(self.spark)
+            record["python_peak_rss_mb"] = python_peak_rss_mb()
+            self.write(record)
+
+    def write(self, record: dict) -> None:
+        record.setdefault("run", self.run_id)
+        record.setdefault("at", datetime.now(timezone.utc).isoformat(timespec="seconds"))
+        with open(self.report_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def _spark_metrics(self, group: str) -> dict:
+        """Summed stage metrics of the jobs run under `group` (empty without the UI)."""
+        if self._api is None:
+            return {}
+        sc = self.spark.sparkContext
+        try:
+            # The status store is fed asynchronously: let the listener bus
+            # deliver the step's events, then wait until every job the
+            # tracker knows for the group is listed as finished.
+            try:
+                sc._jsc.sc().listenerBus().waitUntilEmpty(5000)
+            except Exception:  # py4j: private API, absent or timed out
+                pass
+            expected = set(sc.statusTracker().getJobIdsForGroup(group))
+            for _ in range(50):
+                jobs = [j for j in _get_json(f"{self._api}/jobs") if j.get("jobGroup") == group]
+                done = {j["jobId"] for j in jobs if j["status"] not in {"RUNNING", "UNKNOWN"}}
+                if expected <= done and len(done) == len(jobs):
+                    break
+                time.sleep(0.1)
+                expected |= set(sc.statusTracker().getJobIdsForGroup(group))
+            if not jobs:
+                return {"jobs": 0}
+            stage_ids = {s for j in jobs for s in j["stageIds"]}
+            out = {"jobs": len(jobs), "stages": 0, "tasks": 0, **{v: 0 for v in _STAGE_FIELDS.values()}}
+            for stage in _get_json(f"{self._api}/stages"):
+                if stage["stageId"] not in stage_ids or stage["status"] == "SKIPPED":
+                    continue
+                out["stages"] += 1
+                out["tasks"] += stage.get("numCompleteTasks", 0)
+                for src, dst in _STAGE_FIELDS.items():
+                    out[dst] += stage.get(src, 0)
+            return out
+        except OSError as e:
+            return {"spark_metrics_error": str(e)}
+
+    def plan(self, name: str, df) -> None:
+        """Write the formatted physical plan of `df` (only in profile mode)."""
+        if self.plans_dir is None:
+            return
+        self.plans_dir.mkdir(parents=True, exist_ok=True)
+        jvm = df.sparkSession.sparkContext._jvm
+        text = jvm.PythonSQLUtils.explainString(df._jdf.queryExecution(), "formatted")
+        self.plans_dir.joinpath(f"{name}.txt").write_text(text, encoding="utf-8")
+
+
+def load_report(path: Path) -> list[dict]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _runs(records: list[dict]) -> list[str]:
+    return list(dict.fromkeys(r["run"] for r in records))
+
+
+def _by_step(records: list[dict], run: str) -> dict[str, dict]:
+    return {r["step"]: r for r in records if r["run"] == run}
+
+
+def _total_seconds(steps: dict[str, dict]) -> float:
+    # Records with a parent (export:<table>) are already timed by that step.
+    return sum(r.get("seconds", 0) for r in steps.values() if "parent" not in r)
+
+
+def _fmt(value) -> str:
+    if value is None:
+        return "-"
+    if isinstance(value, float):
+        return f"{value:.2f}"
+    return f"{value:,}"
+
+
+def summary(records: list[dict], run: str) -> str:
+    cols = ["seconds", "input_rows", "input_bytes", "shuffle_read_bytes", "shuffle_write_bytes", "rows_out", "bytes_written"]
+    lines = [f"run {run}", f"{'step':<44} {'kind':<10} " + " ".join(f"{c:>19}" for c in cols)]
+    steps = _by_step(records, run)
+    for name, r in steps.items():
+        lines.append(f"{name:<44} {r['kind']:<10} " + " ".join(f"{_fmt(r.get(c)):>19}" for c in cols))
+    total = _total_seconds(steps)
+    peak = max((r.get("jvm_peak_rss_mb") or 0 for r in steps.values()), default=0)
+    lines.append(f"total {total:.1f}s over {len(steps)} steps; driver JVM peak RSS {peak} MB")
+    return "\n".join(lines)
+
+
+def compare(records: list[dict], baseline: str, run: str, threshold: float = 1.5) -> tuple[str, int]:
+    """Per-step ratios run / baseline; steps above `threshold` in seconds are flagged."""
+    base, cur = _by_step(records, baseline), _by_step(records, run)
+    metrics = ["seconds", "input_rows", "shuffle_write_bytes", "rows_out"]
+    lines = [f"{run} vs {baseline}", f"{'step':<44} " + " ".join(f"{m:>20}" for m in metrics)]
+    flagged = 0
+    for name in cur:
+        if name not in base:
+            lines.append(f"{name:<44} (new step)")
+            continue
+        ratios = []
+        for m in metrics:
+            a, b = base[name].get(m), cur[name].get(m)
+            ratios.append(b / a if a and b is not None else None)
+        slow = ratios[0] is not None and ratios[0] > threshold and cur[name]["seconds"] - base[name]["seconds"] > 0.5
+        flagged += slow
+        lines.append(
+            f"{name:<44} "
+            + " ".join(f"{('x%.2f' % r) if r is not None else '-':>20}" for r in ratios)
+            + ("   <-- slower" if slow else "")
+        )
+    lines.append(f"{flagged} step(s) more than x{threshold} slower")
+    return "\n".join(lines), flagged
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Read the JSON-lines run report")
+    parser.add_argument(
+        "--report",
+        default=str(Path(__file__).parent.joinpath("output", "metrics", "run_report.jsonl")),
+        help="Run report (default: ./output/metrics/run_report.jsonl)",
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_summary = sub.add_parser("summary", help="Per-step table of one run (default: the last)")
+    p_summary.add_argument("--run", default=None)
+    p_compare = sub.add_parser("compare", help="Ratios of one run against a baseline run")
+    p_compare.add_argument("--baseline", default=None, help="Default: the second to last run")
+    p_compare.add_argument("--run", default=None, help="Default: the last run")
+    p_compare.add_argument("--threshold", type=float, default=1.5)
+    sub.add_parser("runs", help="List the runs in the report")
+    args = parser.parse_args()
+
+    records = load_report(Path(args.report))
+    runs = _runs(records)
+    if not runs:
+        raise SystemExit(f"no runs in {args.report}")
+    if args.command == "runs":
+        for run in runs:
+            steps = _by_step(records, run)
+            print(f"{run}  {len(steps)} steps  {_total_seconds(steps):.1f}s")
+        return 0
+    if args.command == "summary":
+        print(summary(records, args.run or runs[-1]))
+        return 0
+    if len(runs) < 2 and not args.baseline:
+        raise SystemExit("compare needs two runs")
+    text, flagged = compare(records, args.baseline or runs[-2], args.run or runs[-1], args.threshold)
+    print(text)
+    return 1 if flagged else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
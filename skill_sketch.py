@@ -0,0 +1,432 @@
+"""Approximate skill leaderboard with mergeable heavy-hitter sketches.
+
+The exact requirement_skill_total_top500 groups every distinct skill token
+and sorts all of them before keeping 500; skill tokens are free text with
+a very long tail, so that shuffle and sort grow with the vocabulary. Here
+every partition folds its (industry_code, industry, skill, weight) rows
+into a fixed-size SkillSketch and only the sketches reach the driver:
+
+- CountMinSketch (width ceil(e / epsilon), depth ceil(ln(1 / delta))):
+  estimate(skill) >= true count, and <= true + epsilon * N with
+  probability >= 1 - delta (N = total weight)
+- SpaceSaving with `capacity` counters, globally and per industry: every
+  skill whose count exceeds N / capacity is tracked, with
+  count - error <= true <= count (the parallel merge of Cafaro et al.)
+
+A skill's reported job_count is min(SpaceSaving count, Count-Min estimate),
+both upper bounds; `lower` is the SpaceSaving lower bound. The top-k is
+provably complete when the k-th lower bound beats N / capacity (the bound
+of every untracked skill) and is at least the upper bound of every tracked
+skill ranked after k.
+
+Usage:
+    python skill_sketch.py --output-dir output --compare
+    python skill_sketch.py --output-dir output --source job_base --per-industry 10
+    python spark_explore_output.py --export --skill-top approx
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+import os
+import pickle
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_EPSILON = 1e-4
+DEFAULT_DELTA = 0.01
+DEFAULT_CAPACITY = 5000
+# Exact (industry, skill) counts buffered per partition before they are
+# folded into the summaries; bounds worker memory, amortizes the merges.
+BUFFER_ROWS = 200_000
+
+
+def _hashes(keys: np.ndarray) -> np.ndarray:
+    """Deterministic 64-bit hashes (the same in every Python worker)."""
+    return pd.util.hash_array(np.asarray(keys, dtype=object), categorize=False)
+
+
+class CountMinSketch:
+    def __init__(self, width: int, depth: int) -> None:
+        self.width = width
+        self.depth = depth
+        self.table = np.zeros((depth, width), dtype=np.int64)
+
+    @classmethod
+    def from_error(cls, epsilon: float, delta: float) -> "CountMinSketch":
+        return cls(math.ceil(math.e / epsilon), math.ceil(math.log(1 / delta)))
+
+    def _cells(self, keys: np.ndarray) -> np.ndarray:
+        # Kirsch-Mitzenmacher: row i uses h1 + i * h2.
+        h = _hashes(keys)
+        h1 = h & np.uint64(0xFFFFFFFF)
+        h2 = (h >> np.uint64(32)) | np.uint64(1)
+        rows = np.arange(self.depth, dtype=np.uint64)[:, None]
+        return ((h1[None, :] + rows * h2[None, :]) % np.uint64(self.width)).astype(np.int64)
+
+    def add(self, keys: np.ndarray, weights: np.ndarray) -> None:
+        cells = self._cells(keys) + (np.arange(self.depth) * self.width)[:, None]
+        flat = np.bincount(cells.ravel(), np.tile(weights, self.depth), minlength=self.table.size)
+        self.table += flat.astype(np.int64).reshape(self.table.shape)
+
+    def estimate(self, keys: np.ndarray) -> np.ndarray:
+        cells = self._cells(keys)
+        return self.table[np.arange(self.depth)[:, None], cells].min(axis=0)
+
+    def merge(self, other: "CountMinSketch") -> "CountMinSketch":
+        if (self.width, self.depth) != (other.width, other.depth):
+            raise ValueError(
+                f"cannot merge Count-Min sketches of shape {self.depth}x{self.width} "
+                f"and {other.depth}x{other.width}"
+            )
+        self.table += other.table
+        return self
+
+
+class SpaceSaving:
+    """At most `capacity` (key, count, error) counters; count overestimates by <= error."""
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = capacity
+        self.counters = pd.DataFrame(
+            {"count": pd.Series(dtype="int64"), "error": pd.Series(dtype="int64")}
+        )
+
+    def _floor(self) -> int:
+        # Keys missing from a full summary may have had up to its smallest count.
+        if len(self.counters) < self.capacity:
+            return 0
+        return int(self.counters["count"].min())
+
+    def _absorb(self, counters: pd.DataFrame, floor: int) -> None:
+        mine, floor_mine = self.counters, self._floor()
+        keys = mine.index.union(counters.index)
+        merged = mine.reindex(keys).fillna(floor_mine) + counters.reindex(keys).fillna(floor)
+        merged = merged.astype("int64")
+        if len(merged) > self.capacity:
+            # Keep the `capacity` largest counts (O(n) selection); ties at the
+            # cut are broken by key so every merge order agrees.
+            count = merged["count"].to_numpy()
+            cut = np.partition(count, len(count) - self.capacity)[len(count) - self.capacity]
+            above = merged[count > cut]
+            at_cut = merged[count == cut].sort_index().head(self.capacity - len(above))
+            merged = pd.concat([above, at_cut])
+        self.counters = merged
+
+    def add(self, counts: pd.Series) -> None:
+        """Fold in exact counts (key -> weight) of new items."""
+        self._absorb(pd.DataFrame({"count": counts.astype("int64"), "error": 0}), 0)
+
+    def merge(self, other: "SpaceSaving") -> "SpaceSaving":
+        self._absorb(other.counters, other._floor())
+        return self
+
+    def top(self, k: int) -> pd.DataFrame:
+        """(key, count, lower) by count desc, key asc."""
+        out = self.counters.rename_axis("key").reset_index()
+        out["lower"] = out["count"] - out["error"]
+        return out.sort_values(["count", "key"], ascending=[False, True]).head(k).reset_index(drop=True)
+
+
+class SkillSketch:
+    """Count-Min over all skills, SpaceSaving overall and per industry_code."""
+
+    def __init__(
+        self,
+        epsilon: float = DEFAULT_EPSILON,
+        delta: float = DEFAULT_DELTA,
+        capacity: int = DEFAULT_CAPACITY,
+    ) -> None:
+        self.epsilon = epsilon
+        self.delta = delta
+        self.capacity = capacity
+        self.total = 0
+        self.cms = CountMinSketch.from_error(epsilon, delta)
+        self.overall = SpaceSaving(capacity)
+        self.by_industry: dict[str | None, SpaceSaving] = {}
+        self.industry_names: dict[str | None, str | None] = {}
+        self._pending: list[pd.DataFrame] = []
+        self._pending_rows = 0
+
+    def add(self, batch: pd.DataFrame) -> None:
+        """Rows of (industry_code, industry, skill, weight); null skills are skipped."""
+        batch = batch[batch["skill"].notna()]
+        if batch.empty:
+            return
+        batch = batch.assign(weight=batch["weight"].fillna(0).astype("int64"))
+        self._pending.append(
+            batch.groupby(["industry_code", "industry", "skill"], sort=False, dropna=False)["weight"]
+            .sum()
+            .reset_index()
+        )
+        self._pending_rows += len(self._pending[-1])
+        if self._pending_rows >= BUFFER_ROWS:
+            self._flush()
+
+    def _flush(self) -> None:
+        if not self._pending:
+            return
+        counts = pd.concat(self._pending, ignore_index=True)
+        self._pending, self._pending_rows = [], 0
+        self.total += int(counts["weight"].sum())
+        per_skill = counts.groupby("skill", sort=False)["weight"].sum()
+        self.cms.add(per_skill.index.to_numpy(dtype=object), per_skill.to_numpy())
+        self.overall.add(per_skill)
+        for (code, name), group in counts.groupby(["industry_code", "industry"], sort=False, dropna=False):
+            code = None if pd.isna(code) else code
+            self.industry_names.setdefault(code, None if pd.isna(name) else name)
+            summary = self.by_industry.setdefault(code, SpaceSaving(self.capacity))
+            summary.add(group.groupby("skill", sort=False)["weight"].sum())
+
+    def __getstate__(self) -> dict:
+        self._flush()
+        return self.__dict__
+
+    def merge(self, other: "SkillSketch") -> "SkillSketch":
+        self._flush()
+        other._flush()
+        self.total += other.total
+        self.cms.merge(other.cms)
+        self.overall.merge(other.overall)
+        for code, summary in other.by_industry.items():
+            if code in self.by_industry:
+                self.by_industry[code].merge(summary)
+            else:
+                self.by_industry[code] = summary
+            self.industry_names.setdefault(code, other.industry_names.get(code))
+        return self
+
+    def top(self, k: int) -> pd.DataFrame:
+        """Approximate leaderboard: skill, job_count, lower, upper."""
+        self._flush()
+        top = self.overall.top(len(self.overall.counters))
+        if top.empty:
+            return pd.DataFrame(columns=["skill", "job_count", "lower", "upper"])
+        top["upper"] = np.minimum(top["count"], self.cms.estimate(top["key"].to_numpy(dtype=object)))
+        top = top.rename(columns={"key": "skill"}).assign(job_count=top["upper"])
+        top = top.sort_values(["job_count", "skill"], ascending=[False, True]).head(k)
+        return top[["skill", "job_count", "lower", "upper"]].reset_index(drop=True)
+
+    def top_by_industry(self, k: int) -> dict[str | None, pd.DataFrame]:
+        self._flush()
+        return {
+            code: summary.top(k).rename(columns={"key": "skill"})
+            for code, summary in sorted(self.by_industry.items(), key=lambda kv: str(kv[0]))
+        }
+
+    def bounds(self, k: int) -> dict:
+        """Error bounds of this sketch and whether its top-k is provably complete."""
+        ranked = self.top(len(self.overall.counters))
+        top, rest = ranked.head(k), ranked.iloc[k:]
+        spacesaving_error = self.total / self.capacity
+        return {
+            "total": self.total,
+            "countmin_error": self.epsilon * self.total,
+            "countmin_confidence": 1 - self.delta,
+            "spacesaving_error": spacesaving_error,
+            # A summary that never filled up is exact; otherwise every skill
+            # outside it has true count <= the SpaceSaving bound, and every
+            # tracked skill ranked after k has true count <= its upper bound.
+            "complete": len(self.overall.counters) < self.capacity
+            or (
+                len(top) == k
+                and int(top["lower"].iloc[-1]) > spacesaving_error
+                and (rest.empty or int(top["lower"].iloc[-1]) >= int(rest["upper"].max()))
+            ),
+            "bytes": self.cms.table.nbytes
+            + sum(s.counters.memory_usage(deep=True).sum() for s in [self.overall, *self.by_industry.values()]),
+        }
+
+
+def _sketch_partition(epsilon: float, delta: float, capacity: int):
+    def sketch(batches):
+        # The module's class, not __main__'s, so the pickle loads on the driver.
+        from skill_sketch import SkillSketch
+
+        local = SkillSketch(epsilon, delta, capacity)
+        for batch in batches:
+            local.add(batch)
+        yield pd.DataFrame({"sketch": [pickle.dumps(local, protocol=pickle.HIGHEST_PROTOCOL)]})
+
+    return sketch
+
+
+def sketch_skills(
+    rows,
+    epsilon: float = DEFAULT_EPSILON,
+    delta: float = DEFAULT_DELTA,
+    capacity: int = DEFAULT_CAPACITY,
+) -> SkillSketch:
+    """One SkillSketch per partition of `rows`, merged on the driver.
+
+    `rows` is a Spark DataFrame with columns industry_code, industry,
+    skill, weight. Nothing is shuffled; each partition sends a fixed-size
+    sketch.
+    """
+    blobs = rows.select("industry_code", "industry", "skill", "weight").mapInPandas(
+        _sketch_partition(epsilon, delta, capacity), "sketch binary"
+    ).collect()
+    merged = SkillSketch(epsilon, delta, capacity)
+    for row in blobs:
+        merged.merge(pickle.loads(row["sketch"]))
+    return merged
+
+
+def skill_rows(skill_total):
+    """Sketch input from requirement_analysis/skill_total (weight = job_count)."""
+    from pyspark.sql import functions as F
+
+    from spark_explore_output import _is_irrelevant_category
+
+    return skill_total.where(~_is_irrelevant_category(F.col("skill"))).select(
+        "industry_code", "industry", "skill", F.col("job_count").alias("weight")
+    )
+
+
+def skill_rows_from_job_base(job_base_clean):
+    """Sketch input straight from job_base_clean: one row (weight 1) per job and skill token."""
+    from pyspark.sql import functions as F
+
+    from spark_explore_output import _is_irrelevant_category
+    from spark_requirements import requirement_long
+
+    long = requirement_long(job_base_clean).where(F.col("dimension") == "skill")
+    return long.where(~_is_irrelevant_category(F.col("value"))).select(
+        "industry_code", "industry", F.col("value").alias("skill"), F.lit(1).cast("long").alias("weight")
+    )
+
+
+def approx_skill_total(rows, k: int = 500, **sketch_params):
+    """requirement_skill_total_top500 from sketches: (skill, job_count) DataFrame and the bounds."""
+    sketch = sketch_skills(rows, **sketch_params)
+    top = sketch.top(k)
+    df = rows.sparkSession.createDataFrame(
+        [(s, int(c)) for s, c in zip(top["skill"], top["job_count"])], "skill string, job_count long"
+    )
+    return df, sketch.bounds(k)
+
+
+def format_bounds(bounds: dict, k: int) -> str:
+    return (
+        f"N={bounds['total']:,}; Count-Min over-count <= {bounds['countmin_error']:.1f} "
+        f"(p >= {bounds['countmin_confidence']:.2f}); SpaceSaving over-count <= "
+        f"{bounds['spacesaving_error']:.1f}; top-{k} "
+        f"{'provably complete' if bounds['complete'] else 'not provably complete'}; "
+        f"sketch {bounds['bytes'] / 1e6:.1f} MB"
+    )
+
+
+def compare(approx: pd.DataFrame, exact: pd.DataFrame, k: int) -> dict:
+    """Approximate vs exact top-k: set recall, rank agreement and count errors."""
+    exact = exact.head(k)
+    truth = dict(zip(exact["skill"], exact["job_count"]))
+    joined = approx.head(k).assign(true=lambda d: d["skill"].map(truth))
+    found = joined["true"].notna()
+    err = (joined.loc[found, "job_count"] - joined.loc[found, "true"]).abs()
+    within = (joined.loc[found, "lower"] <= joined.loc[found, "true"]) & (
+        joined.loc[found, "true"] <= joined.loc[found, "upper"]
+    )
+    same_rank = sum(a == b for a, b in zip(approx["skill"].head(k), exact["skill"]))
+    return {
+        "k": len(exact),
+        "recall": found.sum() / max(len(exact), 1),
+        "same_rank": same_rank,
+        "max_abs_error": int(err.max()) if len(err) else 0,
+        "mean_rel_error": float((err / joined.loc[found, "true"]).mean()) if len(err) else 0.0,
+        "within_bounds": float(within.mean()) if len(within) else 1.0,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Approximate top-k skills with Count-Min + SpaceSaving")
+    parser.add_argument(
+        "--output-dir",
+        default=str(Path(__file__).parent.joinpath("output")),
+        help="Path to the Pig output folder (default: ./output)",
+    )
+    parser.add_argument(
+        "--source",
+        default="pig",
+        choices=["pig", "job_base"],
+        help="pig: requirement_analysis/skill_total; job_base: skill tokens of job_base_clean",
+    )
+    parser.add_argument("--top", type=int, default=500)
+    parser.add_argument("--epsilon", type=float, default=DEFAULT_EPSILON, help="Count-Min relative error")
+    parser.add_argument("--delta", type=float, default=DEFAULT_DELTA, help="Count-Min failure probability")
+    parser.add_argument("--capacity", type=int, default=DEFAULT_CAPACITY, help="SpaceSaving counters")
+    parser.add_argument("--per-industry", type=int, default=0, help="Print the top N skills of every industry")
+    parser.add_argument("--show", type=int, default=20)
+    parser.add_argument("--compare", action="store_true", help="Also run the exact GROUP BY and report the errors")
+    args = parser.parse_args()
+    output_dir = Path(args.output_dir)
+
+    from pyspark.sql import SparkSession, functions as F
+
+    import spark_explore_output as seo
+
+    os.environ.setdefault("PYSPARK_PYTHON", sys.executable)
+    os.environ.setdefault("PYSPARK_DRIVER_PYTHON", sys.executable)
+    spark = (
+        SparkSession.builder.appName("recruitment-skill-sketch")
+        .master("local[*]")
+        .config("spark.pyspark.python", sys.executable)
+        .config("spark.pyspark.driver.python", sys.executable)
+        .config("spark.sql.execution.arrow.pyspark.enabled", "true")
+        .getOrCreate()
+    )
+    spark.sparkContext.setLogLevel("WARN")
+
+    if args.source == "job_base":
+        rows = skill_rows_from_job_base(
+            seo.load_job_base_clean(spark, seo._file_glob(output_dir, "job_base_clean", "part-*"))
+        )
+    else:
+        schema = "industry_code string, industry string, skill string, job_count long"
+        rows = skill_rows(
+            spark.read.csv(
+                seo._file_glob(output_dir, "requirement_analysis", "skill_total", "part-*"), sep="\t", schema=schema
+            )
+        )
+
+    t0 = time.perf_counter()
+    sketch = sketch_skills(rows, args.epsilon, args.delta, args.capacity)
+    approx = sketch.top(args.top)
+    t_approx = time.perf_counter() - t0
+    print(f"== approximate top {args.top} skills ({t_approx:.1f}s) ==")
+    print(approx.head(args.show).to_string(index=False))
+    print(format_bounds(sketch.bounds(args.top), args.top))
+
+    if args.per_industry:
+        for code, top in sketch.top_by_industry(args.per_industry).items():
+            print(f"\n== {code} / {sketch.industry_names.get(code)} ==")
+            print(top.to_string(index=False))
+
+    if args.compare:
+        t0 = time.perf_counter()
+        exact = (
+            rows.groupBy("skill")
+            .agg(F.sum("weight").alias("job_count"))
+            .orderBy(F.desc("job_count"), F.asc("skill"))
+            .limit(args.top)
+            .toPandas()
+        )
+        t_exact = time.perf_counter() - t0
+        report = compare(approx, exact, args.top)
+        print(
+            f"\n== vs exact GROUP BY ({t_exact:.1f}s) ==\n"
+            f"recall {report['recall']:.3f} of {report['k']}; same rank {report['same_rank']}; "
+            f"max |error| {report['max_abs_error']}; mean relative error {report['mean_rel_error']:.2e}; "
+            f"exact count within [lower, upper] for {report['within_bounds']:.1%}"
+        )
+
+    spark.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -2,15 +2,63 @@ from __future__ import annotations
 
 import argparse
 import csv
+import functools
 import glob
+import hashlib
+import json
 import os
 import shutil
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 from pathlib import Path
 
-from pyspark.sql import SparkSession, functions as F, types as T
+from pyspark import StorageLevel
+from pyspark.sql import DataFrame, SparkSession, functions as F, types as T
 from pyspark.sql.window import Window
 
+import location_normalizer
+from local_io import atomic_output
+import spark_normalize as norm
+from run_metrics import RunMetrics, _file_stats
+
+try:
+    import pandas as pd
+except ImportError:  # The Spark Docker image ships without pandas.
+    pd = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Same for pyarrow; exports fall back to row streaming.
+    pa = None
+    pq = None
+
+
+JOB_BASE_CLEAN_SCHEMA = T.StructType(
+    [
+        T.StructField("job_id", T.LongType(), True),
+        T.StructField("title", T.StringType(), True),
+        T.StructField("category_location_raw", T.StringType(), True),
+        T.StructField("company_raw", T.StringType(), True),
+        T.StructField("location_raw", T.StringType(), True),
+        T.StructField("experience_raw", T.StringType(), True),
+        T.StructField("requirements_raw", T.StringType(), True),
+        T.StructField("industry_raw", T.StringType(), True),
+        T.StructField("education_raw", T.StringType(), True),
+        T.StructField("employment_type_raw", T.StringType(), True),
+    ]
+)
+
+# requirement_analysis/<table> -> label column used in the viz outputs
+REQUIREMENT_TABLES = {
+    "exp_total": "experience",
+    "edu_total": "education",
+    "type_total": "employment_type",
+    "skill_total": "skill",
+}
+
 
 def _file_glob(*parts: str) -> str:
     """Build a Spark-readable file glob for local Windows paths.
@@ -25,6 +73,15 @@ def _is_windows() -> bool:
     return os.name == "nt"
 
 
+# Category values dropped from the viz outputs (compared after UPPER(TRIM(x)));
+# null is always dropped. Shared with the pandas engine (local_engine.py).
+IRRELEVANT_CATEGORIES = ["", "UNKNOWN"]
+IRRELEVANT_CATEGORY_PARTS = ["KHÔNG HIỂN THỊ"]
+
+# Grand-total row of pig_industry.pig's industry_total
+SUMMARY_INDUSTRY = "TONG_TAT_CA"
+
+
 def _is_irrelevant_category(col: F.Column) -> F.Column:
     """Values to exclude from visualization outputs.
 
@@ -32,12 +89,90 @@ def _is_irrelevant_category(col: F.Column) -> F.Column:
     """
 
     normalized = F.upper(F.trim(col))
-    return (
-        normalized.isNull()
-        | (normalized == "")
-        | (normalized == "UNKNOWN")
-        | normalized.contains("KHÔNG HIỂN THỊ")
-    )
+    out = normalized.isNull() | normalized.isin(*IRRELEVANT_CATEGORIES)
+    for part in IRRELEVANT_CATEGORY_PARTS:
+        out = out | normalized.contains(part)
+    return out
+
+
+class _ScanLedger:
+    """Estimate how many times the Pig inputs are scanned by Spark actions.
+
+    Every loaded input is registered as a source and every derived DataFrame
+    records its parents. When an action runs (show/export) the lineage is
+    walked: without persistence each reachable source is one scan, with
+    persistence a cached node is scanned once and then served from the cache.
+    Both counts are kept so one run can report the saving.
+
+    This is a model of the lineage, not a measurement: jobs Spark adds on
+    its own (the range sampling of an orderBy, re-reads after a cached
+    block is evicted) are not seen. The measured input_rows / input_bytes
+    of every step are in the run report (run_metrics.py).
+    """
+
+    def __init__(self, storage_level: StorageLevel | None = None) -> None:
+        self.storage_level = storage_level
+        self.scans_planned = 0
+        self.scans_unplanned = 0
+        self._nodes: dict[int, object] = {}
+        self._parents: dict[int, tuple[int, ...]] = {}
+        self._sources: set[int] = set()
+        self._persisted: set[int] = set()
+        self._materialized: set[int] = set()
+
+    def source(self, df):
+        self._nodes[id(df)] = df
+        self._parents[id(df)] = ()
+        self._sources.add(id(df))
+        return df
+
+    def derive(self, df, *parents):
+        self._nodes[id(df)] = df
+        self._parents[id(df)] = tuple(id(p) for p in parents)
+        return df
+
+    def persist(self, df):
+        """Mark `df` as a cache point; only persisted when planned mode is on.
+
+        Cache points are tracked in both modes so that an unplanned run can
+        still report what the planned run would have scanned.
+        """
+        self._persisted.add(id(df))
+        if self.storage_level is not None:
+            df.persist(self.storage_level)
+        return df
+
+    def _count(self, key: int, planned: bool) -> int:
+        if planned and key in self._persisted:
+            if key in self._materialized:
+                return 0
+            self._materialized.add(key)
+        if key in self._sources:
+            return 1
+        return sum(self._count(p, planned) for p in self._parents.get(key, ()))
+
+    def action(self, df):
+        """Record one Spark action over `df` and return it."""
+        self.scans_unplanned += self._count(id(df), planned=False)
+        self.scans_planned += self._count(id(df), planned=True)
+        return df
+
+    def unpersist_all(self, keep=()) -> None:
+        """Unpersist every cache point except the DataFrames in `keep` (still
+        cached for another owner)."""
+        kept = {id(df) for df in keep}
+        if self.storage_level is not None:
+            for key in self._persisted - kept:
+                self._nodes[key].unpersist()
+        self._persisted.clear()
+        self._materialized.clear()
+
+    def report(self) -> str:
+        mode = "planned" if self.storage_level is not None else "unplanned"
+        return (
+            f"estimated input scans ({mode} run, from the lineage): {self.scans_planned} with --persist, "
+            f"{self.scans_unplanned} without; measured input per step in the run report"
+        )
 
 
 def _read_local_tsv_rows(path_glob: str, expected_cols: int) -> list[list[str]]:
@@ -56,50 +191,289 @@ def _read_local_tsv_rows(path_glob: str, expected_cols: int) -> list[list[str]]:
     return rows
 
 
-def _export_small_csv(df, out_csv: Path) -> None:
-    """Export a small DataFrame to a single CSV file.
+def _read_local_tsv_frames(path_glob: str, schema: T.StructType):
+    """Yield one typed pandas DataFrame per part-* file.
 
-    On Windows, Spark's local FS integration is frequently painful (winutils).
-    These viz outputs are intentionally small, so collecting is acceptable.
+    Columnar replacement for `_read_local_tsv_rows`: each file is parsed in
+    bulk by the pandas C reader and integer columns become nullable `Int64`
+    (empty or malformed values -> <NA>). Extra tab-separated fields are
+    dropped and missing trailing fields read as empty strings, since
+    PigStorage writes nulls as empty fields anyway.
     """
+    names = [f.name for f in schema.fields]
+    for file_path in sorted(glob.glob(path_glob)):
+        if os.path.getsize(file_path) == 0:
+            continue
+        frame = pd.read_csv(
+            file_path,
+            sep="\t",
+            header=None,
+            names=names,
+            usecols=range(len(names)),
+            dtype=str,
+            keep_default_na=False,
+            quoting=csv.QUOTE_NONE,
+            encoding="utf-8",
+            encoding_errors="replace",
+            engine="c",
+        )
+        for field in schema.fields:
+            if isinstance(field.dataType, (T.LongType, T.IntegerType)):
+                frame[field.name] = pd.to_numeric(
+                    frame[field.name], errors="coerce"
+                ).astype("Int64")
+        yield frame
+
 
-    out_csv.parent.mkdir(parents=True, exist_ok=True)
+def _load_local_tsv(spark: SparkSession, path_glob: str, schema: T.StructType) -> DataFrame:
+    """Load Pig TSV output through Python IO (the non-Hadoop path).
 
-    # If a previous run exported Spark-style CSV folder outputs, remove them to
+    With pandas available, files are read column-wise and handed to Spark
+    one file at a time through Arrow, so the driver never holds more than one
+    part-* file as Python objects. Otherwise fall back to the row reader.
+    """
+    if pd is None:
+        int_idx = [
+            i
+            for i, f in enumerate(schema.fields)
+            if isinstance(f.dataType, (T.LongType, T.IntegerType))
+        ]
+        rows = _read_local_tsv_rows(path_glob, expected_cols=len(schema.fields))
+        for r in rows:
+            for i in int_idx:
+                r[i] = int(r[i]) if r[i] not in (None, "") else None
+        return spark.createDataFrame(rows, schema=schema)
+
+    parts = [
+        spark.createDataFrame(frame, schema=schema)
+        for frame in _read_local_tsv_frames(path_glob, schema)
+    ]
+    if not parts:
+        return spark.createDataFrame([], schema=schema)
+    return functools.reduce(DataFrame.unionByName, parts)
+
+
+def _remove_legacy_dir(out_file: Path) -> None:
+    # If a previous run exported Spark-style folder outputs, remove them to
     # avoid confusion (and to allow re-exports with the same base name).
-    legacy_dir = out_csv.with_suffix("")
+    legacy_dir = out_file.with_suffix("")
     if legacy_dir.exists() and legacy_dir.is_dir():
         shutil.rmtree(legacy_dir)
 
-    rows = list(df.toLocalIterator())
+
+def _iter_arrow_batches(df: DataFrame):
+    """Stream a DataFrame to the driver as pyarrow RecordBatches.
+
+    Executors convert each partition to Arrow (mapInArrow) and ship every
+    batch as one Arrow IPC blob; the driver pulls one partition at a time
+    via toLocalIterator. Driver memory is bounded by the largest partition
+    rather than the whole result, and partition order (hence any orderBy)
+    is preserved.
+    """
+
+    def _to_ipc(batches):
+        import pyarrow as pa
+
+        for batch in batches:
+            sink = pa.BufferOutputStream()
+            with pa.ipc.new_stream(sink, batch.schema) as writer:
+                writer.write_batch(batch)
+            yield pa.RecordBatch.from_pydict({"ipc": [sink.getvalue().to_pybytes()]})
+
+    for row in df.mapInArrow(_to_ipc, "ipc binary").toLocalIterator():
+        yield from pa.ipc.open_stream(row.ipc)
+
+
+def _export_csv(df: DataFrame, out_csv: Path) -> int:
+    """Export a DataFrame to a single CSV file with bounded driver memory.
+
+    On Windows, Spark's local FS integration is frequently painful (winutils),
+    so the result is streamed to the driver and written there: Arrow batches
+    when pyarrow is available, otherwise rows from toLocalIterator. Returns
+    the number of rows written.
+    """
+
+    _remove_legacy_dir(out_csv)
     columns = list(df.columns)
 
-    with open(out_csv, "w", newline="", encoding="utf-8") as f:
+    rows = 0
+    with atomic_output(out_csv, "w", newline="", encoding="utf-8") as f:
         writer = csv.writer(f)
         writer.writerow(columns)
-        for r in rows:
-            writer.writerow([r[c] for c in columns])
+        if pa is None:
+            for r in df.toLocalIterator():
+                writer.writerow(tuple(r))
+                rows += 1
+            return rows
+        for batch in _iter_arrow_batches(df):
+            writer.writerows(zip(*(batch.column(c).to_pylist() for c in columns)))
+            rows += batch.num_rows
+    return rows
+
 
+def _export_parquet_file(df: DataFrame, out_parquet: Path) -> int:
+    """Export a DataFrame to a single Parquet file, one row group per batch."""
+    from pyspark.sql.pandas.types import to_arrow_schema
 
-def _export_df(df, out_dir: Path, name: str, fmt: str) -> None:
-    """Export a DataFrame for visualization.
+    _remove_legacy_dir(out_parquet)
+    schema = to_arrow_schema(df.schema)
 
-    - csv: single file on Windows, folder output on Linux via Spark
-    - parquet: folder output
+    rows = 0
+    with atomic_output(out_parquet, "wb") as f:
+        with pq.ParquetWriter(f, schema) as writer:
+            for batch in _iter_arrow_batches(df):
+                # Executor batches can carry stricter nullability than the
+                # DataFrame schema; align them before writing.
+                writer.write_table(pa.Table.from_batches([batch]).cast(schema))
+                rows += batch.num_rows
+    return rows
+
+
+def _export_df(df, out_dir: Path, name: str, fmt: str) -> int | None:
+    """Export a DataFrame for visualization; returns the rows written if known.
+
+    - csv: always a single file (better UX for Excel/Power BI)
+    - parquet: a single <name>.parquet file when pyarrow is available,
+      otherwise Spark's folder output
     """
     fmt = fmt.lower().strip()
     if fmt not in {"csv", "parquet"}:
         raise ValueError(f"Unsupported export format: {fmt}")
 
     if fmt == "csv":
-        # Always export as a single CSV file (better UX for Excel/Power BI).
-        _export_small_csv(df, out_dir / f"{name}.csv")
-        return
+        return _export_csv(df, out_dir / f"{name}.csv")
+
+    if pq is not None:
+        return _export_parquet_file(df, out_dir / f"{name}.parquet")
 
-    # parquet
     df.write.mode("overwrite").parquet(
         str((out_dir / name).resolve()).replace("\\", "/")
     )
+    return None
+
+
+MANIFEST_NAME = "_manifest.json"
+EXPORT_WORKERS = 4
+
+# Local properties a worker thread copies from the caller, so its jobs stay
+# in the caller's job group (run_metrics step).
+_INHERITED_PROPERTIES = ["spark.jobGroup.id", "spark.job.description", "spark.job.interruptOnCancel"]
+
+
+def _export_path(out_dir: Path, name: str, fmt: str) -> Path:
+    """The file (or Spark folder) _export_df writes for `name`."""
+    if fmt == "csv":
+        return out_dir / f"{name}.csv"
+    return out_dir / (f"{name}.parquet" if pq is not None else name)
+
+
+def _output_files(out: Path) -> list[Path]:
+    if out.is_dir():
+        return sorted(p for p in out.rglob("*") if p.is_file() and not p.name.startswith((".", "_")))
+    return [out]
+
+
+def _sha256(files: list[Path]) -> str:
+    h = hashlib.sha256()
+    for path in files:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+    return h.hexdigest()
+
+
+def export_viz_tables(
+    spark: SparkSession, viz: dict[str, DataFrame], out_dir: Path, fmt: str = "csv", workers: int = EXPORT_WORKERS
+) -> dict:
+    """Export every viz table with _export_df and write <out_dir>/_manifest.json.
+
+    With workers > 1 the tables are exported from a thread pool: every
+    thread submits its table's jobs in its own scheduler pool (shared
+    fairly under spark.scheduler.mode=FAIR) and writes its file on the
+    driver while the other tables are still computing. workers=1 is the
+    sequential export, in the calling thread.
+
+    The manifest lists per output the file, rows, bytes, sha256 and
+    seconds. The previous manifest is removed first and the new one only
+    written once every export succeeded, so a manifest always describes
+    the files next to it. Returns the manifest.
+    """
+    fmt = fmt.lower().strip()
+    out_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = out_dir / MANIFEST_NAME
+    manifest_path.unlink(missing_ok=True)
+    sc = spark.sparkContext
+    inherited = {key: sc.getLocalProperty(key) for key in _INHERITED_PROPERTIES}
+
+    def _export(name: str) -> dict:
+        t0 = time.perf_counter()
+        if workers > 1:
+            for key, value in inherited.items():
+                sc.setLocalProperty(key, value)
+            sc.setLocalProperty("spark.scheduler.pool", f"export_{name}")
+        try:
+            rows = _export_df(viz[name], out_dir, name, fmt)
+        finally:
+            if workers > 1:
+                for key in [*inherited, "spark.scheduler.pool"]:
+                    sc.setLocalProperty(key, None)
+        out = _export_path(out_dir, name, fmt)
+        files = _output_files(out)
+        return {
+            "file": out.name,
+            "rows": rows,
+            "bytes": sum(p.stat().st_size for p in files),
+            "sha256": _sha256(files),
+            "seconds": round(time.perf_counter() - t0, 4),
+        }
+
+    t0 = time.perf_counter()
+    if workers > 1:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="export") as pool:
+            futures = {name: pool.submit(_export, name) for name in viz}
+        outputs = {name: future.result() for name, future in futures.items()}
+    else:
+        outputs = {name: _export(name) for name in viz}
+
+    manifest = {
+        "generated_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "format": fmt,
+        "workers": workers,
+        "seconds": round(time.perf_counter() - t0, 4),
+        "outputs": outputs,
+    }
+    with atomic_output(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return manifest
+
+
+LOCATION_STRUCT = "province_id int, province_name string, is_overseas int, is_unknown int"
+
+
+@functools.lru_cache(maxsize=None)
+def _location_udf():
+    @F.pandas_udf(LOCATION_STRUCT)
+    def normalize_location(raw_loc: pd.Series) -> pd.DataFrame:
+        return location_normalizer.normalize_series(raw_loc)
+
+    return normalize_location
+
+
+def normalize_location(raw_loc: F.Column) -> F.Column:
+    """pig_location.pig's log_location columns as a struct.
+
+    Uses the location_normalizer automaton batch-at-a-time through a pandas
+    UDF; without pandas/pyarrow it falls back to the regex-chain columns.
+    """
+    if pd is not None and pa is not None:
+        return _location_udf()(raw_loc)
+    name = norm.province_name(raw_loc)
+    return F.struct(
+        norm.province_id(name).alias("province_id"),
+        name.alias("province_name"),
+        (name == location_normalizer.OVERSEAS).cast("int").alias("is_overseas"),
+        (name == location_normalizer.UNKNOWN).cast("int").alias("is_unknown"),
+    )
 
 
 def load_two_col_tsv(spark: SparkSession, path_glob: str, col1: str, col2: str):
@@ -114,9 +488,7 @@ def load_two_col_tsv(spark: SparkSession, path_glob: str, col1: str, col2: str):
     # Hadoop native bits (winutils/hadoop.dll). For local exploration, load
     # via Python IO and then create a DataFrame.
     if _is_windows():
-        rows = _read_local_tsv_rows(path_glob, expected_cols=2)
-        parsed = [(r[0], int(r[1]) if r[1] not in (None, "") else None) for r in rows]
-        return spark.createDataFrame(parsed, schema=schema)
+        return _load_local_tsv(spark, path_glob, schema)
 
     return (
         spark.read.option("sep", "\t")
@@ -138,11 +510,7 @@ def load_three_col_tsv(
     )
 
     if _is_windows():
-        rows = _read_local_tsv_rows(path_glob, expected_cols=3)
-        parsed = [
-            (r[0], r[1], int(r[2]) if r[2] not in (None, "") else None) for r in rows
-        ]
-        return spark.createDataFrame(parsed, schema=schema)
+        return _load_local_tsv(spark, path_glob, schema)
 
     return (
         spark.read.option("sep", "\t")
@@ -165,11 +533,7 @@ def load_four_col_tsv(
     )
 
     if _is_windows():
-        rows = _read_local_tsv_rows(path_glob, expected_cols=4)
-        parsed = [
-            (r[0], r[1], r[2], int(r[3]) if r[3] not in (None, "") else None) for r in rows
-        ]
-        return spark.createDataFrame(parsed, schema=schema)
+        return _load_local_tsv(spark, path_glob, schema)
 
     return (
         spark.read.option("sep", "\t")
@@ -183,26 +547,7 @@ def load_job_base_clean(spark: SparkSession, path_glob: str):
     # job_base_clean appears to be 10 tab-separated columns.
     # On native Windows, avoid spark.read.text() to dodge Hadoop native issues.
     if _is_windows():
-        rows = _read_local_tsv_rows(path_glob, expected_cols=10)
-        schema = T.StructType(
-            [
-                T.StructField("job_id", T.LongType(), True),
-                T.StructField("title", T.StringType(), True),
-                T.StructField("category_location_raw", T.StringType(), True),
-                T.StructField("company_raw", T.StringType(), True),
-                T.StructField("location_raw", T.StringType(), True),
-                T.StructField("experience_raw", T.StringType(), True),
-                T.StructField("requirements_raw", T.StringType(), True),
-                T.StructField("industry_raw", T.StringType(), True),
-                T.StructField("education_raw", T.StringType(), True),
-                T.StructField("employment_type_raw", T.StringType(), True),
-            ]
-        )
-        parsed = []
-        for r in rows:
-            job_id = int(r[0]) if r[0] not in (None, "") else None
-            parsed.append((job_id, r[1], r[2], r[3], r[4], r[5], r[6], r[7], r[8], r[9]))
-        df = spark.createDataFrame(parsed, schema=schema)
+        df = _load_local_tsv(spark, path_glob, JOB_BASE_CLEAN_SCHEMA)
         return df.withColumn("_ncols", F.lit(10)).withColumn("_raw", F.lit(None).cast("string"))
 
     raw = spark.read.text(path_glob).select(F.col("value").alias("_raw"))
@@ -232,6 +577,271 @@ def load_job_base_clean(spark: SparkSession, path_glob: str):
     return df
 
 
+def load_inputs(
+    spark: SparkSession,
+    output_dir: Path,
+    input_format: str = "tsv",
+    store_dir: Path | None = None,
+    industry_codes: list[str] | None = None,
+) -> dict[str, DataFrame]:
+    """Load every input of the viz step, keyed by the Pig dataset name.
+
+    - tsv: the Pig part-* outputs under `output_dir`
+    - parquet: the typed store under `store_dir` (see write_parquet_store);
+      Spark prunes columns and pushes filters into the files, and the
+      requirement tables are partitioned by industry_code
+
+    `industry_codes` restricts the requirement tables to those industries;
+    on the parquet store this only touches the matching partitions.
+    """
+    if input_format == "parquet":
+        store_dir = store_dir or output_dir.joinpath("store")
+        tables = {
+            name: spark.read.parquet(_file_glob(store_dir, name))
+            for name in ["industry_total", "industry_by_location"]
+        }
+        tables["job_base_clean"] = spark.read.parquet(
+            _file_glob(store_dir, "job_base_clean")
+        ).withColumn("_raw", F.lit(None).cast("string"))
+        for name in REQUIREMENT_TABLES:
+            tables[name] = spark.read.parquet(
+                _file_glob(store_dir, "requirement_analysis", name)
+            )
+    else:
+        tables = {
+            "industry_total": load_two_col_tsv(
+                spark,
+                _file_glob(output_dir, "industry_total", "part-*"),
+                "industry",
+                "job_count",
+            ),
+            "industry_by_location": load_three_col_tsv(
+                spark,
+                _file_glob(output_dir, "industry_by_location", "part-*"),
+                "province",
+                "industry",
+                "job_count",
+            ),
+            "job_base_clean": load_job_base_clean(
+                spark, _file_glob(output_dir, "job_base_clean", "part-*")
+            ),
+        }
+        for name, label in REQUIREMENT_TABLES.items():
+            tables[name] = load_four_col_tsv(
+                spark,
+                _file_glob(output_dir, "requirement_analysis", name, "part-*"),
+                "industry_code",
+                "industry",
+                label,
+                "job_count",
+            )
+
+    if industry_codes:
+        for name in REQUIREMENT_TABLES:
+            tables[name] = tables[name].where(F.col("industry_code").isin(industry_codes))
+    return tables
+
+
+def write_parquet_store(spark: SparkSession, output_dir: Path, store_dir: Path) -> None:
+    """Convert the Pig TSV outputs into the typed Parquet store.
+
+    The tab split and casts happen once here instead of on every run.
+    job_base_clean keeps `_ncols`, so shifted rows stay visible after
+    conversion. Requirement tables (including req_total when present) are
+    partitioned by industry_code.
+    """
+    tables = load_inputs(spark, output_dir, "tsv")
+    req_total_glob = _file_glob(output_dir, "requirement_analysis", "req_total", "part-*")
+    if glob.glob(req_total_glob):
+        tables["req_total"] = load_four_col_tsv(
+            spark, req_total_glob, "industry_code", "industry", "requirement", "job_count"
+        )
+
+    for name, df in tables.items():
+        if name == "job_base_clean":
+            df = df.drop("_raw")
+        if name in REQUIREMENT_TABLES or name == "req_total":
+            target = store_dir.joinpath("requirement_analysis", name)
+            writer = df.write.mode("overwrite").partitionBy("industry_code")
+        else:
+            target = store_dir.joinpath(name)
+            writer = df.write.mode("overwrite")
+        writer.parquet(str(target.resolve()).replace("\\", "/"))
+
+
+# viz output -> Pig datasets it is derived from
+VIZ_SOURCES = {
+    # Map/cung-cầu
+    "industry_total": ["industry_total"],
+    "industry_total_known": ["industry_total"],
+    "industry_by_location": ["industry_by_location"],
+    "province_total": ["industry_by_location"],
+    "top5_industries_by_province": ["industry_by_location"],
+    "province_industry_share": ["industry_by_location"],
+    # Requirements
+    "requirement_experience_total": ["exp_total"],
+    "requirement_education_total": ["edu_total"],
+    "requirement_employment_type_total": ["type_total"],
+    "requirement_skill_total_top500": ["skill_total"],
+}
+
+
+def build_viz_tables(
+    inputs: dict[str, DataFrame],
+    ledger: _ScanLedger | None = None,
+    requirement_totals: dict[str, DataFrame] | None = None,
+) -> dict[str, DataFrame]:
+    """Derive the viz-ready tables (keyed by export name) from the inputs.
+
+    Only the inputs named in VIZ_SOURCES are needed. With a ledger, shared
+    intermediates are marked as cache points and lineage is recorded for
+    the scan report; inputs must already be registered as sources.
+    `requirement_totals` (see spark_requirements.split_requirement_totals)
+    replaces the per-table groupBy with already aggregated (label, job_count).
+    """
+    ledger = ledger or _ScanLedger()
+    viz: dict[str, DataFrame] = {}
+
+    if "industry_total" in inputs:
+        industry_total = ledger.persist(inputs["industry_total"])
+        viz["industry_total"] = ledger.derive(
+            industry_total.where(
+                (~F.col("industry").isin(SUMMARY_INDUSTRY)) & (~_is_irrelevant_category(F.col("industry")))
+            ),
+            industry_total,
+        )
+        viz["industry_total_known"] = ledger.derive(
+            industry_total.where(
+                (~F.col("industry").isin("UNKNOWN", SUMMARY_INDUSTRY))
+                & (~_is_irrelevant_category(F.col("industry")))
+            ),
+            industry_total,
+        )
+
+    if "industry_by_location" in inputs:
+        industry_by_location = inputs["industry_by_location"]
+        industry_by_location_viz = ledger.persist(
+            ledger.derive(
+                industry_by_location.where(~_is_irrelevant_category(F.col("industry"))),
+                industry_by_location,
+            )
+        )
+
+        province_total = ledger.persist(
+            ledger.derive(
+                industry_by_location_viz.groupBy("province")
+                .agg(F.sum("job_count").alias("province_job_count"))
+                .orderBy(F.desc("province_job_count"), F.asc("province")),
+                industry_by_location_viz,
+            )
+        )
+
+        top5_industries_by_province = ledger.derive(
+            industry_by_location_viz.withColumn(
+                "rn",
+                F.row_number().over(
+                    Window.partitionBy("province").orderBy(
+                        F.desc("job_count"), F.asc("industry")
+                    )
+                ),
+            )
+            .where(F.col("rn") <= 5),
+            industry_by_location_viz,
+        )
+
+        province_industry_share = ledger.derive(
+            industry_by_location_viz.join(province_total, on="province", how="left")
+            .withColumn(
+                "share",
+                F.when(F.col("province_job_count") > 0, F.col("job_count") / F.col("province_job_count")).otherwise(
+                    F.lit(None)
+                ),
+            )
+            .select("province", "industry", "job_count", "province_job_count", "share"),
+            industry_by_location_viz,
+            province_total,
+        )
+
+        viz["industry_by_location"] = industry_by_location_viz
+        viz["province_total"] = province_total
+        viz["top5_industries_by_province"] = top5_industries_by_province
+        viz["province_industry_share"] = province_industry_share
+
+    for viz_name, sources in VIZ_SOURCES.items():
+        table = sources[0]
+        if table not in REQUIREMENT_TABLES:
+            continue
+        label = REQUIREMENT_TABLES[table]
+        if requirement_totals and table in requirement_totals:
+            totals = requirement_totals[table]
+            total = ledger.persist(
+                ledger.derive(
+                    totals.where(~_is_irrelevant_category(F.col(label)))
+                    .orderBy(F.desc("job_count"), F.asc(label)),
+                    totals,
+                )
+            )
+        elif table in inputs:
+            by_industry = inputs[table]
+            total = ledger.persist(
+                ledger.derive(
+                    by_industry.where(~_is_irrelevant_category(F.col(label))).groupBy(label)
+                    .agg(F.sum("job_count").alias("job_count"))
+                    .orderBy(F.desc("job_count"), F.asc(label)),
+                    by_industry,
+                )
+            )
+        else:
+            continue
+        if table == "skill_total":
+            total = ledger.derive(total.limit(500), total)
+        viz[viz_name] = total
+
+    return viz
+
+
+def requirements_from_job_base(
+    spark: SparkSession,
+    inputs: dict[str, DataFrame],
+    store_dir: Path,
+    ledger: _ScanLedger,
+    industry_codes: list[str] | None = None,
+) -> dict[str, DataFrame]:
+    """Replace the requirement tables in `inputs` by one cube over job_base_clean.
+
+    Returns the global per-value totals for build_viz_tables. The cube
+    groups on token ids; the stored vocabulary is only read here.
+    """
+    import spark_vocab
+    from spark_requirements import (
+        requirement_cube,
+        requirement_long,
+        split_requirement_tables,
+        split_requirement_totals,
+    )
+
+    job_base_clean = ledger.persist(inputs["job_base_clean"])
+    vocab = spark_vocab.extend_vocabulary(
+        requirement_long(job_base_clean),
+        spark_vocab.load_vocabulary(spark, store_dir.joinpath("vocab")),
+    )
+    cube = ledger.persist(
+        ledger.derive(
+            requirement_cube(job_base_clean, industry_codes=industry_codes, vocab=vocab),
+            job_base_clean,
+        )
+    )
+    for name, df in split_requirement_tables(cube).items():
+        if name in REQUIREMENT_TABLES:
+            inputs[name] = ledger.derive(df, cube)
+    return {name: ledger.derive(df, cube) for name, df in split_requirement_totals(cube).items()}
+
+
+def _show(metrics: RunMetrics, step: str, df: DataFrame, n: int) -> None:
+    with metrics.step(step, "aggregate"):
+        df.show(n, truncate=False)
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Explore Pig output (local folder) using PySpark"
@@ -263,9 +873,121 @@ def main():
         default=None,
         help="Directory to export viz outputs (default: <output-dir>/viz)",
     )
+    parser.add_argument(
+        "--export-workers",
+        type=int,
+        default=EXPORT_WORKERS,
+        help="Viz tables exported concurrently, each in its own FAIR "
+        f"scheduler pool; 1 exports them one after another (default: {EXPORT_WORKERS})",
+    )
+    parser.add_argument(
+        "--persist",
+        action="store_true",
+        help="Planned execution: persist shared intermediates instead of "
+        "rescanning the Pig outputs for every show/export",
+    )
+    parser.add_argument(
+        "--storage-level",
+        default="MEMORY_AND_DISK",
+        choices=["MEMORY_ONLY", "MEMORY_AND_DISK", "MEMORY_AND_DISK_DESER", "DISK_ONLY"],
+        help="Storage level used by --persist (default: MEMORY_AND_DISK)",
+    )
+    parser.add_argument(
+        "--input-format",
+        default="tsv",
+        choices=["tsv", "parquet"],
+        help="Read the Pig part-* TSV outputs or the Parquet store (default: tsv)",
+    )
+    parser.add_argument(
+        "--store-dir",
+        default=None,
+        help="Parquet store directory (default: <output-dir>/store)",
+    )
+    parser.add_argument(
+        "--write-store",
+        action="store_true",
+        help="Convert the Pig TSV outputs into the Parquet store, then read from it",
+    )
+    parser.add_argument(
+        "--industry-code",
+        action="append",
+        default=None,
+        help="Restrict requirement tables to this industry_code (repeatable)",
+    )
+    parser.add_argument(
+        "--requirements",
+        default="pig",
+        choices=["pig", "job_base", "cube"],
+        help="pig: read requirement_analysis/*; job_base: rebuild them from "
+        "job_base_clean in one aggregation (see spark_requirements.py); cube: "
+        "experience / education / employment type from the job cube (see job_cube.py)",
+    )
+    parser.add_argument(
+        "--industry",
+        default="pig",
+        choices=["pig", "job_base", "cube"],
+        help="pig: read industry_total / industry_by_location; job_base: rebuild "
+        "them from job_base_clean with the irrelevant industries filtered "
+        "before the shuffle (see spark_industry.py); cube: roll them up from "
+        "the job cube (see job_cube.py)",
+    )
+    parser.add_argument(
+        "--cube-dir",
+        default=None,
+        help="Job cube for --industry / --requirements cube (default: <output-dir>/job_cube)",
+    )
+    parser.add_argument(
+        "--skill-top",
+        default="exact",
+        choices=["exact", "approx"],
+        help="approx: requirement_skill_total_top500 from per-partition "
+        "Count-Min + SpaceSaving sketches instead of a full GROUP BY and sort "
+        "(see skill_sketch.py)",
+    )
+    parser.add_argument("--sketch-epsilon", type=float, default=1e-4, help="Count-Min relative error")
+    parser.add_argument("--sketch-delta", type=float, default=0.01, help="Count-Min failure probability")
+    parser.add_argument("--sketch-capacity", type=int, default=5000, help="SpaceSaving counters")
+    parser.add_argument(
+        "--metrics",
+        default=None,
+        help="JSON-lines run report, one line per step (default: "
+        "<output-dir>/metrics/run_report.jsonl; see run_metrics.py)",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Also count the rows of every input and write the physical plan "
+        "of every viz table to <metrics dir>/plans/<run>/",
+    )
+    parser.add_argument(
+        "--data-profile",
+        default=None,
+        help="data_profile.py JSON report; reused while job_base_clean is "
+        "unchanged, rewritten otherwise (default: <output-dir>/data_profile.json)",
+    )
+    parser.add_argument(
+        "--engine",
+        default="spark",
+        choices=["spark", "local"],
+        help="local: build the viz tables with pandas in-process, no "
+        "SparkSession (see local_engine.py)",
+    )
 
     args = parser.parse_args()
     output_dir = Path(args.output_dir)
+    args.cube_dir = Path(args.cube_dir) if args.cube_dir else output_dir.joinpath("job_cube")
+    args.data_profile = Path(args.data_profile) if args.data_profile else output_dir.joinpath("data_profile.json")
+    if "cube" in (args.requirements, args.industry) and not args.cube_dir.joinpath("cube.parquet").exists():
+        parser.error(f"no job cube in {args.cube_dir}; build it with `python job_cube.py build`")
+
+    if args.engine == "local":
+        if "job_base" in (args.requirements, args.industry) or args.write_store or args.skill_top == "approx":
+            parser.error("--engine local reads existing outputs only; --requirements job_base, "
+                         "--industry job_base, --write-store and --skill-top approx need Spark")
+        import local_engine
+
+        local_engine.run(args)
+        return
 
     # On Windows it's common for `python` on PATH to be the Microsoft Store alias,
     # which breaks Spark's ability to launch Python workers.
@@ -278,181 +1000,250 @@ def main():
         .master("local[*]")
         .config("spark.pyspark.python", sys.executable)
         .config("spark.pyspark.driver.python", sys.executable)
+        # Arrow transfer for the pandas-based local loader.
+        .config("spark.sql.execution.arrow.pyspark.enabled", "true")
+        # Concurrent exports share the executors instead of queueing FIFO.
+        .config("spark.scheduler.mode", "FAIR")
         .getOrCreate()
     )
 
     spark.sparkContext.setLogLevel("WARN")
 
+    metrics_path = Path(args.metrics) if args.metrics else output_dir.joinpath("metrics", "run_report.jsonl")
+    metrics = RunMetrics(metrics_path, spark, metrics_path.parent.joinpath("plans") if args.profile else None)
+
     export_dir = (
         Path(args.export_dir)
         if args.export_dir
         else Path(output_dir).joinpath("viz")
     )
 
-    # 1) industry_total: (industry, count)
-    industry_total_path = _file_glob(output_dir, "industry_total", "part-*")
-    industry_total = load_two_col_tsv(
-        spark, industry_total_path, "industry", "job_count"
-    )
-    print("\n== industry_total (top 20 by job_count) ==")
-    industry_total.orderBy(F.desc("job_count"), F.asc("industry")).show(
-        args.show, truncate=False
-    )
+    store_dir = Path(args.store_dir) if args.store_dir else output_dir.joinpath("store")
+    input_format = args.input_format
+    if args.write_store:
+        with metrics.step("write_store", "store"):
+            write_parquet_store(spark, output_dir, store_dir)
+        input_format = "parquet"
 
-    industry_total_known = industry_total.where(
-        (~F.col("industry").isin("UNKNOWN", "TONG_TAT_CA"))
-        & (~_is_irrelevant_category(F.col("industry")))
+    with metrics.step("load_inputs", "load", input_format=input_format):
+        inputs = load_inputs(
+            spark, output_dir, input_format, store_dir, industry_codes=args.industry_code
+        )
+    for name, df in inputs.items():
+        parts = ["requirement_analysis", name] if name in REQUIREMENT_TABLES else [name]
+        if input_format == "parquet":
+            files = _file_glob(store_dir, *parts, "**", "*.parquet")
+        else:
+            files = _file_glob(output_dir, *parts, "part-*")
+        with metrics.step(f"load:{name}", "load", **_file_stats(files)) as record:
+            if args.profile:
+                record["rows_out"] = df.count()
+
+    ledger = _ScanLedger(
+        getattr(StorageLevel, args.storage_level) if args.persist else None
     )
+    for df in inputs.values():
+        ledger.source(df)
+
+    requirement_totals = None
+    if args.requirements == "job_base":
+        with metrics.step("requirements_from_job_base", "aggregate"):
+            requirement_totals = requirements_from_job_base(
+                spark, inputs, store_dir, ledger, industry_codes=args.industry_code
+            )
+
+    if args.industry == "job_base":
+        from spark_industry import industry_rows, industry_viz_inputs
+
+        job_base_clean = ledger.persist(inputs["job_base_clean"])
+        for name, df in industry_viz_inputs(industry_rows(job_base_clean)).items():
+            inputs[name] = ledger.derive(df, job_base_clean)
+
+    if "cube" in (args.requirements, args.industry):
+        from job_cube import REQUIREMENT_DIMENSIONS, JobCube
+        from local_engine import _INPUT_SCHEMAS
+
+        with metrics.step("job_cube", "load") as record:
+            cube_inputs = JobCube.load(args.cube_dir).pig_inputs(args.industry_code)
+            record["cells"] = sum(len(frame) for frame in cube_inputs.values())
+        names = (["industry_total", "industry_by_location"] if args.industry == "cube" else []) + (
+            list(REQUIREMENT_DIMENSIONS) if args.requirements == "cube" else []
+        )
+        for name in names:
+            inputs[name] = ledger.source(spark.createDataFrame(cube_inputs[name], schema=_INPUT_SCHEMAS[name]))
+
+    viz = build_viz_tables(inputs, ledger, requirement_totals)
+    if args.skill_top == "approx":
+        import skill_sketch
+
+        skill_total = inputs["skill_total"]
+        with metrics.step("skill_sketch", "aggregate"):
+            approx, bounds = skill_sketch.approx_skill_total(
+                skill_sketch.skill_rows(skill_total),
+                500,
+                epsilon=args.sketch_epsilon,
+                delta=args.sketch_delta,
+                capacity=args.sketch_capacity,
+            )
+        ledger.action(skill_total)  # the sketch pass
+        viz["requirement_skill_total_top500"] = ledger.derive(approx, skill_total)
+        print(f"\n== approximate skill top 500: {skill_sketch.format_bounds(bounds, 500)} ==")
 
-    industry_total_viz = industry_total.where(
-        (~F.col("industry").isin("TONG_TAT_CA")) & (~_is_irrelevant_category(F.col("industry")))
+    # 1) industry_total: (industry, count)
+    industry_total = inputs["industry_total"]
+    print("\n== industry_total (top 20 by job_count) ==")
+    _show(
+        metrics,
+        "show:industry_total",
+        ledger.action(
+            ledger.derive(
+                industry_total.orderBy(F.desc("job_count"), F.asc("industry")),
+                industry_total,
+            )
+        ),
+        args.show,
     )
 
     # 2) industry_by_location: (province, industry, count)
-    industry_by_location_path = _file_glob(output_dir, "industry_by_location", "part-*")
-    industry_by_location = load_three_col_tsv(
-        spark, industry_by_location_path, "province", "industry", "job_count"
-    )
+    industry_by_location = inputs["industry_by_location"]
     print("\n== industry_by_location (sample) ==")
-    industry_by_location.show(args.show, truncate=False)
-
-    industry_by_location_viz = industry_by_location.where(
-        ~_is_irrelevant_category(F.col("industry"))
-    )
-
-    province_total = (
-        industry_by_location_viz.groupBy("province")
-        .agg(F.sum("job_count").alias("province_job_count"))
-        .orderBy(F.desc("province_job_count"), F.asc("province"))
-    )
+    _show(metrics, "show:industry_by_location", ledger.action(industry_by_location), args.show)
 
+    industry_by_location_viz = viz["industry_by_location"]
     print("\n== Top industries by province (top 3 each) ==")
     w = F.row_number().over(
         Window.partitionBy("province").orderBy(F.desc("job_count"), F.asc("industry"))
     )
-    (
-        industry_by_location_viz.withColumn("rn", w)
-        .where(F.col("rn") <= 3)
-        .orderBy(F.asc("province"), F.asc("rn"))
-        .show(200, truncate=False)
-    )
-
-    top5_industries_by_province = (
-        industry_by_location_viz.withColumn(
-            "rn",
-            F.row_number().over(
-                Window.partitionBy("province").orderBy(
-                    F.desc("job_count"), F.asc("industry")
-                )
-            ),
-        )
-        .where(F.col("rn") <= 5)
-    )
-
-    province_industry_share = (
-        industry_by_location_viz.join(province_total, on="province", how="left")
-        .withColumn(
-            "share",
-            F.when(F.col("province_job_count") > 0, F.col("job_count") / F.col("province_job_count")).otherwise(
-                F.lit(None)
-            ),
-        )
-        .select("province", "industry", "job_count", "province_job_count", "share")
+    _show(
+        metrics,
+        "show:top3_industries_by_province",
+        ledger.action(
+            ledger.derive(
+                industry_by_location_viz.withColumn("rn", w)
+                .where(F.col("rn") <= 3)
+                .orderBy(F.asc("province"), F.asc("rn")),
+                industry_by_location_viz,
+            )
+        ),
+        200,
     )
 
     # 3) job_base_clean: 10 columns (tab-separated)
-    job_base_clean_path = _file_glob(output_dir, "job_base_clean", "part-*")
-    job_base_clean = load_job_base_clean(spark, job_base_clean_path)
-
+    job_base_clean = ledger.persist(inputs["job_base_clean"])
+
+    # The column-count distribution comes from the data profile: reused when
+    # spark_job_base.py (or data_profile.py) already profiled these files,
+    # otherwise computed here in the same pass as the rest of the profile.
+    import data_profile
+
+    if input_format == "parquet":
+        job_base_files = _file_glob(store_dir, "job_base_clean", "**", "*.parquet")
+    else:
+        job_base_files = _file_glob(output_dir, "job_base_clean", "part-*")
+    with metrics.step("data_profile", "aggregate") as record:
+        report, record["reused"] = data_profile.cached_profile(
+            job_base_clean, args.data_profile, data_profile.source_stamp(job_base_files)
+        )
+        if not record["reused"]:
+            ledger.action(job_base_clean)
     print("\n== job_base_clean: column count distribution ==")
-    job_base_clean.groupBy("_ncols").count().orderBy("_ncols").show(50, truncate=False)
+    print(data_profile.format_ncols(report))
 
     print("\n== job_base_clean: sample rows ==")
-    job_base_clean.select(
-        "job_id",
-        "title",
-        "location_raw",
-        "experience_raw",
-        "industry_raw",
-        "education_raw",
-        "employment_type_raw",
-        "_ncols",
-    ).show(args.show, truncate=False)
-
-    print("\n== job_base_clean: top locations (raw) ==")
-    (
-        job_base_clean.groupBy("location_raw")
-        .count()
-        .orderBy(F.desc("count"), F.asc("location_raw"))
-        .show(args.show, truncate=False)
+    _show(
+        metrics,
+        "show:job_base_clean_sample",
+        ledger.action(
+            ledger.derive(
+                job_base_clean.select(
+                    "job_id",
+                    "title",
+                    "location_raw",
+                    "experience_raw",
+                    "industry_raw",
+                    "education_raw",
+                    "employment_type_raw",
+                    "_ncols",
+                ),
+                job_base_clean,
+            )
+        ),
+        args.show,
     )
 
-    # 4) requirement_analysis outputs (industry_code, industry, label, count)
-    exp_path = _file_glob(output_dir, "requirement_analysis", "exp_total", "part-*")
-    edu_path = _file_glob(output_dir, "requirement_analysis", "edu_total", "part-*")
-    type_path = _file_glob(output_dir, "requirement_analysis", "type_total", "part-*")
-    skill_path = _file_glob(output_dir, "requirement_analysis", "skill_total", "part-*")
-
-    exp_by_industry = load_four_col_tsv(
-        spark, exp_path, "industry_code", "industry", "experience", "job_count"
-    )
-    edu_by_industry = load_four_col_tsv(
-        spark, edu_path, "industry_code", "industry", "education", "job_count"
-    )
-    type_by_industry = load_four_col_tsv(
-        spark, type_path, "industry_code", "industry", "employment_type", "job_count"
-    )
-    skill_by_industry = load_four_col_tsv(
-        spark, skill_path, "industry_code", "industry", "skill", "job_count"
+    print("\n== job_base_clean: top locations (raw) ==")
+    _show(
+        metrics,
+        "show:top_locations_raw",
+        ledger.action(
+            ledger.derive(
+                job_base_clean.groupBy("location_raw")
+                .count()
+                .orderBy(F.desc("count"), F.asc("location_raw")),
+                job_base_clean,
+            )
+        ),
+        args.show,
     )
 
-    exp_total = (
-        exp_by_industry.where(~_is_irrelevant_category(F.col("experience"))).groupBy("experience")
-        .agg(F.sum("job_count").alias("job_count"))
-        .orderBy(F.desc("job_count"), F.asc("experience"))
-    )
-    edu_total = (
-        edu_by_industry.where(~_is_irrelevant_category(F.col("education"))).groupBy("education")
-        .agg(F.sum("job_count").alias("job_count"))
-        .orderBy(F.desc("job_count"), F.asc("education"))
-    )
-    type_total = (
-        type_by_industry.where(~_is_irrelevant_category(F.col("employment_type"))).groupBy("employment_type")
-        .agg(F.sum("job_count").alias("job_count"))
-        .orderBy(F.desc("job_count"), F.asc("employment_type"))
-    )
-    skill_total = (
-        skill_by_industry.where(~_is_irrelevant_category(F.col("skill"))).groupBy("skill")
-        .agg(F.sum("job_count").alias("job_count"))
-        .orderBy(F.desc("job_count"), F.asc("skill"))
+    print("\n== job_base_clean: top provinces (normalized location_raw) ==")
+    _show(
+        metrics,
+        "show:top_provinces",
+        ledger.action(
+            ledger.derive(
+                job_base_clean.select(normalize_location(F.col("location_raw")).alias("loc"))
+                .groupBy("loc.province_id", "loc.province_name")
+                .count()
+                .orderBy(F.desc("count"), F.asc("province_name")),
+                job_base_clean,
+            )
+        ),
+        args.show,
     )
 
+    # 4) requirement_analysis outputs (industry_code, industry, label, count)
     print("\n== requirement_analysis: experience total (top 20) ==")
-    exp_total.show(20, truncate=False)
+    _show(metrics, "show:requirement_experience_total", ledger.action(viz["requirement_experience_total"]), 20)
     print("\n== requirement_analysis: education total (top 20) ==")
-    edu_total.show(20, truncate=False)
+    _show(metrics, "show:requirement_education_total", ledger.action(viz["requirement_education_total"]), 20)
     print("\n== requirement_analysis: employment type total (top 20) ==")
-    type_total.show(20, truncate=False)
+    _show(metrics, "show:requirement_employment_type_total", ledger.action(viz["requirement_employment_type_total"]), 20)
     print("\n== requirement_analysis: skill total (top 20) ==")
-    skill_total.show(20, truncate=False)
+    _show(metrics, "show:requirement_skill_total_top500", ledger.action(viz["requirement_skill_total_top500"]), 20)
 
     if args.export:
-        export_dir.mkdir(parents=True, exist_ok=True)
-
-        # Map/cung-cầu
-        _export_df(industry_total_viz, export_dir, "industry_total", args.export_format)
-        _export_df(industry_total_known, export_dir, "industry_total_known", args.export_format)
-        _export_df(industry_by_location_viz, export_dir, "industry_by_location", args.export_format)
-        _export_df(province_total, export_dir, "province_total", args.export_format)
-        _export_df(top5_industries_by_province, export_dir, "top5_industries_by_province", args.export_format)
-        _export_df(province_industry_share, export_dir, "province_industry_share", args.export_format)
-
-        # Requirements
-        _export_df(exp_total, export_dir, "requirement_experience_total", args.export_format)
-        _export_df(edu_total, export_dir, "requirement_education_total", args.export_format)
-        _export_df(type_total, export_dir, "requirement_employment_type_total", args.export_format)
-        _export_df(skill_total.limit(500), export_dir, "requirement_skill_total_top500", args.export_format)
-
+        for df in viz.values():
+            ledger.action(df)
+        with metrics.step("export", "export", format=args.export_format, workers=args.export_workers) as record:
+            manifest = export_viz_tables(spark, viz, export_dir, args.export_format, args.export_workers)
+            outputs = manifest["outputs"].values()
+            record["outputs"] = len(outputs)
+            record["rows_out"] = sum(o["rows"] or 0 for o in outputs)
+            record["bytes_written"] = sum(o["bytes"] for o in outputs)
+        # One record per table too; with workers > 1 their seconds overlap.
+        for name, out in manifest["outputs"].items():
+            metrics.write(
+                {
+                    "step": f"export:{name}",
+                    "kind": "export",
+                    "parent": "export",
+                    "format": args.export_format,
+                    "seconds": out["seconds"],
+                    "rows_out": out["rows"],
+                    "bytes_written": out["bytes"],
+                }
+            )
+        print(f"\n== exported {len(outputs)} tables to {export_dir} in {manifest['seconds']:.2f}s "
+              f"({args.export_workers} workers; manifest: {MANIFEST_NAME}) ==")
+
+    # After the actions, so adaptive plans are final.
+    for name, df in viz.items():
+        metrics.plan(name, df)
+
+    print(f"\n== {ledger.report()} ==")
+    print(f"== run report: {metrics_path} (run {metrics.run_id}) ==")
+    ledger.unpersist_all()
     spark.stop()
 
 
@@ -0,0 +1,484 @@
+"""Incremental refresh of the aggregates when a new crawl batch arrives.
+
+Instead of re-running job_explore_base.pig -> pig_location/pig_industry/
+analysis.pig -> spark_explore_output.py over the whole history, each new
+JSONL batch is parsed and compared with the current version of every
+posting; only new or changed postings are normalized, and their +1 and
+the -1 of the version they replace are merged into the persisted totals.
+The totals are published to the Parquet store, and only the output/viz
+tables whose sources changed are re-exported.
+
+Postings are identified by --key-field (default: the crawl's URL). Every
+line of the batch counts, as in the Pig chain; the version of a posting
+is the set of lines carrying its key. Lines without the key field are
+keyed by their content hash, so an edit of such a line looks like a new
+posting. With --snapshot the batch is the whole current crawl and the
+postings missing from it are retracted too; without it the batch only
+adds or replaces postings.
+
+State (default <output-dir>/incremental):
+- state.json: state format, bucket count, key field, the id of the last
+  merged batch and the files that make up the current state
+- postings/bucket=<n>/: the current version of every posting (posting_key,
+  version_hash, content_hash, normalized dimensions), bucketed by
+  hash(posting_key) mod buckets. A run reads the keys and version hashes
+  of the buckets the batch touches (every bucket with --snapshot). New
+  postings are added as one more file in their bucket; only the buckets
+  holding a retracted or changed key, or that would pass MAX_BUCKET_FILES
+  files, are rewritten. Normalization and aggregation only see the changed
+  postings.
+- aggregates/<name>/<batch id>/: industry_total, industry_by_location and
+  the four requirement totals, in the Parquet store layout
+
+A run writes its posting files and aggregate versions next to the live
+ones and commits them all at once by renaming a new state.json into place;
+files that state.json does not list are never read and are deleted after
+the commit (or by the next run when a run dies before it). The batch id is
+a stamp of the batch files, so rerunning a batch that was already merged
+only publishes and exports the committed aggregates again.
+"""
+
+from __future__ import annotations
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import shutil
+import sys
+from pathlib import Path
+
+from pyspark import StorageLevel
+from pyspark.sql import DataFrame, SparkSession, functions as F
+from pyspark.sql.window import Window
+
+import spark_normalize as norm
+from local_io import atomic_output, write_swap
+from spark_explore_output import (
+    REQUIREMENT_TABLES,
+    VIZ_SOURCES,
+    _export_df,
+    _file_glob,
+    build_viz_tables,
+    normalize_location,
+)
+from spark_job_base import JOB_FIELDS, read_jobs_jsonl
+
+
+# aggregate -> grouping keys (column names as in the Parquet store)
+AGGREGATE_KEYS = {
+    "industry_total": ["industry"],
+    "industry_by_location": ["province", "industry"],
+    **{
+        name: ["industry_code", "industry", label]
+        for name, label in REQUIREMENT_TABLES.items()
+    },
+}
+
+# Identity columns of a state row, before the normalized dimensions.
+STATE_COLUMNS = ["bucket", "posting_key", "version_hash", "content_hash"]
+
+DIMENSION_COLUMNS = [
+    "industry",
+    "province",
+    "req_industry_code",
+    "req_industry",
+    "experience",
+    "education",
+    "employment_type",
+    "skills",
+]
+
+
+STATE_FORMAT = 3
+DEFAULT_BUCKETS = 64
+DEFAULT_KEY_FIELD = "URL"
+# A bucket about to get more files than this is rewritten as one file.
+MAX_BUCKET_FILES = 8
+
+
+def _path(p: Path) -> str:
+    return str(p.resolve()).replace("\\", "/")
+
+
+def read_batch(spark: SparkSession, path: str, key_field: str | None, buckets: int) -> DataFrame:
+    """Parse a crawl batch: one row per line, with posting_key, version_hash and bucket.
+
+    Same title filter as job_explore_base.pig, and like Pig every line is
+    kept (a key listed twice counts twice). version_hash covers all lines
+    of the key, so any edit, added or dropped copy changes it.
+    """
+    extra = [(key_field, "_key")] if key_field else []
+    jobs = read_jobs_jsonl(spark, path, extra_fields=extra).where(
+        F.col("raw_title").isNotNull() & (F.trim(F.col("raw_title")) != "")
+    )
+    content_hash = F.sha2(
+        F.concat_ws("\u0001", *[F.coalesce(F.col(c), F.lit("")) for _, c in JOB_FIELDS]), 256
+    )
+    jobs = jobs.withColumn("content_hash", content_hash)
+    by_content = F.concat(F.lit("hash:"), F.col("content_hash"))
+    key = F.coalesce(F.concat(F.lit("id:"), F.col("_key")), by_content) if key_field else by_content
+    lines = Window.partitionBy("posting_key")
+    return (
+        jobs.withColumn("posting_key", key)
+        .withColumn(
+            "version_hash",
+            F.sha2(F.array_join(F.array_sort(F.collect_list("content_hash").over(lines)), ","), 256),
+        )
+        .withColumn("bucket", F.pmod(F.xxhash64("posting_key"), F.lit(buckets)).cast("int"))
+        .drop("_key")
+    )
+
+
+def posting_dimensions(jobs: DataFrame) -> DataFrame:
+    """Normalize each posting the way the Pig scripts do (see spark_normalize)."""
+    req_industry = norm.industry_name(F.col("raw_ind"), hidden_is_unknown=False)
+    return jobs.select(
+        *STATE_COLUMNS,
+        norm.industry_name(F.col("raw_ind")).alias("industry"),
+        F.coalesce(
+            normalize_location(F.col("raw_loc")).getField("province_name"), F.lit(norm.UNKNOWN)
+        ).alias("province"),
+        norm.industry_id(req_industry).alias("req_industry_code"),
+        req_industry.alias("req_industry"),
+        norm.experience_bucket(F.col("raw_exp")).alias("experience"),
+        norm.education_level(F.col("raw_edu")).alias("education"),
+        norm.employment_type(F.col("raw_type")).alias("employment_type"),
+        norm.tokens(F.col("raw_skill")).alias("skills"),
+    )
+
+
+def contribution_deltas(signed: DataFrame) -> dict[str, DataFrame]:
+    """Per-aggregate job_count deltas from dimension rows carrying a `sign`."""
+    req = signed.withColumnRenamed("req_industry_code", "industry_code").drop("industry")
+    req = req.withColumnRenamed("req_industry", "industry")
+
+    sources = {
+        "industry_total": signed,
+        "industry_by_location": signed,
+        "exp_total": req,
+        "edu_total": req,
+        "type_total": req,
+        "skill_total": req.withColumn("skill", F.explode("skills")),
+    }
+    deltas = {
+        name: sources[name].groupBy(*keys).agg(F.sum("sign").alias("job_count"))
+        for name, keys in AGGREGATE_KEYS.items()
+    }
+    # industry_total carries pig_industry.pig's grand-total row.
+    grand_total = signed.agg(F.sum("sign").alias("job_count")).select(
+        F.lit("TONG_TAT_CA").alias("industry"), "job_count"
+    )
+    deltas["industry_total"] = deltas["industry_total"].unionByName(grand_total)
+    return {
+        name: df.where(F.col("job_count").isNotNull() & (F.col("job_count") != 0))
+        for name, df in deltas.items()
+    }
+
+
+def batch_id(batch_path: str, snapshot: bool) -> str:
+    """Stamp of the batch files (path, size, mtime) and of the mode."""
+    h = hashlib.sha256(f"snapshot={snapshot}\n".encode("utf-8"))
+    for name in sorted(glob.glob(batch_path)):
+        st = os.stat(name)
+        h.update(f"{name}\0{st.st_size}\0{st.st_mtime_ns}\n".encode("utf-8"))
+    return h.hexdigest()[:16]
+
+
+def _load_meta(state_dir: Path, key_field: str | None, buckets: int) -> dict:
+    """state.json of an existing state (checked against the arguments) or a new one."""
+    meta_path = state_dir.joinpath("state.json")
+    if meta_path.exists():
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+    elif state_dir.joinpath("postings").exists():
+        meta = {"format": 1}
+    else:
+        return {
+            "format": STATE_FORMAT,
+            "buckets": buckets,
+            "key_field": key_field,
+            "batch_id": None,
+            "delta_rows": {},
+            "postings": {},
+            "aggregates": {},
+        }
+    if meta.get("format") != STATE_FORMAT:
+        raise ValueError(f"{state_dir} holds an older incremental state; rebuild it with --reset")
+    if meta["key_field"] != key_field:
+        raise ValueError(
+            f"{state_dir} is keyed by {meta['key_field']!r}, not {key_field!r}; rebuild it with --reset"
+        )
+    return meta
+
+
+def _commit(state_dir: Path, meta: dict) -> None:
+    with atomic_output(state_dir.joinpath("state.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+
+
+def _collect_garbage(state_dir: Path, meta: dict) -> None:
+    """Delete the posting files and aggregate versions state.json does not list."""
+    postings_dir = state_dir.joinpath("postings")
+    live = {f for files in meta["postings"].values() for f in files}
+    if postings_dir.exists():
+        for bucket_dir in postings_dir.iterdir():
+            for f in bucket_dir.iterdir():
+                if f"{bucket_dir.name}/{f.name}" not in live:
+                    f.unlink()
+            if not any(bucket_dir.iterdir()):
+                bucket_dir.rmdir()
+    aggregates_dir = state_dir.joinpath("aggregates")
+    if aggregates_dir.exists():
+        for name_dir in aggregates_dir.iterdir():
+            for version in name_dir.iterdir():
+                if version.name != meta["aggregates"].get(name_dir.name):
+                    shutil.rmtree(version)
+    shutil.rmtree(state_dir.joinpath("staging"), ignore_errors=True)
+
+
+def _aggregate_path(state_dir: Path, name: str, version: str) -> Path:
+    return state_dir.joinpath("aggregates", name, version)
+
+
+def _read_postings(spark: SparkSession, state_dir: Path, meta: dict, buckets=None) -> DataFrame | None:
+    """The committed posting rows of `buckets` (default: all), or None if there are none."""
+    postings_dir = state_dir.joinpath("postings")
+    files = [
+        _path(postings_dir.joinpath(f))
+        for bucket, bucket_files in meta["postings"].items()
+        if buckets is None or int(bucket) in buckets
+        for f in bucket_files
+    ]
+    if not files:
+        return None
+    return spark.read.option("basePath", _path(postings_dir)).parquet(*files)
+
+
+def _merge_batch(
+    spark: SparkSession,
+    batch_path: str,
+    state_dir: Path,
+    meta: dict,
+    version: str,
+    snapshot: bool,
+) -> dict:
+    """Stage the postings and aggregates of one batch and commit them; return the new state.json."""
+    buckets = meta["buckets"]
+    jobs = read_batch(spark, batch_path, meta["key_field"], buckets).persist(StorageLevel.MEMORY_AND_DISK)
+    batch_versions = jobs.select("bucket", "posting_key", "version_hash").distinct()
+
+    touched = None if snapshot else {r["bucket"] for r in jobs.select("bucket").distinct().collect()}
+    state = _read_postings(spark, state_dir, meta, touched)
+    if state is not None:
+        state_versions = state.select("bucket", "posting_key", "version_hash").distinct()
+        # Keys whose stored version is not the batch's: changed, or (snapshot) gone.
+        retracted_keys = state_versions.join(batch_versions, on=["posting_key", "version_hash"], how="left_anti")
+        if not snapshot:
+            retracted_keys = retracted_keys.join(batch_versions.select("posting_key"), on="posting_key", how="left_semi")
+        retracted_keys = retracted_keys.select("bucket", "posting_key").persist(StorageLevel.MEMORY_AND_DISK)
+        fresh = jobs.join(state_versions, on=["bucket", "posting_key", "version_hash"], how="left_anti")
+        rewritten = {r["bucket"] for r in retracted_keys.select("bucket").distinct().collect()}
+    else:
+        retracted_keys = None
+        fresh = jobs
+        rewritten = set()
+
+    added = posting_dimensions(fresh).persist(StorageLevel.MEMORY_AND_DISK)
+    added_buckets = {r["bucket"] for r in added.select("bucket").distinct().collect()}
+    rewritten |= {b for b in added_buckets if len(meta["postings"].get(str(b), [])) >= MAX_BUCKET_FILES}
+
+    signed = added.withColumn("sign", F.lit(1))
+    if rewritten:
+        # Only the buckets that are rewritten are read in full.
+        old = state.where(F.col("bucket").isin(sorted(rewritten)))
+        retracted = old.join(retracted_keys, on=["bucket", "posting_key"], how="left_semi")
+        signed = signed.unionByName(retracted.select(*added.columns).withColumn("sign", F.lit(-1)))
+
+    deltas = contribution_deltas(signed)
+    delta_rows = {name: df.count() for name, df in deltas.items()}
+    changed = [name for name, n in delta_rows.items() if n]
+
+    for name in changed:
+        keys = AGGREGATE_KEYS[name]
+        merged = deltas[name]
+        if name in meta["aggregates"]:
+            current = spark.read.parquet(_path(_aggregate_path(state_dir, name, meta["aggregates"][name])))
+            merged = current.select(*keys, "job_count").unionByName(merged)
+        merged = merged.groupBy(*keys).agg(F.sum("job_count").alias("job_count")).where(F.col("job_count") > 0)
+        merged.coalesce(1).write.mode("overwrite").parquet(_path(_aggregate_path(state_dir, name, version)))
+
+    postings = {b: files for b, files in meta["postings"].items() if int(b) not in rewritten}
+    if added_buckets or rewritten:
+        current = added.select(*STATE_COLUMNS, *DIMENSION_COLUMNS)
+        if rewritten:
+            kept = old.join(retracted_keys, on=["bucket", "posting_key"], how="left_anti")
+            current = kept.select(*current.columns).unionByName(current)
+        staging = state_dir.joinpath("staging", version)
+        current.repartition("bucket").write.mode("overwrite").partitionBy("bucket").parquet(_path(staging))
+        for part in sorted(staging.glob("bucket=*/*.parquet")):
+            target = state_dir.joinpath("postings", part.parent.name, part.name)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(part, target)
+            bucket = part.parent.name.split("=", 1)[1]
+            postings[bucket] = postings.get(bucket, []) + [f"{part.parent.name}/{part.name}"]
+
+    committed = {
+        **meta,
+        "batch_id": version,
+        "delta_rows": delta_rows,
+        "postings": dict(sorted(postings.items(), key=lambda kv: int(kv[0]))),
+        "aggregates": {**meta["aggregates"], **{name: version for name in changed}},
+    }
+    _commit(state_dir, committed)
+    _collect_garbage(state_dir, committed)
+
+    n_added = added.select("posting_key").distinct().count()
+    n_retracted = retracted_keys.count() if retracted_keys is not None else 0
+    print(
+        f"postings: {n_added} new or changed, {n_retracted} retracted; "
+        f"{len(added_buckets - rewritten)} buckets appended to, {len(rewritten)} of {buckets} rewritten"
+    )
+
+    if retracted_keys is not None:
+        retracted_keys.unpersist()
+    added.unpersist()
+    jobs.unpersist()
+    return committed
+
+
+def run_batch(
+    spark: SparkSession,
+    batch_path: str,
+    state_dir: Path,
+    store_dir: Path,
+    export_dir: Path | None,
+    export_format: str = "csv",
+    key_field: str | None = DEFAULT_KEY_FIELD,
+    snapshot: bool = False,
+    buckets: int = DEFAULT_BUCKETS,
+) -> dict[str, int]:
+    """Merge one crawl batch into the state; return delta row counts per aggregate."""
+    meta = _load_meta(state_dir, key_field, buckets)
+    version = batch_id(batch_path, snapshot)
+    if meta["batch_id"] == version:
+        print(f"batch {version} is already merged; publishing its aggregates again")
+    else:
+        state_dir.mkdir(parents=True, exist_ok=True)
+        _collect_garbage(state_dir, meta)
+        meta = _merge_batch(spark, batch_path, state_dir, meta, version, snapshot)
+    delta_rows = meta["delta_rows"]
+    changed = {name for name, n in delta_rows.items() if n}
+
+    # Publish in the store layout read by spark_explore_output.py.
+    aggregates = {
+        name: spark.read.parquet(_path(_aggregate_path(state_dir, name, version)))
+        for name, version in meta["aggregates"].items()
+    }
+    for name in changed:
+        if name in REQUIREMENT_TABLES:
+            write_swap(aggregates[name], store_dir.joinpath("requirement_analysis", name), ["industry_code"])
+        else:
+            write_swap(aggregates[name], store_dir.joinpath(name))
+
+    if export_dir is not None and changed:
+        viz = build_viz_tables(aggregates)
+        export_dir.mkdir(parents=True, exist_ok=True)
+        for viz_name, sources in VIZ_SOURCES.items():
+            if viz_name in viz and changed.intersection(sources):
+                _export_df(viz[viz_name], export_dir, viz_name, export_format)
+                print(f"re-exported {viz_name}")
+    return delta_rows
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Merge a new VietnamWorks crawl batch into the aggregates incrementally"
+    )
+    parser.add_argument("batch", help="JSONL file or glob with the new crawl batch")
+    parser.add_argument(
+        "--output-dir",
+        default=str(Path(__file__).parent.joinpath("output")),
+        help="Project output folder (default: ./output)",
+    )
+    parser.add_argument(
+        "--state-dir",
+        default=None,
+        help="Incremental state directory (default: <output-dir>/incremental)",
+    )
+    parser.add_argument(
+        "--store-dir",
+        default=None,
+        help="Parquet store to publish aggregates to (default: <output-dir>/store)",
+    )
+    parser.add_argument(
+        "--export-dir",
+        default=None,
+        help="Directory for re-exported viz tables (default: <output-dir>/viz)",
+    )
+    parser.add_argument("--export-format", default="csv", choices=["csv", "parquet"])
+    parser.add_argument(
+        "--key-field",
+        default=DEFAULT_KEY_FIELD,
+        help="Stable JSON field identifying a posting; lines without it are keyed "
+        f"by their content hash, and '' keys every line that way (default: {DEFAULT_KEY_FIELD})",
+    )
+    parser.add_argument(
+        "--snapshot",
+        action="store_true",
+        help="The batch is the whole current crawl: postings missing from it are retracted",
+    )
+    parser.add_argument(
+        "--buckets",
+        type=int,
+        default=DEFAULT_BUCKETS,
+        help=f"Key buckets of a new state (default: {DEFAULT_BUCKETS}; kept from state.json afterwards)",
+    )
+    parser.add_argument(
+        "--reset",
+        action="store_true",
+        help="Drop the incremental state first (the batch then rebuilds from scratch)",
+    )
+    args = parser.parse_args()
+    output_dir = Path(args.output_dir)
+    state_dir = Path(args.state_dir) if args.state_dir else output_dir.joinpath("incremental")
+    store_dir = Path(args.store_dir) if args.store_dir else output_dir.joinpath("store")
+    export_dir = Path(args.export_dir) if args.export_dir else output_dir.joinpath("viz")
+
+    if args.reset and state_dir.exists():
+        shutil.rmtree(state_dir)
+
+    os.environ.setdefault("PYSPARK_PYTHON", sys.executable)
+    os.environ.setdefault("PYSPARK_DRIVER_PYTHON", sys.executable)
+
+    spark = (
+        SparkSession.builder.appName("recruitment-incremental")
+        .master("local[*]")
+        .config("spark.pyspark.python", sys.executable)
+        .config("spark.pyspark.driver.python", sys.executable)
+        .getOrCreate()
+    )
+    spark.sparkContext.setLogLevel("WARN")
+
+    delta_rows = run_batch(
+        spark,
+        _file_glob(args.batch),
+        state_dir,
+        store_dir,
+        export_dir,
+        args.export_format,
+        key_field=args.key_field or None,
+        snapshot=args.snapshot,
+        buckets=args.buckets,
+    )
+
+    print("\n== delta rows per aggregate ==")
+    for name, n in delta_rows.items():
+        print(f"{name:<22} {n}")
+
+    spark.stop()
+
+
+if __name__ == "__main__":
+    main()
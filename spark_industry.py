@@ -0,0 +1,304 @@
+"""Spark port of pig_industry.pig with skew-aware groupings.
+
+pig_industry.pig LEFT OUTER JOINs job_base_clean with log_location on
+job_id and then groups by industry and (province, industry). Every missing
+value is mapped to UNKNOWN before that, so UNKNOWN and the two large
+provinces (TP HO CHI MINH, HA NOI) hold most of the rows; on MapReduce
+their reducers are the stragglers of the stage. Here:
+
+- the province is normalized in the same row (location_normalizer, as in
+  pig_location.pig), so there is no job_id join to skew at all
+- hot grouping keys are detected from a sample (`hot_keys`); with
+  --skew salt/auto their rows are spread over `salts` sub-keys and
+  re-combined in a second, tiny aggregation (`salted_count`). This is off
+  by default: for these COUNTs Spark's map-side partial aggregation
+  already sends at most one row per (map task, key) to a reducer, which
+  --report shows (a 1M-row UNKNOWN key -> 6 reducer rows)
+- for the viz inputs (`industry_viz_inputs`, spark_explore_output.py
+  --industry job_base) the UNKNOWN / "KHÔNG HIỂN THỊ" filter runs before
+  the shuffle: it only reads the grouping key, so filtering the rows
+  first gives the same groups as filtering the groups afterwards
+- `skew_report` prints the hot keys and the rows each shuffle partition
+  receives, with and without map-side partial aggregation
+
+Outputs (same layout as the Pig script):
+- industry_total: (industry, job_count), the TONG_TAT_CA row last
+- industry_by_location: (province, industry, job_count)
+- industry_province_titles/<location_slug>/: (province, job_title,
+  job_count, location_slug), like MultiStorage
+
+Usage:
+    python spark_industry.py --output-dir output
+    python spark_industry.py --output-dir output --skew salt --report
+"""
+
+from __future__ import annotations
+
+import argparse
+import functools
+import os
+import shutil
+import statistics
+import sys
+from pathlib import Path
+
+from pyspark import StorageLevel
+from pyspark.sql import Column, DataFrame, SparkSession, functions as F
+
+import spark_normalize as norm
+from spark_explore_output import _file_glob, _is_irrelevant_category, load_job_base_clean, normalize_location
+from spark_job_base import write_pig_tsv
+from spark_requirements import _pig
+
+
+SUMMARY_INDUSTRY = "TONG_TAT_CA"
+
+# Grouping keys of the Pig GROUP BYs.
+INDUSTRY_KEYS = ["industry"]
+LOCATION_KEYS = ["province", "industry"]
+TITLE_KEYS = ["province", "job_title"]
+
+# --skew auto salts a key only when it holds this share of the rows.
+AUTO_HOT_SHARE = 0.5
+
+
+def industry_rows(job_base_clean: DataFrame) -> DataFrame:
+    """industry_loc_ready of pig_industry.pig: one row per job."""
+    return job_base_clean.select(
+        _pig("mahout_id").alias("job_id"),
+        norm.industry_name(_pig("raw_ind")).alias("industry"),
+        F.coalesce(normalize_location(_pig("raw_loc")).getField("province_name"), F.lit(norm.UNKNOWN)).alias(
+            "province"
+        ),
+        F.upper(F.trim(_pig("raw_title"))).alias("job_title"),
+    )
+
+
+def hot_keys(
+    rows: DataFrame,
+    keys: list[str],
+    min_share: float = 0.05,
+    fraction: float = 0.05,
+    seed: int = 17,
+) -> list[tuple]:
+    """Keys holding at least `min_share` of the rows, estimated from a sample.
+
+    Samples under 1000 rows are too noisy; the full data is counted then
+    (such inputs are small anyway).
+    """
+    sample = rows.select(*keys).sample(fraction=fraction, seed=seed)
+    counts = sample.groupBy(*keys).count().collect()
+    if sum(r["count"] for r in counts) < 1000:
+        counts = rows.select(*keys).groupBy(*keys).count().collect()
+    total = sum(r["count"] for r in counts)
+    hot = [r for r in counts if total and r["count"] / total >= min_share]
+    return [tuple(r[k] for k in keys) for r in sorted(hot, key=lambda r: -r["count"])]
+
+
+def _is_key(keys: list[str], values: list[tuple]) -> Column:
+    matches = [
+        functools.reduce(lambda a, b: a & b, [F.col(k).eqNullSafe(F.lit(v)) for k, v in zip(keys, value)])
+        for value in values
+    ]
+    return functools.reduce(lambda a, b: a | b, matches)
+
+
+def salted_count(rows: DataFrame, keys: list[str], hot: list[tuple], salts: int) -> DataFrame:
+    """COUNT(*) per key; rows of a hot key are first counted in `salts` pieces.
+
+    The first aggregation groups on (keys, _salt) so a hot key lands on up to
+    `salts` shuffle partitions; the second only sees `salts` rows per hot key.
+    """
+    if not hot or salts <= 1:
+        return rows.groupBy(*keys).agg(F.count(F.lit(1)).alias("job_count"))
+    salt = F.when(_is_key(keys, hot), F.pmod(F.xxhash64("job_id"), F.lit(salts))).otherwise(F.lit(0))
+    return (
+        rows.withColumn("_salt", salt)
+        .groupBy(*keys, "_salt")
+        .agg(F.count(F.lit(1)).alias("job_count"))
+        .groupBy(*keys)
+        .agg(F.sum("job_count").alias("job_count"))
+    )
+
+
+def _count(rows: DataFrame, keys: list[str], skew: str, salts: int, min_share: float) -> DataFrame:
+    if skew == "off":
+        return salted_count(rows, keys, [], salts)
+    # Map-side partial aggregation already caps what a hot key sends per
+    # map task; auto only salts keys that dominate the input.
+    return salted_count(rows, keys, hot_keys(rows, keys, min_share if skew == "salt" else AUTO_HOT_SHARE), salts)
+
+
+def industry_tables(
+    rows: DataFrame, skew: str = "off", salts: int = 16, min_share: float = 0.05
+) -> dict[str, DataFrame]:
+    """The three pig_industry.pig outputs from `industry_rows`."""
+    industry_total = _count(rows, INDUSTRY_KEYS, skew, salts, min_share)
+    grand_total = rows.agg(F.count(F.lit(1)).alias("job_count")).select(
+        F.lit(SUMMARY_INDUSTRY).alias("industry"), "job_count"
+    )
+    titles = _count(rows, TITLE_KEYS, skew, salts, min_share)
+    slug = F.regexp_replace(
+        F.regexp_replace(F.upper(F.trim(F.col("province"))), r"\s+", "_"), "[^A-Z0-9_-]", ""
+    )
+    return {
+        # ORDER BY is_summary ASC, total_jobs DESC
+        "industry_total": industry_total.withColumn("_summary", F.lit(0))
+        .unionByName(grand_total.withColumn("_summary", F.lit(1)))
+        .orderBy("_summary", F.desc("job_count"), "industry")
+        .drop("_summary"),
+        "industry_by_location": _count(rows, LOCATION_KEYS, skew, salts, min_share).orderBy(
+            "province", "industry"
+        ),
+        "industry_province_titles": titles.withColumn(
+            "location_slug", F.when(slug == "", F.lit(norm.UNKNOWN)).otherwise(slug)
+        ).orderBy("province", "job_title"),
+    }
+
+
+def industry_viz_inputs(rows: DataFrame, skew: str = "off", salts: int = 16) -> dict[str, DataFrame]:
+    """industry_total / industry_by_location restricted to what the viz tables keep.
+
+    The irrelevant-industry filter is applied before the shuffle, and the
+    TONG_TAT_CA row (dropped by the viz step) is not computed.
+    """
+    relevant = rows.where(~_is_irrelevant_category(F.col("industry")))
+    return {
+        "industry_total": _count(relevant, INDUSTRY_KEYS, skew, salts, AUTO_HOT_SHARE),
+        "industry_by_location": _count(relevant, LOCATION_KEYS, skew, salts, AUTO_HOT_SHARE),
+    }
+
+
+def skew_report(rows: DataFrame, keys: list[str], partitions: int, hot: list[tuple], salts: int, top: int = 5) -> str:
+    """Hot keys and the rows each of `partitions` shuffle partitions receives.
+
+    `raw` is the input row count per partition (what a Pig reducer reads);
+    `partial` counts the (map task, key) rows left after map-side partial
+    aggregation; `salted` is `partial` with the hot keys salted.
+    """
+    target = F.pmod(F.hash(*keys), F.lit(partitions))
+    per_key = rows.groupBy(*keys).agg(F.count(F.lit(1)).alias("rows")).withColumn("partition", target)
+    per_key = per_key.persist(StorageLevel.MEMORY_AND_DISK)
+    total = per_key.agg(F.sum("rows")).first()[0] or 0
+    lines = [f"{'/'.join(keys)}: {total:,} rows, {per_key.count():,} keys, {partitions} shuffle partitions"]
+    for r in per_key.orderBy(F.desc("rows")).limit(top).collect():
+        key = " / ".join(str(r[k]) for k in keys)
+        lines.append(f"  {key:<40} {r['rows']:>10,} rows ({r['rows'] / max(total, 1):6.1%}) -> partition {r['partition']}")
+
+    def sizes(df: DataFrame, column: str) -> list[int]:
+        got = dict(df.groupBy("partition").agg(F.sum(column)).collect())
+        return [got.get(p, 0) or 0 for p in range(partitions)]
+
+    mapped = rows.select(*keys, "job_id").withColumn("_task", F.spark_partition_id())
+    partial = mapped.groupBy("_task", *keys).agg(F.lit(1).alias("n")).withColumn("partition", target)
+    distributions = {"raw": sizes(per_key, "rows"), "partial": sizes(partial, "n")}
+    if hot:
+        salt = F.when(_is_key(keys, hot), F.pmod(F.xxhash64("job_id"), F.lit(salts))).otherwise(F.lit(0))
+        salted = (
+            mapped.withColumn("_salt", salt)
+            .groupBy("_task", *keys, "_salt")
+            .agg(F.lit(1).alias("n"))
+            .withColumn("partition", F.pmod(F.hash(*keys, "_salt"), F.lit(partitions)))
+        )
+        distributions["salted"] = sizes(salted, "n")
+    for name, counts in distributions.items():
+        median = statistics.median(counts) if counts else 0
+        lines.append(
+            f"  {name:<8} rows per partition: max {max(counts):,}  median {median:,.0f}  "
+            f"max/mean {max(counts) / max(sum(counts) / len(counts), 1e-9):.1f}"
+        )
+    per_key.unpersist()
+    return "\n".join(lines)
+
+
+def _write_multistorage(df: DataFrame, path: Path, key: str) -> None:
+    """One <path>/<key value>/ folder per key, rows keep the key field (MultiStorage)."""
+    tmp = path.with_name(f".{path.name}.tmp")
+    shutil.rmtree(tmp, ignore_errors=True)
+    line = F.concat_ws("\t", *[F.coalesce(F.col(c).cast("string"), F.lit("")) for c in df.columns])
+    df.select(line.alias("value"), F.col(key).alias("_key")).write.partitionBy("_key").text(
+        str(tmp.resolve()).replace("\\", "/")
+    )
+    for part in tmp.iterdir():
+        if part.name.startswith("_key="):
+            part.rename(tmp.joinpath(part.name[len("_key=") :]))
+    shutil.rmtree(path, ignore_errors=True)
+    tmp.rename(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Spark port of pig_industry.pig (job_base_clean -> industry_total, industry_by_location, ...)"
+    )
+    parser.add_argument(
+        "--output-dir",
+        default=str(Path(__file__).parent.joinpath("output")),
+        help="Folder with job_base_clean/; the outputs are written here (default: ./output)",
+    )
+    parser.add_argument(
+        "--input-format",
+        default="tsv",
+        choices=["tsv", "parquet"],
+        help="Read job_base_clean from the Pig part-* files or the Parquet store",
+    )
+    parser.add_argument(
+        "--format",
+        default="tsv",
+        choices=["tsv", "parquet"],
+        help="tsv: PigStorage part-* files; parquet: <output-dir>/store/<table>",
+    )
+    parser.add_argument(
+        "--skew",
+        default="off",
+        choices=["off", "auto", "salt"],
+        help="off: plain GROUP BY with map-side partial aggregation; auto: also "
+        "salt keys holding half the rows; salt: salt every key above --hot-share "
+        "(default: off)",
+    )
+    parser.add_argument("--hot-share", type=float, default=0.05, help="Share of the rows that makes a key hot")
+    parser.add_argument("--salts", type=int, default=16, help="Sub-keys per hot key")
+    parser.add_argument("--report", action="store_true", help="Print hot keys and shuffle partition sizes")
+    args = parser.parse_args()
+    output_dir = Path(args.output_dir)
+    store_dir = output_dir.joinpath("store")
+
+    os.environ.setdefault("PYSPARK_PYTHON", sys.executable)
+    os.environ.setdefault("PYSPARK_DRIVER_PYTHON", sys.executable)
+
+    spark = (
+        SparkSession.builder.appName("recruitment-industry")
+        .master("local[*]")
+        .config("spark.pyspark.python", sys.executable)
+        .config("spark.pyspark.driver.python", sys.executable)
+        .config("spark.sql.execution.arrow.pyspark.enabled", "true")
+        .getOrCreate()
+    )
+    spark.sparkContext.setLogLevel("WARN")
+
+    if args.input_format == "parquet":
+        job_base_clean = spark.read.parquet(_file_glob(store_dir, "job_base_clean"))
+    else:
+        job_base_clean = load_job_base_clean(spark, _file_glob(output_dir, "job_base_clean", "part-*"))
+    rows = industry_rows(job_base_clean).persist(StorageLevel.MEMORY_AND_DISK)
+
+    if args.report:
+        partitions = int(spark.conf.get("spark.sql.shuffle.partitions"))
+        for keys in [INDUSTRY_KEYS, LOCATION_KEYS]:
+            hot = hot_keys(rows, keys, args.hot_share)
+            print(skew_report(rows, keys, partitions, hot, args.salts))
+
+    for name, df in industry_tables(rows, args.skew, args.salts, args.hot_share).items():
+        if args.format == "parquet":
+            df.write.mode("overwrite").parquet(str(store_dir.joinpath(name).resolve()).replace("\\", "/"))
+        elif name == "industry_province_titles":
+            _write_multistorage(df, output_dir.joinpath(name), "location_slug")
+        else:
+            write_pig_tsv(df, str(output_dir.joinpath(name).resolve()).replace("\\", "/"))
+        print(f"wrote {name}")
+
+    rows.unpersist()
+    spark.stop()
+
+
+if __name__ == "__main__":
+    main()
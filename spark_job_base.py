@@ -0,0 +1,233 @@
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+from pathlib import Path
+
+from pyspark import StorageLevel
+from pyspark.sql import DataFrame, SparkSession, functions as F, types as T
+
+from spark_explore_output import JOB_BASE_CLEAN_SCHEMA, _file_glob
+
+
+# (JSON key in the VietnamWorks crawl, column name used by the Pig scripts)
+JOB_FIELDS = [
+    ("Tên công việc", "raw_title"),
+    ("Ngành nghề", "raw_ind"),
+    ("Lĩnh vực", "raw_sec"),
+    ("Địa điểm", "raw_loc"),
+    ("Số năm kinh nghiệm", "raw_exp"),
+    ("Yêu cầu công việc", "raw_req"),
+    ("Kỹ năng", "raw_skill"),
+    ("Trình độ học vấn", "raw_edu"),
+    ("Loại hình làm việc", "raw_type"),
+]
+
+JOB_BASE_COLUMNS = ["mahout_id"] + [name for _, name in JOB_FIELDS]
+
+
+def read_jobs_jsonl(
+    spark: SparkSession, path: str, extra_fields: list[tuple[str, str]] = ()
+) -> DataFrame:
+    """Parse the crawl JSONL once into the nine job_explore_base.pig fields.
+
+    Port of the nine `REGEX_EXTRACT(line, '.*"<key>"...')` calls: each line
+    is BOM-stripped and parsed a single time by from_json with a fixed
+    schema; keys not in the schema are skipped by the parser. Embedded tabs
+    and newlines are flattened to spaces so the PigStorage handoff keeps
+    exactly ten columns. `extra_fields` adds more (JSON key, column) pairs.
+    """
+    fields = list(JOB_FIELDS) + list(extra_fields)
+    schema = T.StructType([T.StructField(key, T.StringType(), True) for key, _ in fields])
+
+    lines = spark.read.text(path).select(
+        F.regexp_replace(F.col("value"), "\ufeff", "").alias("line")
+    )
+    parsed = lines.select(F.from_json(F.col("line"), schema).alias("j"))
+
+    return parsed.select(
+        *[
+            F.regexp_replace(F.col("j").getField(key), r"[\t\r\n]+", " ").alias(name)
+            for key, name in fields
+        ]
+    )
+
+
+def assign_dense_ids(df: DataFrame, col_name: str = "mahout_id") -> DataFrame:
+    """Assign 1..N ids in input order without a single-reducer RANK.
+
+    monotonically_increasing_id() encodes (partition_id << 33) + row_in_partition.
+    One small aggregation counts the rows per partition of `df`, the driver
+    turns the counts into offsets, and a broadcast join makes the ids dense
+    on a fresh projection of `df`. Nothing is cached, so `df` must compute
+    to the same partitions every time: file scans and narrow transforms
+    (file order, then line order, like Pig's RANK without BY), not the
+    output of a shuffle.
+    """
+    spark = df.sparkSession
+    counts = sorted(
+        (r["_pid"], r["count"])
+        for r in df.groupBy(F.spark_partition_id().alias("_pid")).count().collect()
+    )
+    offsets, running = [], 0
+    for pid, n in counts:
+        offsets.append((pid, running))
+        running += n
+
+    offset_df = spark.createDataFrame(
+        offsets,
+        schema=T.StructType(
+            [
+                T.StructField("_pid", T.IntegerType(), False),
+                T.StructField("_offset", T.LongType(), False),
+            ]
+        ),
+    )
+
+    tagged = df.withColumn("_pid", F.spark_partition_id()).withColumn("_mid", F.monotonically_increasing_id())
+    row_in_partition = F.col("_mid") - F.shiftleft(F.col("_pid").cast("long"), 33)
+    return (
+        tagged.join(F.broadcast(offset_df), on="_pid", how="inner")
+        .withColumn(col_name, F.col("_offset") + row_in_partition + F.lit(1))
+        .drop("_pid", "_mid", "_offset")
+    )
+
+
+def build_job_base_clean(spark: SparkSession, jsonl_path: str) -> DataFrame:
+    parsed = read_jobs_jsonl(spark, jsonl_path)
+    valid = parsed.where(
+        F.col("raw_title").isNotNull() & (F.trim(F.col("raw_title")) != "")
+    )
+    return assign_dense_ids(valid).select(*JOB_BASE_COLUMNS)
+
+
+def data_quality_stats(spark: SparkSession, report: dict) -> DataFrame:
+    """The Pig GROUP ALL report, taken from the data_profile.py report (no extra scan)."""
+    stats = report["data_quality_stats"]
+    return spark.createDataFrame(
+        [tuple(stats.values())],
+        "report_name string, total_jobs long, jobs_with_sector long, "
+        "jobs_with_skills long, jobs_with_requirement long",
+    )
+
+
+def write_pig_tsv(df: DataFrame, path: str) -> None:
+    """Write `df` like PigStorage('\\t'): no quoting, nulls as empty fields."""
+    line = F.concat_ws(
+        "\t", *[F.coalesce(F.col(c).cast("string"), F.lit("")) for c in df.columns]
+    )
+    df.select(line.alias("value")).write.mode("overwrite").text(path)
+
+
+def write_store_parquet(df: DataFrame, path: str) -> None:
+    """Write job_base_clean straight into the Parquet store layout.
+
+    Columns get the names spark_explore_output.py uses; `_ncols` is always
+    10 because nothing here goes through a tab split.
+    """
+    renamed = df.select(
+        *[
+            F.col(src).alias(dst.name)
+            for src, dst in zip(JOB_BASE_COLUMNS, JOB_BASE_CLEAN_SCHEMA.fields)
+        ],
+        F.lit(10).alias("_ncols"),
+    )
+    renamed.write.mode("overwrite").parquet(path)
+
+
+def main():
+    import data_profile
+    import job_dedup
+
+    parser = argparse.ArgumentParser(
+        description="Spark port of job_explore_base.pig (JSONL -> job_base_clean)"
+    )
+    parser.add_argument(
+        "--input",
+        default=str(Path(__file__).parent.joinpath("vietnamworks_detailed_jobs.jsonl")),
+        help="Crawl JSONL file or glob (default: ./vietnamworks_detailed_jobs.jsonl)",
+    )
+    parser.add_argument(
+        "--output-dir",
+        default=str(Path(__file__).parent.joinpath("output")),
+        help="Where job_base_clean/, data_quality_stats/ and data_profile.json are written (default: ./output)",
+    )
+    parser.add_argument(
+        "--format",
+        default="tsv",
+        choices=["tsv", "parquet"],
+        help="tsv: PigStorage part-* files; parquet: <output-dir>/store/job_base_clean",
+    )
+    parser.add_argument(
+        "--dedup",
+        action="store_true",
+        help="Drop reposts (MinHash + LSH, see job_dedup.py) before writing; "
+        "the dropped ids go to <output-dir>/job_duplicates",
+    )
+    parser.add_argument(
+        "--dedup-threshold",
+        type=float,
+        default=None,
+        help="Minimum estimated Jaccard of a repost (default: job_dedup.DEFAULT_THRESHOLD)",
+    )
+    args = parser.parse_args()
+    output_dir = Path(args.output_dir)
+
+    os.environ.setdefault("PYSPARK_PYTHON", sys.executable)
+    os.environ.setdefault("PYSPARK_DRIVER_PYTHON", sys.executable)
+
+    spark = (
+        SparkSession.builder.appName("recruitment-job-base")
+        .master("local[*]")
+        .config("spark.pyspark.python", sys.executable)
+        .config("spark.pyspark.driver.python", sys.executable)
+        .getOrCreate()
+    )
+    spark.sparkContext.setLogLevel("WARN")
+
+    input_path = str(Path(args.input).resolve()).replace("\\", "/")
+    job_base = build_job_base_clean(spark, input_path).persist(StorageLevel.MEMORY_AND_DISK)
+
+    if args.dedup:
+        # Before anything is written, so every downstream count sees one row per posting.
+        duplicates, dedup_stats = job_dedup.duplicate_map(
+            job_base, threshold=args.dedup_threshold or job_dedup.DEFAULT_THRESHOLD
+        )
+        print("\n== job_dedup ==")
+        print(job_dedup.format_stats(dedup_stats, job_base.count()))
+        write_pig_tsv(
+            spark.createDataFrame(duplicates, "job_id long, canonical_id long").coalesce(1),
+            str(output_dir.joinpath("job_duplicates").resolve()).replace("\\", "/"),
+        )
+        deduped = job_dedup.drop_duplicates(job_base, duplicates).persist(StorageLevel.MEMORY_AND_DISK)
+        job_base.unpersist()
+        job_base = deduped
+
+    if args.format == "parquet":
+        written = str(output_dir.joinpath("store", "job_base_clean").resolve()).replace("\\", "/")
+        write_store_parquet(job_base, written)
+        written_glob = _file_glob(written, "**", "*.parquet")
+    else:
+        written = str(output_dir.joinpath("job_base_clean").resolve()).replace("\\", "/")
+        write_pig_tsv(job_base, written)
+        written_glob = _file_glob(written, "part-*")
+
+    # One pass for data_quality_stats and the full profile, stamped with the
+    # files just written so spark_explore_output.py can reuse it.
+    report = data_profile.profile(job_base, data_profile.source_stamp(written_glob))
+    data_profile.write_report(report, output_dir.joinpath("data_profile.json"))
+    stats = data_quality_stats(spark, report)
+    print("\n== data_quality_stats ==")
+    stats.show(truncate=False)
+    write_pig_tsv(
+        stats.coalesce(1),
+        str(output_dir.joinpath("data_quality_stats").resolve()).replace("\\", "/"),
+    )
+
+    job_base.unpersist()
+    spark.stop()
+
+
+if __name__ == "__main__":
+    main()
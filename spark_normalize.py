@@ -0,0 +1,144 @@
+"""Spark column expressions porting the normalization rules of the Pig scripts.
+
+Each function mirrors one Pig block so Spark stages can reproduce the Pig
+outputs row for row:
+
+- pig_location.pig: diacritic stripping + the 63-province CASE chain
+  (rule tables live in location_normalizer.py)
+- pig_industry.pig / analysis.pig: industry segment, name and slug id
+- analysis.pig: experience / education / employment type buckets and the
+  skill / requirement TOKENIZE
+
+Pig `MATCHES` is a full match, so `'.*(a|b).*'` becomes an unanchored
+`rlike('a|b')` here.
+"""
+
+from __future__ import annotations
+
+from pyspark.sql import Column, functions as F
+
+from location_normalizer import (
+    COMBINING_MARKS,
+    DIACRITIC_RULES,
+    PROVINCE_IDS,
+    PROVINCE_RULES,
+    SEPARATOR_RULES,
+    UNKNOWN,
+)
+
+
+def location_clean(raw_loc: Column) -> Column:
+    """`loc_clean_norm` of pig_location.pig (NULL -> ''), as location_normalizer.fold."""
+    out = F.lower(F.coalesce(raw_loc, F.lit("")))
+    for pattern, repl in DIACRITIC_RULES + [(COMBINING_MARKS, "")] + SEPARATOR_RULES:
+        out = F.regexp_replace(out, pattern, repl)
+    return out
+
+
+def province_name(raw_loc: Column) -> Column:
+    """The `city` CASE chain of pig_location.pig."""
+    clean = location_clean(raw_loc)
+    out = F.when(clean == "", F.lit(UNKNOWN))
+    for city, pattern in PROVINCE_RULES:
+        out = out.when(clean.rlike(pattern), F.lit(city))
+    return out.otherwise(F.lit(UNKNOWN))
+
+
+def province_id(province: Column) -> Column:
+    return F.coalesce(
+        F.element_at(
+            F.create_map(*[F.lit(x) for kv in PROVINCE_IDS.items() for x in kv]), province
+        ),
+        F.lit(0),
+    )
+
+
+def _first_segment(col: Column, sep: str) -> Column:
+    # REGEX_EXTRACT(x, '([^<sep>]+).*', 1) guarded by MATCHES: a value that
+    # starts with the separator has no match and is kept unchanged.
+    return F.when(col.rlike(f"^[^{sep}]+"), F.regexp_extract(col, f"^([^{sep}]+)", 1)).otherwise(col)
+
+
+def industry_name(raw_ind: Column, *, hidden_is_unknown: bool = True) -> Column:
+    """Normalized industry name.
+
+    hidden_is_unknown=True follows pig_industry.pig (industry_total,
+    industry_by_location), where 'Không hiển thị' maps to UNKNOWN;
+    False follows analysis.pig (requirement tables), where it does not.
+    """
+    trimmed = F.trim(raw_ind)
+    missing = raw_ind.isNull() | (trimmed == "")
+    if hidden_is_unknown:
+        missing = missing | (raw_ind == "Không hiển thị")
+
+    seed = _first_segment(_first_segment(_first_segment(trimmed, "/"), ","), ">")
+    name = F.trim(F.regexp_replace(seed, r"\s+", " "))
+    return F.when(missing | (name == ""), F.lit(UNKNOWN)).otherwise(F.upper(name))
+
+
+def industry_id(name: Column) -> Column:
+    """`industry_id` slug of analysis.pig."""
+    slug = F.regexp_replace(F.regexp_replace(F.upper(F.trim(name)), r"\s+", "_"), "[^A-Z0-9_-]", "")
+    return F.when((name == UNKNOWN) | (slug == ""), F.lit(UNKNOWN)).otherwise(slug)
+
+
+def experience_bucket(raw_exp: Column) -> Column:
+    trimmed = F.trim(raw_exp)
+    exp_raw = F.when(raw_exp.isNull() | (trimmed == ""), F.lit(UNKNOWN)).otherwise(F.upper(trimmed))
+    digits = F.regexp_extract(F.coalesce(trimmed, F.lit("")), r"^(\d+)", 1)
+    return (
+        F.when(exp_raw.isin("KHÔNG YÊU CẦU", "KHÔNG HIỂN THỊ", UNKNOWN, "NULL"), F.lit("KHÔNG YÊU CẦU"))
+        .when(exp_raw.contains("DƯỚI 1 NĂM"), F.lit("DƯỚI 1 NĂM"))
+        .when(digits.rlike("^[123]$"), F.lit("1-3 NĂM"))
+        .when(digits.rlike("^[45]$"), F.lit("3-5 NĂM"))
+        .when(exp_raw.rlike(r"5\s*-\s*10"), F.lit("3-5 NĂM"))
+        .when(digits.rlike("^[6-9]$|^[1-9][0-9]+$"), F.lit("TRÊN 5 NĂM"))
+        .when(exp_raw.rlike(r"TRÊN\s*5"), F.lit("TRÊN 5 NĂM"))
+        .otherwise(exp_raw)
+    )
+
+
+def education_level(raw_edu: Column) -> Column:
+    trimmed = F.trim(raw_edu)
+    edu_raw = F.when(raw_edu.isNull() | (trimmed == ""), F.lit(UNKNOWN)).otherwise(F.upper(trimmed))
+    return (
+        F.when(edu_raw.isin("KHÔNG HIỂN THỊ", UNKNOWN, "KHÔNG GIỚI HẠN", "KHÁC"), F.lit("KHÔNG YÊU CẦU"))
+        .when(edu_raw == "TRUNG HỌC CƠ SỞ (CẤP 2) TRỞ LÊN", F.lit("THCS"))
+        .when(edu_raw.isin("TRUNG HỌC PHỔ THÔNG (CẤP 3) TRỞ LÊN", "TRUNG HỌC"), F.lit("THPT"))
+        .when(edu_raw.isin("ĐẠI HỌC TRỞ LÊN", "CỬ NHÂN"), F.lit("ĐẠI HỌC"))
+        .when(edu_raw.isin("CAO HỌC TRỞ LÊN", "THẠC SĨ"), F.lit("CAO HỌC"))
+        .when(edu_raw.isin("TRUNG CẤP", "TRUNG CẤP TRỞ LÊN"), F.lit("TRUNG CẤP"))
+        .otherwise(edu_raw)
+    )
+
+
+def employment_type(raw_type: Column) -> Column:
+    trimmed = F.trim(raw_type)
+    type_raw = F.when(raw_type.isNull() | (trimmed == ""), F.lit(UNKNOWN)).otherwise(F.upper(trimmed))
+    return (
+        F.when(
+            type_raw.isin("TOÀN THỜI GIAN CỐ ĐỊNH", "TOÀN THỜI GIAN", "TOÀN THỜI GIAN TẠM THỜI"),
+            F.lit("TOÀN THỜI GIAN"),
+        )
+        .when(type_raw == "BÁN THỜI GIAN", F.lit("BÁN THỜI GIAN"))
+        .when(type_raw.isin("THỜI VỤ", "HỢP ĐỒNG THỜI VỤ"), F.lit("THỜI VỤ / HỢP ĐỒNG"))
+        .when(type_raw == "THỰC TẬP", F.lit("THỰC TẬP"))
+        .when(type_raw.isin("KHÁC", "KHÔNG HIỂN THỊ", UNKNOWN), F.lit("KHÁC / KHÔNG HIỂN THỊ"))
+        .otherwise(type_raw)
+    )
+
+
+def tokens(raw: Column) -> Column:
+    """`TOKENIZE(UPPER(TRIM(raw)), '[,;/|]+')` of analysis.pig as an array.
+
+    Pig's TOKENIZE takes a set of delimiter *characters*, so '[', ']' and
+    '+' split too, and empty tokens are skipped. NULL/blank input yields
+    ['UNKNOWN']; whitespace-only tokens become 'UNKNOWN'. An input made only
+    of delimiters yields an empty array (FLATTEN drops the row in Pig).
+    """
+    trimmed = F.trim(raw)
+    parts = F.filter(F.split(F.upper(trimmed), r"[\[\],;/|+]+"), lambda t: t != "")
+    cleaned = F.transform(
+        parts, lambda t: F.when(F.trim(t) == "", F.lit(UNKNOWN)).otherwise(F.upper(F.trim(t)))
+    )
+    return F.when(raw.isNull() | (trimmed == ""), F.array(F.lit(UNKNOWN))).otherwise(cleaned)
@@ -0,0 +1,208 @@
+"""Spark port of analysis.pig as a single aggregation stage.
+
+analysis.pig builds exp_total, edu_total, type_total, skill_total and
+req_total with five JOIN-with-industry_lookup + GROUP pipelines over the
+same job_clean relation. Here the industry is computed once per job (it
+comes from the same row, so no join is needed), every requirement
+dimension is exploded into one long (industry_code, industry, dimension,
+value) layout, and a single GROUPING SETS aggregation produces both the
+per-industry tables and the global per-value totals used by the viz step.
+The result is then split back into the usual outputs.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+from pathlib import Path
+
+from pyspark import StorageLevel
+from pyspark.sql import DataFrame, SparkSession, functions as F
+
+import spark_normalize as norm
+import spark_vocab
+from spark_explore_output import (
+    JOB_BASE_CLEAN_SCHEMA,
+    REQUIREMENT_TABLES,
+    _file_glob,
+    load_job_base_clean,
+)
+from spark_job_base import JOB_BASE_COLUMNS, write_pig_tsv
+
+
+# requirement_analysis/<table> -> dimension / label column (req_total included)
+REQUIREMENT_DIMENSIONS = {**REQUIREMENT_TABLES, "req_total": "requirement"}
+
+# analysis.pig column name -> job_base_clean column as loaded by spark_explore_output
+_PIG_COLUMNS = dict(zip(JOB_BASE_COLUMNS, JOB_BASE_CLEAN_SCHEMA.fieldNames()))
+
+
+def _pig(name: str) -> F.Column:
+    return F.col(_PIG_COLUMNS[name])
+
+
+def _pairs(dimension: str, values: F.Column) -> F.Column:
+    return F.transform(
+        values, lambda v: F.struct(F.lit(dimension).alias("dimension"), v.alias("value"))
+    )
+
+
+def requirement_long(job_base_clean: DataFrame) -> DataFrame:
+    """One row per (job, dimension, value) with the job's industry attached."""
+    industry = norm.industry_name(_pig("raw_ind"), hidden_is_unknown=False)
+    pairs = F.concat(
+        _pairs("experience", F.array(norm.experience_bucket(_pig("raw_exp")))),
+        _pairs("education", F.array(norm.education_level(_pig("raw_edu")))),
+        _pairs("employment_type", F.array(norm.employment_type(_pig("raw_type")))),
+        _pairs("skill", norm.tokens(_pig("raw_skill"))),
+        _pairs("requirement", norm.tokens(_pig("raw_req"))),
+    )
+    return job_base_clean.select(
+        norm.industry_id(industry).alias("industry_code"),
+        industry.alias("industry"),
+        F.explode(pairs).alias("p"),
+    ).select("industry_code", "industry", "p.dimension", "p.value")
+
+
+def requirement_cube(
+    job_base_clean: DataFrame,
+    industry_codes: list[str] | None = None,
+    vocab: DataFrame | None = None,
+) -> DataFrame:
+    """Per-industry and global counts of every requirement value, one shuffle.
+
+    Columns: industry_code, industry, dimension, value, job_count, is_global.
+    Global rows (is_global = 1) have null industry columns. With
+    `industry_codes` both levels only count those industries, like the
+    --industry-code filter on the Pig tables.
+
+    With `vocab` (see spark_vocab.extend_vocabulary, it must cover every
+    value) the aggregation groups on the int token_id and the text is
+    joined back afterwards; the result then also carries token_id.
+    """
+    long = requirement_long(job_base_clean)
+    if industry_codes:
+        long = long.where(F.col("industry_code").isin(industry_codes))
+    keys = ["dimension", "value"]
+    if vocab is not None:
+        long = spark_vocab.encode(long, vocab)
+        keys = ["token_id"]
+
+    view = f"requirement_long_{id(long)}"
+    long.createOrReplaceTempView(view)
+    cube = long.sparkSession.sql(
+        f"""
+        SELECT industry_code, industry, {", ".join(keys)},
+               COUNT(1) AS job_count,
+               GROUPING(industry_code) AS is_global
+        FROM {view}
+        GROUP BY {", ".join(keys)}, industry_code, industry
+        GROUPING SETS (({", ".join(keys)}, industry_code, industry), ({", ".join(keys)}))
+        """
+    )
+    if vocab is not None:
+        cube = spark_vocab.decode(cube, vocab)
+    return cube
+
+
+def split_requirement_tables(cube: DataFrame) -> dict[str, DataFrame]:
+    """The analysis.pig outputs: (industry_code, industry, <label>, job_count)."""
+    per_industry = cube.where(F.col("is_global") == 0)
+    return {
+        name: per_industry.where(F.col("dimension") == label).select(
+            "industry_code", "industry", F.col("value").alias(label), "job_count"
+        )
+        for name, label in REQUIREMENT_DIMENSIONS.items()
+    }
+
+
+def split_requirement_totals(cube: DataFrame) -> dict[str, DataFrame]:
+    """Global totals per value: (<label>, job_count), keyed like the tables."""
+    overall = cube.where(F.col("is_global") == 1)
+    return {
+        name: overall.where(F.col("dimension") == label).select(
+            F.col("value").alias(label), "job_count"
+        )
+        for name, label in REQUIREMENT_DIMENSIONS.items()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Spark port of analysis.pig (job_base_clean -> requirement_analysis/*)"
+    )
+    parser.add_argument(
+        "--output-dir",
+        default=str(Path(__file__).parent.joinpath("output")),
+        help="Folder with job_base_clean/; requirement_analysis/ is written here (default: ./output)",
+    )
+    parser.add_argument(
+        "--input-format",
+        default="tsv",
+        choices=["tsv", "parquet"],
+        help="Read job_base_clean from the Pig part-* files or the Parquet store",
+    )
+    parser.add_argument(
+        "--format",
+        default="tsv",
+        choices=["tsv", "parquet"],
+        help="tsv: PigStorage part-* files; parquet: <output-dir>/store/requirement_analysis",
+    )
+    args = parser.parse_args()
+    output_dir = Path(args.output_dir)
+    store_dir = output_dir.joinpath("store")
+
+    os.environ.setdefault("PYSPARK_PYTHON", sys.executable)
+    os.environ.setdefault("PYSPARK_DRIVER_PYTHON", sys.executable)
+
+    spark = (
+        SparkSession.builder.appName("recruitment-requirements")
+        .master("local[*]")
+        .config("spark.pyspark.python", sys.executable)
+        .config("spark.pyspark.driver.python", sys.executable)
+        .config("spark.sql.execution.arrow.pyspark.enabled", "true")
+        .getOrCreate()
+    )
+    spark.sparkContext.setLogLevel("WARN")
+
+    if args.input_format == "parquet":
+        job_base_clean = spark.read.parquet(_file_glob(store_dir, "job_base_clean"))
+    else:
+        job_base_clean = load_job_base_clean(
+            spark, _file_glob(output_dir, "job_base_clean", "part-*")
+        )
+
+    job_base_clean = job_base_clean.persist(StorageLevel.MEMORY_AND_DISK)
+    vocab_path = store_dir.joinpath("vocab")
+    vocab = spark_vocab.extend_vocabulary(
+        requirement_long(job_base_clean), spark_vocab.load_vocabulary(spark, vocab_path)
+    ).persist(StorageLevel.MEMORY_AND_DISK)
+
+    cube = requirement_cube(job_base_clean, vocab=vocab).persist(StorageLevel.MEMORY_AND_DISK)
+    for name, df in split_requirement_tables(cube).items():
+        label = REQUIREMENT_DIMENSIONS[name]
+        if args.format == "parquet":
+            df.write.mode("overwrite").partitionBy("industry_code").parquet(
+                str(store_dir.joinpath("requirement_analysis", name).resolve()).replace("\\", "/")
+            )
+        else:
+            write_pig_tsv(
+                df.orderBy(F.asc("industry_code"), F.asc(label)),
+                str(output_dir.joinpath("requirement_analysis", name).resolve()).replace("\\", "/"),
+            )
+        print(f"wrote requirement_analysis/{name}")
+
+    n_tokens = vocab.count()
+    totals = cube.where(F.col("is_global") == 1).select("token_id", "job_count")
+    spark_vocab.write_vocabulary(spark_vocab.with_frequency(vocab, totals), vocab_path)
+    print(f"vocabulary: {n_tokens} tokens in {vocab_path}")
+
+    cube.unpersist()
+    vocab.unpersist()
+    job_base_clean.unpersist()
+    spark.stop()
+
+
+if __name__ == "__main__":
+    main()
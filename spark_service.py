@@ -0,0 +1,335 @@
+"""Long-lived Spark driver for re-exporting the viz tables.
+
+`spark_explore_output.py --export` starts a JVM, a SparkSession and the
+Python workers, reads the Pig outputs and stops again; for the small viz
+tables that startup is most of the runtime. `serve` keeps one SparkSession
+warm and answers export requests over local HTTP:
+
+- the loaded inputs of an output folder are persisted and reused by later
+  requests, and reloaded when a file under the input folders changes;
+  with requirements=job_base the requirement cube is cached on top of
+  them and rebuilt when the store's vocabulary changes or spark_normalize
+  / location_normalizer is re-imported
+- spark_explore_output / spark_normalize / location_normalizer are
+  re-imported when their source changed, so edits to filters such as
+  `_is_irrelevant_category` apply to the next request without a restart
+
+Every request reports its latency and whether the inputs were cold
+(loaded and cached by this request) or warm.
+
+Usage:
+    python spark_service.py serve --port 8765
+    python spark_service.py export --output-dir output
+    python spark_service.py export --output-dir output --requirements job_base --industry-code IT
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import importlib
+import json
+import os
+import sys
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from pathlib import Path
+
+from pyspark import StorageLevel
+from pyspark.sql import SparkSession
+
+import location_normalizer
+import spark_explore_output
+import spark_normalize
+
+
+DEFAULT_PORT = 8765
+
+# Reloaded in this order (dependencies first) when their file changed.
+_RELOADABLE = [location_normalizer, spark_normalize, spark_explore_output]
+
+_PIG_INPUTS = ["industry_total", "industry_by_location", "job_base_clean", "requirement_analysis"]
+
+
+# The requirement cube of requirements=job_base normalizes with these.
+_CUBE_MODULES = [location_normalizer, spark_normalize]
+
+
+def _input_stamp(output_dir: Path, input_format: str, store_dir: Path) -> str:
+    """Hash of (path, size, mtime) of every input file; changes when Pig reruns."""
+    roots = [store_dir] if input_format == "parquet" else [output_dir.joinpath(d) for d in _PIG_INPUTS]
+    return _tree_stamp(roots)
+
+
+def _tree_stamp(roots: list[Path]) -> str:
+    h = hashlib.sha256()
+    for root in roots:
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames.sort()
+            for name in sorted(filenames):
+                if name.startswith((".", "_")):
+                    continue
+                st = os.stat(os.path.join(dirpath, name))
+                h.update(f"{dirpath}/{name}\0{st.st_size}\0{st.st_mtime_ns}\n".encode("utf-8"))
+    return h.hexdigest()
+
+
+class ExportService:
+    def __init__(self, spark: SparkSession, storage_level: StorageLevel = StorageLevel.MEMORY_AND_DISK) -> None:
+        self.spark = spark
+        self.storage_level = storage_level
+        self._cache: dict[tuple, dict] = {}
+        self._mtimes = {m.__name__: Path(m.__file__).stat().st_mtime_ns for m in _RELOADABLE}
+
+    def reload_changed(self) -> list[str]:
+        """Re-import the changed modules, and everything after them in _RELOADABLE."""
+        changed = [m for m in _RELOADABLE if Path(m.__file__).stat().st_mtime_ns != self._mtimes[m.__name__]]
+        if not changed:
+            return []
+        reloaded = _RELOADABLE[_RELOADABLE.index(changed[0]) :]
+        for module in reloaded:
+            importlib.reload(module)
+            self._mtimes[module.__name__] = Path(module.__file__).stat().st_mtime_ns
+        return [m.__name__ for m in reloaded]
+
+    def _inputs(self, output_dir: Path, input_format: str, store_dir: Path, industry_codes, requirements: str):
+        """(inputs, requirement_totals, warm) from the cache, loading on a miss."""
+        seo = spark_explore_output
+        key = (str(output_dir), input_format, str(store_dir), tuple(industry_codes or ()))
+        stamp = _input_stamp(output_dir, input_format, store_dir)
+        entry = self._cache.get(key)
+        warm = bool(entry) and entry["stamp"] == stamp
+        if not warm:
+            if entry:
+                self._drop(entry)
+            ledger = seo._ScanLedger(self.storage_level)
+            inputs = seo.load_inputs(self.spark, output_dir, input_format, store_dir, industry_codes=industry_codes)
+            for name, df in inputs.items():
+                inputs[name] = ledger.persist(ledger.source(df))
+            entry = self._cache[key] = {"stamp": stamp, "inputs": inputs, "ledger": ledger, "job_base": None}
+        if requirements != "job_base":
+            return dict(entry["inputs"]), None, warm
+
+        # Only the cube depends on the normalizers (filters such as
+        # _is_irrelevant_category run later, in build_viz_tables).
+        cube_stamp = (
+            _tree_stamp([store_dir.joinpath("vocab")]),
+            [self._mtimes[m.__name__] for m in _CUBE_MODULES],
+        )
+        cached = entry["job_base"]
+        if cached and cached["stamp"] == cube_stamp:
+            return dict(cached["inputs"]), cached["totals"], warm
+        if cached:
+            cached["ledger"].unpersist_all(keep=entry["inputs"].values())
+        ledger = seo._ScanLedger(self.storage_level)
+        inputs = dict(entry["inputs"])
+        totals = seo.requirements_from_job_base(self.spark, inputs, store_dir, ledger, industry_codes=industry_codes)
+        entry["job_base"] = {"stamp": cube_stamp, "inputs": dict(inputs), "totals": totals, "ledger": ledger}
+        return inputs, totals, False
+
+    @staticmethod
+    def _drop(entry: dict) -> None:
+        if entry["job_base"]:
+            entry["job_base"]["ledger"].unpersist_all(keep=entry["inputs"].values())
+        entry["ledger"].unpersist_all()
+
+    def export(
+        self,
+        output_dir: str,
+        export_dir: str | None = None,
+        export_format: str = "csv",
+        input_format: str = "tsv",
+        store_dir: str | None = None,
+        industry_code: list[str] | None = None,
+        requirements: str = "pig",
+    ) -> dict:
+        t0 = time.perf_counter()
+        reloaded = self.reload_changed()
+        out = Path(output_dir).resolve()
+        store = Path(store_dir).resolve() if store_dir else out.joinpath("store")
+        target = Path(export_dir).resolve() if export_dir else out.joinpath("viz")
+
+        inputs, totals, warm = self._inputs(out, input_format, store, industry_code, requirements)
+        viz = spark_explore_output.build_viz_tables(inputs, requirement_totals=totals)
+        manifest = spark_explore_output.export_viz_tables(self.spark, viz, target, export_format)
+        return {
+            "export_dir": str(target),
+            "tables": sorted(viz),
+            "rows": {name: out["rows"] for name, out in manifest["outputs"].items()},
+            "inputs": "warm" if warm else "cold",
+            "reloaded": reloaded,
+            "seconds": round(time.perf_counter() - t0, 3),
+        }
+
+    def invalidate(self) -> int:
+        for entry in self._cache.values():
+            self._drop(entry)
+        n = len(self._cache)
+        self._cache.clear()
+        return n
+
+    def status(self) -> dict:
+        return {"cached": [list(k) for k in self._cache], "app_id": self.spark.sparkContext.applicationId}
+
+
+def _handler(service: ExportService):
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self, code: int, body: dict) -> None:
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == "/status":
+                self._reply(200, service.status())
+            else:
+                self._reply(404, {"error": f"unknown path {self.path}"})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            try:
+                request = json.loads(self.rfile.read(length) or b"{}")
+                if self.path == "/export":
+                    result = service.export(**request)
+                    print(
+                        f"export {request.get('output_dir')}: {result['seconds']:.2f}s "
+                        f"({result['inputs']} inputs{', reloaded ' + ', '.join(result['reloaded']) if result['reloaded'] else ''})",
+                        flush=True,
+                    )
+                    self._reply(200, result)
+                elif self.path == "/invalidate":
+                    self._reply(200, {"dropped": service.invalidate()})
+                elif self.path == "/shutdown":
+                    self._reply(200, {"stopping": True})
+                    self.server.stopping = True
+                else:
+                    self._reply(404, {"error": f"unknown path {self.path}"})
+            except Exception as e:  # noqa: BLE001 - the service keeps running
+                self._reply(500, {"error": f"{type(e).__name__}: {e}"})
+
+        def log_message(self, format, *args):  # noqa: A002 - BaseHTTPRequestHandler signature
+            pass
+
+    return Handler
+
+
+def serve(host: str, port: int, shuffle_partitions: int = 8) -> None:
+    os.environ.setdefault("PYSPARK_PYTHON", sys.executable)
+    os.environ.setdefault("PYSPARK_DRIVER_PYTHON", sys.executable)
+
+    t0 = time.perf_counter()
+    spark = (
+        SparkSession.builder.appName("recruitment-export-service")
+        .master("local[*]")
+        .config("spark.pyspark.python", sys.executable)
+        .config("spark.pyspark.driver.python", sys.executable)
+        .config("spark.sql.execution.arrow.pyspark.enabled", "true")
+        # The viz tables are small: few shuffle partitions, and let AQE
+        # coalesce them on top of the cached inputs too.
+        .config("spark.sql.shuffle.partitions", str(shuffle_partitions))
+        .config("spark.sql.optimizer.canChangeCachedPlanOutputPartitioning", "true")
+        .config("spark.ui.showConsoleProgress", "false")
+        # export_viz_tables runs the tables of one request concurrently.
+        .config("spark.scheduler.mode", "FAIR")
+        .getOrCreate()
+    )
+    spark.sparkContext.setLogLevel("WARN")
+    spark.range(1).count()
+    print(f"SparkSession ready in {time.perf_counter() - t0:.1f}s; listening on http://{host}:{port}", flush=True)
+
+    # Requests are handled one at a time, so the session is never shared.
+    server = HTTPServer((host, port), _handler(ExportService(spark)))
+    server.stopping = False
+    try:
+        while not server.stopping:
+            server.handle_request()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        spark.stop()
+
+
+def _post(url: str, body: dict) -> dict:
+    req = urllib.request.Request(
+        url, data=json.dumps(body).encode("utf-8"), headers={"Content-Type": "application/json"}
+    )
+    try:
+        with urllib.request.urlopen(req) as resp:
+            return json.load(resp)
+    except urllib.error.HTTPError as e:
+        return json.load(e)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Warm Spark driver for viz re-exports")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_serve = sub.add_parser("serve", help="Start the service (Ctrl+C or `stop` to quit)")
+    p_serve.add_argument(
+        "--shuffle-partitions",
+        type=int,
+        default=8,
+        help="spark.sql.shuffle.partitions for the session (default: 8)",
+    )
+
+    p_export = sub.add_parser("export", help="Ask the service to re-export the viz tables")
+    p_export.add_argument(
+        "--output-dir",
+        default=str(Path(__file__).parent.joinpath("output")),
+        help="Path to the Pig output folder (default: ./output)",
+    )
+    p_export.add_argument("--export-dir", default=None, help="Default: <output-dir>/viz")
+    p_export.add_argument("--export-format", default="csv", choices=["csv", "parquet"])
+    p_export.add_argument("--input-format", default="tsv", choices=["tsv", "parquet"])
+    p_export.add_argument("--store-dir", default=None)
+    p_export.add_argument("--industry-code", action="append", default=None)
+    p_export.add_argument("--requirements", default="pig", choices=["pig", "job_base"])
+
+    sub.add_parser("invalidate", help="Drop the cached inputs")
+    sub.add_parser("stop", help="Stop the service")
+
+    args = parser.parse_args()
+    if args.command == "serve":
+        serve(args.host, args.port, args.shuffle_partitions)
+        return
+
+    base = f"http://{args.host}:{args.port}"
+    body = {}
+    if args.command == "export":
+        body = {
+            "output_dir": str(Path(args.output_dir).resolve()),
+            "export_dir": args.export_dir and str(Path(args.export_dir).resolve()),
+            "export_format": args.export_format,
+            "input_format": args.input_format,
+            "store_dir": args.store_dir and str(Path(args.store_dir).resolve()),
+            "industry_code": args.industry_code,
+            "requirements": args.requirements,
+        }
+    path = {"export": "/export", "invalidate": "/invalidate", "stop": "/shutdown"}[args.command]
+
+    t0 = time.perf_counter()
+    try:
+        result = _post(base + path, body)
+    except urllib.error.URLError as e:
+        raise SystemExit(f"no service at {base} ({e.reason}); start it with `python spark_service.py serve`")
+    if "error" in result:
+        raise SystemExit(result["error"])
+    if args.command == "export":
+        print(
+            f"exported {len(result['tables'])} tables to {result['export_dir']} in {time.perf_counter() - t0:.2f}s "
+            f"({result['inputs']} inputs)"
+        )
+    else:
+        print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
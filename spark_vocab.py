@@ -0,0 +1,91 @@
+"""Integer vocabulary for the requirement tokens.
+
+Every normalized requirement value (experience bucket, education level,
+employment type, skill token, requirement token) gets a dense int32
+`token_id`, unique across dimensions, with its current frequency kept
+alongside. The vocabulary is persisted in the Parquet store
+(<store>/vocab) and only grows: known tokens keep their id between runs,
+new tokens are appended after the current maximum. Aggregations group on
+the ids and decode to text only when the tables are split or exported.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+from pyspark.sql import DataFrame, SparkSession, functions as F, types as T
+
+from local_io import write_swap
+
+
+VOCAB_SCHEMA = T.StructType(
+    [
+        T.StructField("token_id", T.IntegerType(), False),
+        T.StructField("dimension", T.StringType(), False),
+        T.StructField("token", T.StringType(), True),
+        T.StructField("frequency", T.LongType(), False),
+    ]
+)
+
+
+def load_vocabulary(spark: SparkSession, path: Path) -> DataFrame | None:
+    if not path.exists():
+        return None
+    return spark.read.parquet(str(path.resolve()).replace("\\", "/"))
+
+
+def extend_vocabulary(long: DataFrame, vocab: DataFrame | None) -> DataFrame:
+    """Vocabulary covering every (dimension, value) of `long`.
+
+    Unseen tokens are numbered after the current maximum id, in
+    (dimension, token) order; their frequency is 0 until with_frequency().
+    On a first build that is every distinct token, so they are numbered by
+    a range-partitioned sort plus zipWithIndex over the same RDD (its sort
+    output is reused by both jobs), not a single-partition window
+    (assign_dense_ids needs partitions that recompute identically, which
+    a distinct / sort does not guarantee).
+    """
+    seen = long.select("dimension", F.col("value").alias("token")).distinct()
+    start = 0
+    if vocab is not None:
+        seen = seen.join(vocab.select("dimension", "token"), on=["dimension", "token"], how="left_anti")
+        start = vocab.agg(F.max("token_id")).first()[0] or 0
+
+    ordered = seen.orderBy("dimension", "token").rdd.zipWithIndex()
+    new = long.sparkSession.createDataFrame(
+        ordered.map(lambda pair: (start + pair[1] + 1, pair[0]["dimension"], pair[0]["token"], 0)),
+        VOCAB_SCHEMA,
+    )
+    if vocab is None:
+        return new
+    return vocab.select(*VOCAB_SCHEMA.fieldNames()).unionByName(new)
+
+
+def encode(df: DataFrame, vocab: DataFrame) -> DataFrame:
+    """Replace (dimension, value) by token_id; the vocabulary must cover `df`."""
+    ids = F.broadcast(vocab.select("token_id", "dimension", F.col("token").alias("value")))
+    return df.join(ids, on=["dimension", "value"], how="inner").drop("dimension", "value")
+
+
+def decode(df: DataFrame, vocab: DataFrame) -> DataFrame:
+    """Add dimension / value back from token_id."""
+    names = F.broadcast(vocab.select("token_id", "dimension", F.col("token").alias("value")))
+    return df.join(names, on="token_id", how="left")
+
+
+def with_frequency(vocab: DataFrame, counts: DataFrame) -> DataFrame:
+    """Set frequency from (token_id, job_count); tokens absent from `counts` get 0."""
+    return (
+        vocab.drop("frequency")
+        .join(counts.select("token_id", F.col("job_count").alias("frequency")), on="token_id", how="left")
+        .select(
+            "token_id",
+            "dimension",
+            "token",
+            F.coalesce(F.col("frequency"), F.lit(0)).cast("long").alias("frequency"),
+        )
+    )
+
+
+def write_vocabulary(vocab: DataFrame, path: Path) -> None:
+    write_swap(vocab.orderBy("token_id").coalesce(1), path)
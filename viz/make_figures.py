@@ -1,25 +1,39 @@
 from __future__ import annotations
 
+import argparse
+import hashlib
+import io
+import json
+import os
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
-import matplotlib.pyplot as plt
+import matplotlib
+
+matplotlib.use("Agg")  # Files only; also safe in pool workers without a display.
+
+import matplotlib.pyplot as plt  # noqa: E402
+import numpy as np
 import pandas as pd
-import seaborn as sns
+import seaborn as sns  # noqa: E402
 
 
 ROOT = Path(__file__).resolve().parents[1]
 VIZ_DIR = ROOT / "output" / "viz"
 FIG_DIR = ROOT / "output" / "figures"
+CACHE_FILE = ".figure_cache.json"
+DPI = 200
 
 
 def _read_csv(path: Path) -> pd.DataFrame:
     return pd.read_csv(path, encoding="utf-8")
 
 
-def _save(fig: plt.Figure, out: Path) -> None:
+def _save(fig: plt.Figure, out: Path, dpi: int = DPI) -> None:
     out.parent.mkdir(parents=True, exist_ok=True)
-    fig.savefig(out, dpi=200, bbox_inches="tight")
+    fig.savefig(out, dpi=dpi, bbox_inches="tight")
     plt.close(fig)
 
 
@@ -54,116 +68,380 @@ def _bar(df: pd.DataFrame, label_col: str, value_col: str, *, title: str) -> plt
     return fig
 
 
-def _heatmap_share(df: pd.DataFrame, *, top_provinces: int = 25, top_industries: int = 20) -> plt.Figure:
-    # Expect columns: province, industry, job_count, province_job_count, share
-    df = df.copy()
-    for c in ["job_count", "province_job_count", "share"]:
-        if c in df.columns:
-            df[c] = pd.to_numeric(df[c], errors="coerce")
-
-    # Choose top provinces by province_total and top industries by total job_count
-    top_prov = (
-        df[["province", "province_job_count"]]
-        .dropna()
-        .drop_duplicates()
-        .sort_values("province_job_count", ascending=False)
-        .head(top_provinces)["province"]
-    )
-
-    top_ind = (
-        df.groupby("industry", as_index=False)["job_count"].sum()
-        .sort_values("job_count", ascending=False)
-        .head(top_industries)["industry"]
-    )
+def share_matrix(
+    df: pd.DataFrame, *, top_provinces: int | None = 25, top_industries: int | None = 20
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(matrix, provinces, industries): the province × industry share as a dense float array.
 
-    sub = df[df["province"].isin(top_prov) & df["industry"].isin(top_ind)].copy()
-    pivot = sub.pivot_table(index="province", columns="industry", values="share", aggfunc="sum", fill_value=0.0)
-
-    # Order provinces by total descending
-    prov_order = (
-        df[["province", "province_job_count"]]
-        .drop_duplicates()
-        .set_index("province")
-        .loc[pivot.index]["province_job_count"]
-        .sort_values(ascending=False)
-        .index
+    Provinces are ordered by province_job_count (descending), industries by
+    name, like the pivot the heatmap used to build; `None` keeps them all.
+    Duplicate (province, industry) rows add up; a province or industry
+    without a cell in the other's top-N is dropped.
+    """
+    # Expect columns: province, industry, job_count, province_job_count, share
+    prov_codes, provinces = pd.factorize(df["province"])
+    ind_codes, industries = pd.factorize(df["industry"])
+    share = pd.to_numeric(df["share"], errors="coerce").to_numpy(dtype=float)
+    job_count = pd.to_numeric(df["job_count"], errors="coerce").to_numpy(dtype=float)
+    prov_total = pd.to_numeric(df["province_job_count"], errors="coerce").to_numpy(dtype=float)
+
+    ok = (prov_codes >= 0) & (ind_codes >= 0)
+    prov_codes, ind_codes = prov_codes[ok], ind_codes[ok]
+    share, job_count, prov_total = share[ok], job_count[ok], prov_total[ok]
+
+    # Top provinces by province_total and top industries by total job_count.
+    # Both go through pandas' default sort from the order the pivot saw them
+    # in (provinces by appearance, then by name for display; industries by
+    # name), so tied totals come out as they did.
+    totals = np.full(len(provinces), -np.inf)
+    np.fmax.at(totals, prov_codes, prov_total)
+    finite = np.flatnonzero(np.isfinite(totals))
+    prov_rank = pd.Series(totals[finite], index=finite).sort_values(ascending=False).index.to_numpy()[:top_provinces]
+    ind_totals = np.bincount(ind_codes, weights=np.nan_to_num(job_count), minlength=len(industries))
+    by_name = np.argsort(np.asarray(industries).astype(str), kind="stable")
+    ind_rank = by_name[pd.Series(ind_totals[by_name]).sort_values(ascending=False).index.to_numpy()[:top_industries]]
+    ind_rank = ind_rank[np.argsort(np.asarray(industries)[ind_rank].astype(str), kind="stable")]
+
+    row = np.full(len(provinces), -1)
+    row[prov_rank] = np.arange(len(prov_rank))
+    col = np.full(len(industries), -1)
+    col[ind_rank] = np.arange(len(ind_rank))
+    r, c = row[prov_codes], col[ind_codes]
+    keep = (r >= 0) & (c >= 0)
+    matrix = np.zeros((len(prov_rank), len(ind_rank)))
+    np.add.at(matrix, (r[keep], c[keep]), np.nan_to_num(share[keep]))
+    # Provinces without a single cell among the top industries drop out, and
+    # industries without a cell among the top provinces, as in the pivot.
+    present = np.zeros(len(prov_rank), dtype=bool)
+    present[r[keep]] = True
+    filled = np.zeros(len(ind_rank), dtype=bool)
+    filled[c[keep]] = True
+    shown = prov_rank[present]
+    shown = shown[np.argsort(np.asarray(provinces)[shown].astype(str), kind="stable")]
+    shown = shown[pd.Series(totals[shown]).sort_values(ascending=False).index.to_numpy()]
+    return matrix[row[shown]][:, filled], np.asarray(provinces)[shown], np.asarray(industries)[ind_rank[filled]]
+
+
+def downsample(matrix: np.ndarray, max_rows: int, max_cols: int) -> tuple[np.ndarray, int, int]:
+    """(matrix, row step, column step): block means over at most max_rows × max_cols blocks."""
+    fy = -(-matrix.shape[0] // max_rows) if matrix.shape[0] > max_rows else 1
+    fx = -(-matrix.shape[1] // max_cols) if matrix.shape[1] > max_cols else 1
+    if fy == fx == 1:
+        return matrix, 1, 1
+    rows = np.arange(0, matrix.shape[0], fy)
+    cols = np.arange(0, matrix.shape[1], fx)
+    sums = np.add.reduceat(np.add.reduceat(matrix, rows, axis=0), cols, axis=1)
+    sizes = np.outer(np.diff(np.append(rows, matrix.shape[0])), np.diff(np.append(cols, matrix.shape[1])))
+    return sums / sizes, fy, fx
+
+
+def _tick_labels(labels: np.ndarray, step: int, max_labels: int) -> tuple[np.ndarray, list[str]]:
+    """Positions and labels of every block when they fit, else of every k-th one."""
+    n = -(-len(labels) // step)
+    positions = np.arange(0, n, max(1, -(-n // max_labels)))
+    return positions, [str(labels[p * step]) for p in positions]
+
+
+def draw_heatmap(
+    matrix: np.ndarray,
+    provinces: np.ndarray,
+    industries: np.ndarray,
+    title: str,
+    *,
+    renderer: str = "seaborn",
+    max_cells: int = 1000,
+    max_labels: int = 80,
+) -> plt.Figure:
+    """Draw a share_matrix.
+
+    renderer "seaborn" draws the labelled sns.heatmap; "raster" draws one
+    imshow image, with the matrix block-averaged down to at most
+    `max_cells` cells per axis and at most `max_labels` tick labels, for
+    all provinces × all industries.
+    """
+    if renderer == "seaborn":
+        pivot = pd.DataFrame(
+            matrix,
+            index=pd.Index(provinces, name="province"),
+            columns=pd.Index(industries, name="industry"),
+        )
+        fig, ax = plt.subplots(figsize=(max(10, 0.4 * pivot.shape[1]), max(6, 0.35 * pivot.shape[0])))
+        sns.heatmap(pivot, ax=ax, cmap="Blues", cbar_kws={"label": "share"})
+        ax.set_title(title)
+        ax.set_xlabel("industry")
+        ax.set_ylabel("province")
+        return fig
+    if renderer != "raster":
+        raise ValueError(f"unknown heatmap renderer: {renderer}")
+
+    image, fy, fx = downsample(matrix, max_cells, max_cells)
+    if fy > 1 or fx > 1:
+        title += f", {fy}×{fx} cells per block"
+    # One image costs pixels, not artists: the size only has to fit max_labels.
+    fig, ax = plt.subplots(
+        figsize=(min(24, max(10, 0.2 * image.shape[1])), min(16, max(6, 0.2 * image.shape[0])))
     )
-    pivot = pivot.loc[prov_order]
-
-    fig, ax = plt.subplots(figsize=(max(10, 0.4 * pivot.shape[1]), max(6, 0.35 * pivot.shape[0])))
-    sns.heatmap(pivot, ax=ax, cmap="Blues", cbar_kws={"label": "share"})
-    ax.set_title(f"Province × Industry share (top {top_provinces} provinces, top {top_industries} industries)")
+    im = ax.imshow(image, aspect="auto", interpolation="nearest", cmap="Blues", vmin=0.0)
+    fig.colorbar(im, ax=ax, label="share")
+    ax.set_xticks(*_tick_labels(industries, fx, max_labels), rotation=90, fontsize=6)
+    ax.set_yticks(*_tick_labels(provinces, fy, max_labels), fontsize=6)
+    ax.grid(False)
+    ax.set_title(title)
     ax.set_xlabel("industry")
     ax.set_ylabel("province")
     return fig
 
 
-def main() -> int:
+def _heatmap_share(
+    df: pd.DataFrame,
+    *,
+    top_provinces: int | None = 25,
+    top_industries: int | None = 20,
+    renderer: str = "seaborn",
+    max_cells: int = 1000,
+) -> plt.Figure:
+    matrix, provinces, industries = share_matrix(df, top_provinces=top_provinces, top_industries=top_industries)
+    scope = (
+        f"top {top_provinces} provinces" if top_provinces else "all provinces",
+        f"top {top_industries} industries" if top_industries else "all industries",
+    )
+    title = f"Province × Industry share ({scope[0]}, {scope[1]})"
+    return draw_heatmap(matrix, provinces, industries, title, renderer=renderer, max_cells=max_cells)
+
+
+def _has_share_columns(df: pd.DataFrame) -> bool:
+    return {"province", "industry", "job_count", "province_job_count", "share"}.issubset(df.columns)
+
+
+# One entry per figure: source CSV, plot function and its parameters.
+FIGURES = [
+    {
+        "csv": "industry_total_known.csv",
+        "out": "industry_total_known_top25.png",
+        "plot": "barh_top",
+        "params": {"label_col": "industry", "value_col": "job_count", "top_n": 25, "title": "Top industries (known) by job_count"},
+    },
+    {
+        "csv": "province_total.csv",
+        "out": "province_total_top25.png",
+        "plot": "barh_top",
+        "params": {"label_col": "province", "value_col": "province_job_count", "top_n": 25, "title": "Top provinces by job_count"},
+    },
+    {
+        "csv": "province_industry_share.csv",
+        "out": "province_industry_share_heatmap.png",
+        "plot": "heatmap_share",
+        "params": {"top_provinces": 25, "top_industries": 20},
+    },
+    {
+        "csv": "province_industry_share.csv",
+        "out": "province_industry_share_heatmap_full.png",
+        "plot": "heatmap_share",
+        "params": {"top_provinces": None, "top_industries": None, "renderer": "raster"},
+    },
+    {
+        "csv": "requirement_experience_total.csv",
+        "out": "requirement_experience_total.png",
+        "plot": "bar",
+        "params": {"label_col": "experience", "value_col": "job_count", "title": "Experience distribution"},
+    },
+    {
+        "csv": "requirement_education_total.csv",
+        "out": "requirement_education_total.png",
+        "plot": "bar",
+        "params": {"label_col": "education", "value_col": "job_count", "title": "Education distribution"},
+    },
+    {
+        "csv": "requirement_employment_type_total.csv",
+        "out": "requirement_employment_type_total.png",
+        "plot": "bar",
+        "params": {"label_col": "employment_type", "value_col": "job_count", "title": "Employment type distribution"},
+    },
+    {
+        "csv": "requirement_skill_total_top500.csv",
+        "out": "requirement_skill_top30.png",
+        "plot": "barh_top",
+        "params": {"label_col": "skill", "value_col": "job_count", "top_n": 30, "title": "Top skills by job_count"},
+    },
+]
+
+
+def _plot(job: dict, df: pd.DataFrame) -> plt.Figure | None:
+    params = job["params"]
+    if job["plot"] == "barh_top":
+        return _barh_top(df, params["label_col"], params["value_col"], top_n=params["top_n"], title=params["title"])
+    if job["plot"] == "bar":
+        return _bar(df, params["label_col"], params["value_col"], title=params["title"])
+    if job["plot"] == "heatmap_share":
+        if not _has_share_columns(df):
+            return None
+        return _heatmap_share(df, **params)
+    raise ValueError(f"unknown plot: {job['plot']}")
+
+
+def _source_digest() -> str:
+    # Changing how figures are drawn invalidates the cache too.
+    return hashlib.sha256(Path(__file__).read_bytes()).hexdigest()
+
+
+def _cache_key(job: dict, csv_path: Path, dpi: int, source_digest: str, csv_text: str | None = None) -> str:
+    h = hashlib.sha256()
+    h.update(json.dumps({**job, "dpi": dpi, "source": source_digest}, sort_keys=True).encode("utf-8"))
+    if csv_text is not None:
+        h.update(csv_text.encode("utf-8"))
+        return h.hexdigest()
+    with open(csv_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def cube_tables(cube_dir: Path) -> dict[str, str]:
+    """CSV text of the viz tables the job cube covers, keyed by CSV file name.
+
+    Same tables as the export (local_engine.build_viz_frames on the cube's
+    rollups); requirement_skill_total_top500 is not in the cube.
+    """
+    sys.path.insert(0, str(ROOT))
+    import local_engine
+    from job_cube import JobCube
+
+    frames = local_engine.build_viz_frames(JobCube.load(cube_dir).pig_inputs())
+    return {f"{name}.csv": frame.to_csv(index=False) for name, frame in frames.items()}
+
+
+def _load_cache(fig_dir: Path) -> dict[str, str]:
+    try:
+        with open(fig_dir / CACHE_FILE, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_cache(fig_dir: Path, cache: dict[str, str]) -> None:
+    tmp = fig_dir / f".{CACHE_FILE}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(cache, f, indent=2, sort_keys=True)
+    os.replace(tmp, fig_dir / CACHE_FILE)
+
+
+def _peak_rss_mb() -> float | None:
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def render_figure(
+    job: dict, viz_dir: Path, fig_dir: Path, dpi: int = DPI, csv_text: str | None = None
+) -> tuple[str, float, bool, float | None]:
+    """Render one FIGURES entry; returns (output name, seconds, written, peak RSS MB of the renderer).
+
+    `csv_text` replaces the CSV file (see cube_tables). Top-level so it can
+    run in a worker process.
+    """
+    t0 = time.perf_counter()
     sns.set_theme(style="whitegrid")
-    FIG_DIR.mkdir(parents=True, exist_ok=True)
-
-    outputs: list[Path] = []
-
-    # 1) Overall industries (known)
-    p = VIZ_DIR / "industry_total_known.csv"
-    if p.exists():
-        df = _read_csv(p)
-        fig = _barh_top(df, "industry", "job_count", top_n=25, title="Top industries (known) by job_count")
-        out = FIG_DIR / "industry_total_known_top25.png"
-        _save(fig, out)
-        outputs.append(out)
-
-    # 2) Province totals
-    p = VIZ_DIR / "province_total.csv"
-    if p.exists():
-        df = _read_csv(p)
-        fig = _barh_top(df, "province", "province_job_count", top_n=25, title="Top provinces by job_count")
-        out = FIG_DIR / "province_total_top25.png"
-        _save(fig, out)
-        outputs.append(out)
-
-    # 3) Province × Industry share heatmap
-    p = VIZ_DIR / "province_industry_share.csv"
-    if p.exists():
-        df = _read_csv(p)
-        if {"province", "industry", "job_count", "province_job_count", "share"}.issubset(df.columns):
-            fig = _heatmap_share(df, top_provinces=25, top_industries=20)
-            out = FIG_DIR / "province_industry_share_heatmap.png"
-            _save(fig, out)
-            outputs.append(out)
-
-    # 4) Requirement distributions
-    reqs = [
-        ("requirement_experience_total.csv", "experience", "job_count", "Experience distribution"),
-        ("requirement_education_total.csv", "education", "job_count", "Education distribution"),
-        ("requirement_employment_type_total.csv", "employment_type", "job_count", "Employment type distribution"),
-    ]
-    for filename, label_col, value_col, title in reqs:
-        p = VIZ_DIR / filename
-        if not p.exists():
-            continue
-        df = _read_csv(p)
-        fig = _bar(df, label_col, value_col, title=title)
-        out = FIG_DIR / filename.replace(".csv", ".png")
-        _save(fig, out)
-        outputs.append(out)
-
-    # 5) Top skills
-    p = VIZ_DIR / "requirement_skill_total_top500.csv"
-    if p.exists():
-        df = _read_csv(p)
-        fig = _barh_top(df, "skill", "job_count", top_n=30, title="Top skills by job_count")
-        out = FIG_DIR / "requirement_skill_top30.png"
-        _save(fig, out)
-        outputs.append(out)
+    df = pd.read_csv(io.StringIO(csv_text)) if csv_text is not None else _read_csv(viz_dir / job["csv"])
+    fig = _plot(job, df)
+    if fig is None:
+        return job["out"], time.perf_counter() - t0, False, _peak_rss_mb()
+    _save(fig, fig_dir / job["out"], dpi)
+    return job["out"], time.perf_counter() - t0, True, _peak_rss_mb()
+
 
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Render the report figures from output/viz/*.csv")
+    parser.add_argument("--viz-dir", default=str(VIZ_DIR), help="Folder with the viz CSVs (default: output/viz)")
+    parser.add_argument("--fig-dir", default=str(FIG_DIR), help="Where the PNGs go (default: output/figures)")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=0,
+        help="Render in a process pool of this size (default: one per figure, up to the CPU count; 1 = in-process)",
+    )
+    parser.add_argument("--force", action="store_true", help="Ignore the cache and re-render every figure")
+    parser.add_argument("--dpi", type=int, default=DPI)
+    parser.add_argument(
+        "--cube",
+        nargs="?",
+        const=str(ROOT / "output" / "job_cube"),
+        default=None,
+        help="Take the tables the job cube covers from it instead of the CSVs (default dir: output/job_cube)",
+    )
+    parser.add_argument(
+        "--metrics",
+        default=None,
+        help="Append one record per rendered figure to this JSON-lines run report (see run_metrics.py)",
+    )
+    args = parser.parse_args()
+    viz_dir, fig_dir = Path(args.viz_dir), Path(args.fig_dir)
+    fig_dir.mkdir(parents=True, exist_ok=True)
+
+    t_start = time.perf_counter()
+    cache = {} if args.force else _load_cache(fig_dir)
+    digest = _source_digest()
+    tables = cube_tables(Path(args.cube)) if args.cube else {}
+    todo, keys, done = [], {}, set()
+    for job in FIGURES:
+        csv_path = viz_dir / job["csv"]
+        if job["csv"] not in tables and not csv_path.exists():
+            continue
+        key = _cache_key(job, csv_path, args.dpi, digest, tables.get(job["csv"]))
+        if cache.get(job["out"]) == key and (fig_dir / job["out"]).exists():
+            print(f"  cached   {job['out']}")
+            done.add(job["out"])
+            continue
+        keys[job["out"]] = key
+        todo.append(job)
+
+    workers = args.workers or min(len(todo), os.cpu_count() or 1)
+    if workers > 1 and len(todo) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(render_figure, job, viz_dir, fig_dir, args.dpi, tables.get(job["csv"])) for job in todo]
+            results = [f.result() for f in futures]
+    else:
+        results = [render_figure(job, viz_dir, fig_dir, args.dpi, tables.get(job["csv"])) for job in todo]
+
+    metrics = None
+    if args.metrics:
+        sys.path.insert(0, str(ROOT))
+        from run_metrics import RunMetrics
+
+        metrics = RunMetrics(Path(args.metrics))
+    for name, seconds, written, peak_rss_mb in results:
+        if metrics is not None:
+            out = fig_dir / name
+            metrics.write(
+                {
+                    "step": f"figure:{name}",
+                    "kind": "figure",
+                    "seconds": round(seconds, 4),
+                    "bytes_written": out.stat().st_size if written else None,
+                    "python_peak_rss_mb": peak_rss_mb,
+                }
+            )
+        if written:
+            print(f"  {seconds:6.2f}s  {name}")
+            cache[name] = keys[name]
+            done.add(name)
+        else:
+            print(f"  skipped  {name} (missing columns)")
+            cache.pop(name, None)
+    _save_cache(fig_dir, cache)
+
+    outputs = [fig_dir / job["out"] for job in FIGURES if job["out"] in done]
     if outputs:
-        print("Wrote figures:")
+        rendered = sum(r[2] for r in results)
+        elapsed = time.perf_counter() - t_start
+        print(f"Wrote figures ({rendered} rendered, {len(outputs) - rendered} cached, {elapsed:.2f}s):")
         for o in outputs:
-            print(f"- {o.relative_to(ROOT)}")
+            print(f"- {o.relative_to(ROOT) if o.is_relative_to(ROOT) else o}")
         return 0
 
-    print(f"No expected CSVs found in: {VIZ_DIR}")
+    print(f"No expected CSVs found in: {viz_dir}")
     return 1
 
 